@@ -0,0 +1,133 @@
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from instrument import span
+
+CACHE_FILE = ".chart_cache.json"
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+# =========================================
+
+
+def _use_agg() -> None:
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render(func, data: pd.DataFrame, out_path: str, dpi: int, style: dict):
+    # runs in a worker; returns None on success or the error text
+    _use_agg()
+    import matplotlib.pyplot as plt
+    try:
+        with span("chart.render", chart=os.path.basename(out_path), dpi=dpi, rows=len(data)):
+            func(data, out_path=out_path, dpi=dpi, **style)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    finally:
+        plt.close("all")
+
+
+def data_digest(data: pd.DataFrame) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps([list(map(str, data.columns)), list(map(str, data.dtypes))]).encode())
+    h.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def source_files(func) -> list:
+    # the plotting function's whole module plus every repo module its globals come from
+    # (helpers imported from density_raster, livability_scorer, ...), so editing a helper
+    # invalidates the charts that use it
+    home = os.path.dirname(os.path.abspath(inspect.getsourcefile(func)))
+    files = {os.path.abspath(inspect.getsourcefile(func))}
+    for value in list(func.__globals__.values()):
+        module = value if inspect.ismodule(value) else inspect.getmodule(value)
+        path = getattr(module, "__file__", None)
+        if path and path.endswith(".py") and os.path.dirname(os.path.abspath(path)) in (home, CODE_DIR):
+            files.add(os.path.abspath(path))
+    return sorted(files)
+
+
+class ChartJob:
+    # One chart: func(data, out_path=..., dpi=..., **style). Its key covers the source of
+    # the plotting function's module and the repo modules it uses, the data passed to it
+    # and the style parameters.
+    def __init__(self, name, func, data, out_path, dpi=300, style=None):
+        self.name = name
+        self.func = func
+        self.data = data
+        self.out_path = out_path
+        self.dpi = dpi
+        self.style = style or {}
+
+    def key(self) -> str:
+        h = hashlib.sha256()
+        h.update(f"{self.func.__module__}.{self.func.__qualname__}".encode())
+        for path in source_files(self.func):
+            h.update(os.path.basename(path).encode())
+            with open(path, "rb") as f:
+                h.update(f.read())
+        h.update(data_digest(self.data).encode())
+        h.update(json.dumps({"dpi": self.dpi, "style": self.style}, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+
+class ChartRenderer:
+    # Collects chart jobs and renders the stale ones in a process pool (Agg backend),
+    # so a report takes about as long as its slowest chart. Keys of charts rendered
+    # successfully are kept in <out_dir>/.chart_cache.json.
+    def __init__(self, out_dir: str = ".", jobs: int = None):
+        self.out_dir = out_dir
+        self.jobs = jobs
+        self.charts = []
+
+    def add(self, name: str, func, data: pd.DataFrame, filename: str, columns=None, dpi: int = 300, **style):
+        # columns limits the data shipped to the worker (and hashed) to what the chart uses
+        data = data[columns] if columns is not None else data
+        self.charts.append(ChartJob(name, func, data, os.path.join(self.out_dir, filename), dpi, style))
+
+    def _cache_path(self) -> str:
+        return os.path.join(self.out_dir, CACHE_FILE)
+
+    def _load_cache(self) -> dict:
+        if os.path.exists(self._cache_path()):
+            with open(self._cache_path()) as f:
+                return json.load(f)
+        return {}
+
+    def render(self, force: bool = False) -> dict:
+        os.makedirs(self.out_dir, exist_ok=True)
+        cache = self._load_cache()
+        status, todo = {}, []
+        for job in self.charts:
+            key = job.key()
+            if not force and cache.get(os.path.basename(job.out_path)) == key and os.path.exists(job.out_path):
+                status[job.name] = "cached"
+                print(f"{job.name}: unchanged, skipped")
+            else:
+                todo.append((job, key))
+
+        if len(todo) > 1 and self.jobs != 1:
+            with ProcessPoolExecutor(max_workers=self.jobs, initializer=_use_agg) as pool:
+                futures = [pool.submit(_render, job.func, job.data, job.out_path, job.dpi, job.style)
+                           for job, _ in todo]
+                errors = [f.result() for f in futures]
+        else:
+            errors = [_render(job.func, job.data, job.out_path, job.dpi, job.style) for job, _ in todo]
+
+        for (job, key), error in zip(todo, errors):
+            if error is None:
+                cache[os.path.basename(job.out_path)] = key
+                status[job.name] = "rendered"
+            else:
+                cache.pop(os.path.basename(job.out_path), None)
+                status[job.name] = "failed"
+                print(f"{job.name}: FAILED ({error})")
+        with open(self._cache_path(), "w") as f:
+            json.dump(cache, f, indent=2, sort_keys=True)
+        return status
@@ -0,0 +1,202 @@
+import argparse
+import os
+
+import pandas as pd
+
+from instrument import span
+
+try:
+    import pyarrow  # noqa: F401  (Parquet / Feather support)
+    HAS_ARROW = True
+except ImportError:
+    HAS_ARROW = False
+
+KEY = "ZipCode"
+
+# Every column is owned by exactly one source; other files that happen to repeat it
+# (DMV_Yelp_Dataset.csv repeats the house columns, Livability_Scores.csv repeats
+# City/State/MedianPrice) are never read for it, so joins produce no _x/_y copies.
+# The dtypes are the compact storage dtypes used for both CSV parsing and the
+# columnar files: prices and coordinates stay float64, other features are float32.
+HOUSE_COLUMNS = {
+    "City": "category",
+    "State": "category",
+    "MedianPrice": "float64",
+    "Latitude": "float64",
+    "Longitude": "float64",
+    "NearestStation": "category",
+    "MetroDistanceMeters": "float32",
+    "DistanceToDC_Meters": "float32",
+    "Growth_1Y": "float32",
+    "Growth_3Y": "float32",
+    "Growth_5Y": "float32",
+    "Growth_10Y": "float32",
+    "Price_Volatility": "float32",
+}
+YELP_COLUMNS = {
+    "Yelp_Restaurant_Count": "Int32",
+    "Yelp_Avg_Rating": "float32",
+    "Yelp_Avg_Review_Count": "float32",
+    "Num_Thai": "Int32",
+    "Num_Coffee": "Int32",
+    "Num_FastFood": "Int32",
+    "Num_Japanese": "Int32",
+    "Num_Italian": "Int32",
+    "Num_American": "Int32",
+    "Num_Bars": "Int32",
+    "Num_HighEnd_Price4": "Int32",
+}
+SCORE_COLUMNS = {
+    "Livability_Score": "float32",
+    "Score_Transport": "float32",
+    "Score_Food": "float32",
+    "Score_Lifestyle": "float32",
+}
+RESIDUAL_COLUMNS = {
+    "PredictedPrice": "float64",
+    "Residual": "float64",
+}
+SCHEMA = {**HOUSE_COLUMNS, **YELP_COLUMNS, **SCORE_COLUMNS, **RESIDUAL_COLUMNS}
+
+# source -> (file stem, owned columns). Files are looked up as <stem>.parquet,
+# <stem>.feather, <stem>.csv, then the CSV fallbacks below (wide files that also
+# contain the source's columns).
+SOURCES = {
+    "house": ("DMV_House_Price_Data", HOUSE_COLUMNS),
+    "yelp": ("Yelp_Data", YELP_COLUMNS),
+    "scores": ("Livability_Scores", SCORE_COLUMNS),
+    "residuals": ("ZIP_Residuals", RESIDUAL_COLUMNS),
+}
+CSV_FALLBACKS = {
+    "house": ["DMV_Yelp_Dataset.csv", "Final_Project_Data_With_Scores.csv"],
+    "yelp": ["DMV_Yelp_Dataset.csv", "Final_Project_Data_With_Scores.csv"],
+    "scores": ["Livability_Scores_Only.csv", "Final_Project_Data_With_Scores.csv"],
+    "residuals": ["all_zip_low_to_high.csv"],
+}
+COLUMNAR_FORMATS = (".parquet", ".feather")
+
+
+def normalize_zip(values: pd.Series) -> pd.Series:
+    # "20001-1234" (ZIP+4) and "20001.0" (read as float) both become "20001"; "2001" -> "02001"
+    values = values.astype("string").str.strip().str.replace(r"-\d{4}$", "", regex=True)
+    return values.str.split(".").str[0].str.zfill(5)
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    # cast every known column to its storage dtype; unknown columns are left alone
+    df = df.copy()
+    if KEY in df.columns:
+        df[KEY] = normalize_zip(df[KEY])
+    for col, dtype in SCHEMA.items():
+        if col in df.columns and str(df[col].dtype) != dtype:
+            if dtype.startswith("Int"):
+                df[col] = pd.to_numeric(df[col], errors="coerce").round().astype(dtype)
+            else:
+                df[col] = df[col].astype(dtype)
+    return df
+
+
+def read_table(path: str, columns=None) -> pd.DataFrame:
+    # Parquet/Feather are read column-pruned without parsing; CSV is parsed straight
+    # into the compact dtypes with usecols.
+    ext = os.path.splitext(path)[1].lower()
+    with span("datasets.read_table", file=os.path.basename(path), format=ext) as s:
+        if ext == ".parquet":
+            df = pd.read_parquet(path, columns=columns)
+        elif ext == ".feather":
+            df = pd.read_feather(path, columns=columns)
+        else:
+            header = pd.read_csv(path, nrows=0).columns
+            usecols = [c for c in header if columns is None or c in columns]
+            dtype = {c: SCHEMA[c] for c in usecols if c in SCHEMA}
+            if KEY in usecols:
+                dtype[KEY] = "string"
+            df = pd.read_csv(path, usecols=usecols, dtype=dtype)
+        if KEY in df.columns:
+            df[KEY] = normalize_zip(df[KEY])
+        s.rows = len(df)
+    return df
+
+
+def write_table(df: pd.DataFrame, path: str, csv_copy: bool = False) -> None:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in COLUMNAR_FORMATS and not HAS_ARROW:
+        raise ImportError(f"writing {path} needs pyarrow (pip install pyarrow)")
+    out = compact_dtypes(df).reset_index(drop=True)
+    if ext == ".parquet":
+        out.to_parquet(path, index=False)
+    elif ext == ".feather":
+        out.to_feather(path)
+    else:
+        out.to_csv(path, index=False)
+    if csv_copy and ext != ".csv":
+        out.to_csv(os.path.splitext(path)[0] + ".csv", index=False)
+
+
+def source_path(name: str, data_dir: str = ".", paths: dict = None) -> str:
+    if paths and name in paths:
+        return paths[name]
+    stem, _ = SOURCES[name]
+    exts = (COLUMNAR_FORMATS if HAS_ARROW else ()) + (".csv",)
+    candidates = [stem + ext for ext in exts] + CSV_FALLBACKS.get(name, [])
+    for candidate in candidates:
+        path = os.path.join(data_dir, candidate)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"no file for source '{name}' in {data_dir} (tried {', '.join(candidates)})")
+
+
+def read_source(name: str, path: str, columns=None) -> pd.DataFrame:
+    # Only ZipCode plus the requested columns this source owns are read.
+    _, owned = SOURCES[name]
+    wanted = [c for c in owned if columns is None or c in columns]
+    df = read_table(path, columns=[KEY] + wanted)
+    return df.drop_duplicates(KEY).set_index(KEY)
+
+
+def load_dataset(sources=("house", "yelp", "scores"), columns=None, data_dir: str = ".",
+                 paths: dict = None, how: str = "left") -> pd.DataFrame:
+    # One wide frame keyed on ZipCode. The first source is the base table; the others
+    # are joined onto it with `how`. `columns` limits what is read from every source.
+    frames = [read_source(name, source_path(name, data_dir, paths), columns) for name in sources]
+    df = frames[0]
+    for other in frames[1:]:
+        df = df.join(other, how=how)
+    df = df.reset_index()
+    if columns is not None:
+        df = df[[KEY] + [c for c in columns if c in df.columns and c != KEY]]
+    return df
+
+
+def export_sources(data_dir: str = ".", out_dir: str = None, fmt: str = ".parquet",
+                   sources=("house", "yelp", "scores")) -> list:
+    # Split whatever CSVs are present into one compact columnar file per source.
+    out_dir = out_dir or data_dir
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    for name in sources:
+        try:
+            path = source_path(name, data_dir)
+        except FileNotFoundError:
+            continue
+        out_path = os.path.join(out_dir, SOURCES[name][0] + fmt)
+        if os.path.abspath(path) == os.path.abspath(out_path):
+            continue
+        write_table(read_source(name, path).reset_index(), out_path)
+        written.append(out_path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pipeline CSVs into compact per-source columnar files")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--out-dir")
+    parser.add_argument("--format", choices=["parquet", "feather"], default="parquet")
+    args = parser.parse_args()
+
+    for path in export_sources(args.data_dir, args.out_dir, "." + args.format):
+        print(f"wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.cm import ScalarMappable
+from matplotlib.colors import Normalize
+
+RASTER_THRESHOLD = 20000   # above this many points the charts switch to a binned raster
+GRID = (480, 360)          # cells (x, y); roughly one cell per 2-3 output pixels at 300 dpi
+LUT_SIZE = 256
+# =========================================
+
+
+def use_raster(n_points: int, raster=None) -> bool:
+    # raster=None means "auto": points for small sets, a grid for large ones
+    return n_points > RASTER_THRESHOLD if raster is None else bool(raster)
+
+
+def bin_points(x, y, values=None, bins=GRID, extent=None):
+    # Drops each point into an (ny x nx) grid with one bincount pass; returns
+    # (counts, mean of `values` per cell or None, extent). Cost is O(points + cells).
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ok = np.isfinite(x) & np.isfinite(y)
+    if values is not None:
+        values = np.asarray(values, dtype=float)
+        ok &= np.isfinite(values)
+        values = values[ok]
+    x, y = x[ok], y[ok]
+    if extent is None:
+        extent = (x.min(), x.max(), y.min(), y.max()) if len(x) else (0.0, 1.0, 0.0, 1.0)
+    xmin, xmax, ymin, ymax = extent
+    nx, ny = bins
+    ix = ((x - xmin) / ((xmax - xmin) or 1.0) * nx).astype(np.int64).clip(0, nx - 1)
+    iy = ((y - ymin) / ((ymax - ymin) or 1.0) * ny).astype(np.int64).clip(0, ny - 1)
+    flat = iy * nx + ix
+
+    counts = np.bincount(flat, minlength=nx * ny).reshape(ny, nx)
+    if values is None:
+        return counts, None, extent
+    sums = np.bincount(flat, weights=values, minlength=nx * ny).reshape(ny, nx)
+    mean = np.divide(sums, counts, out=np.full(counts.shape, np.nan), where=counts > 0)
+    return counts, mean, extent
+
+
+def colorize(grid: np.ndarray, cmap: str, vmin: float = None, vmax: float = None, alpha: float = 1.0) -> np.ndarray:
+    # (ny x nx x 4) uint8 image through a 256-entry colormap table; NaN cells are transparent
+    lut = (plt.get_cmap(cmap)(np.linspace(0, 1, LUT_SIZE)) * 255).astype(np.uint8)
+    lut[:, 3] = int(alpha * 255)
+    empty = ~np.isfinite(grid)
+    vmin = np.nanmin(grid) if vmin is None else vmin
+    vmax = np.nanmax(grid) if vmax is None else vmax
+    scaled = (np.where(empty, vmin, grid) - vmin) / ((vmax - vmin) or 1.0)
+    rgba = lut[(scaled * (LUT_SIZE - 1)).clip(0, LUT_SIZE - 1).astype(np.int64)]
+    rgba[empty] = 0
+    return rgba
+
+
+def draw_raster(ax, rgba: np.ndarray, extent, cmap: str = None, vmin: float = None, vmax: float = None,
+                label: str = None):
+    # image in data coordinates (so axis formatters, lines and labels still apply), plus an
+    # optional colorbar for the colormap used in colorize()
+    ax.imshow(rgba, extent=extent, origin="lower", aspect="auto", interpolation="nearest")
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+    if cmap is not None:
+        plt.colorbar(ScalarMappable(norm=Normalize(vmin, vmax), cmap=cmap), ax=ax, label=label)
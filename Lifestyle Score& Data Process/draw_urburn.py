@@ -1,37 +1,48 @@
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from math import pi
 import matplotlib.ticker as ticker
+from datasets import load_dataset
+from chart_renderer import ChartRenderer
+from density_raster import use_raster, bin_points, colorize, draw_raster
+from regions import REGIONS_FILE, load_regions
 
 sns.set_style("whitegrid")
 plt.rcParams['font.family'] = 'sans-serif'
 
-INPUT_FILE = "./urburn_dataset/Final_Project_Data_With_Scores.csv"
-try:
-    df = pd.read_csv(INPUT_FILE)
-    print(f"sucess: {len(df)} 筆")
-except:
-    print("please check file name is correct")
-    exit()
+DATA_DIR = "./urburn_dataset"
+CHART_COLUMNS = [
+    'City', 'State', 'MedianPrice', 'Latitude', 'Longitude', 'DistanceToDC_Meters', 'Growth_5Y',
+    'Livability_Score', 'Score_Transport', 'Score_Food', 'Score_Lifestyle'
+]
 
-def plot_value_matrix(df):
+def plot_value_matrix(df, out_path='chart_value_matrix.png', dpi=300, raster=None):
     plt.figure(figsize=(10, 8))
     
     avg_price = df['MedianPrice'].mean()
     avg_score = df['Livability_Score'].mean()
+    raster = use_raster(len(df), raster)
     
-    scatter = sns.scatterplot(
-        data=df, 
-        x='MedianPrice', 
-        y='Livability_Score', 
-        size='Score_Transport',
-        hue='State',           
-        alpha=0.7,
-        palette='viridis',
-        sizes=(20, 200)
-    )
+    if raster:
+        # point density per cell (log scale) instead of one marker per row
+        counts, _, extent = bin_points(df['MedianPrice'], df['Livability_Score'])
+        density = np.log10(counts, out=np.full(counts.shape, np.nan), where=counts > 0)
+        draw_raster(plt.gca(), colorize(density, 'viridis'), extent,
+                    cmap='viridis', vmin=0, vmax=np.nanmax(density), label='log10(ZIP count)')
+    else:
+        scatter = sns.scatterplot(
+            data=df, 
+            x='MedianPrice', 
+            y='Livability_Score', 
+            size='Score_Transport',
+            hue='State',           
+            alpha=0.7,
+            palette='viridis',
+            sizes=(20, 200)
+        )
     
     plt.axvline(avg_price, color='red', linestyle='--', alpha=0.5, label='Avg Price')
     plt.axhline(avg_score, color='blue', linestyle='--', alpha=0.5, label='Avg Score')
@@ -46,15 +57,21 @@ def plot_value_matrix(df):
     plt.title('Residential Value Discovery Matrix\n(Top-Left Quadrant = Undervalued/High-Value Areas)', fontsize=14)
     plt.xlabel('Median Housing Price ($)', fontsize=12)
     plt.ylabel('Livability Score (0-100)', fontsize=12)
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    if raster:
+        plt.legend(loc='upper right')  # the colorbar sits where the outside legend would
+    else:
+        plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
     plt.tight_layout()
-    plt.savefig('chart_value_matrix.png', dpi=300)
-    print("圖表 1 完成: chart_value_matrix.png")
+    plt.savefig(out_path, dpi=dpi)
+    plt.close()
+    print(f"圖表 1 完成: {out_path}")
 
 # Chart 2
-def plot_radar_chart(df):
+def plot_radar_chart(df, out_path='chart_radar_profile.png', dpi=300):
     df_sorted = df.sort_values('Livability_Score', ascending=False)
-    targets = pd.concat([df_sorted.head(3), df_sorted.iloc[[50]]]) # Top 3 + Rank 50
+    # Top 3 + Rank 50 (or the last ZIP when a region shard has fewer than 51)
+    rank = min(50, len(df_sorted) - 1)
+    targets = pd.concat([df_sorted.head(3), df_sorted.iloc[[rank]]]) if rank >= 3 else df_sorted.head(3)
     
     categories = ['Transport', 'Food', 'Lifestyle']
     N = len(categories)
@@ -80,25 +97,41 @@ def plot_radar_chart(df):
     plt.title('Livability Profile Comparison', size=15, y=1.1)
     plt.legend(loc='upper right', bbox_to_anchor=(1.1, 1.1))
     plt.tight_layout()
-    plt.savefig('chart_radar_profile.png', dpi=300)
-    print("圖表 2 完成: chart_radar_profile.png")
+    plt.savefig(out_path, dpi=dpi)
+    plt.close()
+    print(f"圖表 2 完成: {out_path}")
 
 # Spatial Heatmap
-def plot_spatial_heatmap_fixed(df):
+# landmarks: name -> (lat, lon), as in regions.py
+DMV_LANDMARKS = {
+    'DC Core': (38.9072, -77.0369),
+    'Dulles Airport': (38.9531, -77.4565),
+    'Alexandria': (38.8048, -77.0469)
+}
+
+def plot_spatial_heatmap_fixed(df, out_path='chart_spatial_map_fixed.png', dpi=300, raster=None,
+                               landmarks=None, title='DMV Area'):
     plt.figure(figsize=(12, 8))
     
-    scatter = plt.scatter(
-        df['Longitude'], 
-        df['Latitude'], 
-        c=df['Livability_Score'], 
-        cmap='RdYlGn', 
-        s=df['MedianPrice']/5000, 
-        alpha=0.7,
-        edgecolors='white',
-        linewidth=0.5
-    )
-    
-    plt.colorbar(label='Livability Score (Green=High, Red=Low)')
+    if use_raster(len(df), raster):
+        # mean score per lat/lon cell
+        _, mean, extent = bin_points(df['Longitude'], df['Latitude'], df['Livability_Score'])
+        vmin, vmax = df['Livability_Score'].min(), df['Livability_Score'].max()
+        draw_raster(plt.gca(), colorize(mean, 'RdYlGn', vmin, vmax, alpha=0.85), extent,
+                    cmap='RdYlGn', vmin=vmin, vmax=vmax, label='Livability Score (Green=High, Red=Low)')
+    else:
+        scatter = plt.scatter(
+            df['Longitude'], 
+            df['Latitude'], 
+            c=df['Livability_Score'], 
+            cmap='RdYlGn', 
+            s=df['MedianPrice']/5000, 
+            alpha=0.7,
+            edgecolors='white',
+            linewidth=0.5
+        )
+        
+        plt.colorbar(label='Livability Score (Green=High, Red=Low)')
     
     def lon_formatter(x, pos):
         return f'{abs(x):.1f}°W'
@@ -109,30 +142,25 @@ def plot_spatial_heatmap_fixed(df):
     plt.gca().xaxis.set_major_formatter(ticker.FuncFormatter(lon_formatter))
     plt.gca().yaxis.set_major_formatter(ticker.FuncFormatter(lat_formatter))
     # -------------------------------------
-    landmarks = {
-        'DC Core': (-77.0369, 38.9072),
-        'Dulles Airport': (-77.4565, 38.9531),
-        'Alexandria': (-77.0469, 38.8048)
-    }
+    landmarks = DMV_LANDMARKS if landmarks is None else landmarks
     
-    for name, (lon, lat) in landmarks.items():
+    for name, (lat, lon) in landmarks.items():
         plt.annotate(name, (lon, lat), xytext=(5, 5), textcoords='offset points', 
                      fontsize=9, fontweight='bold', color='black',
                      bbox=dict(boxstyle="round,pad=0.3", fc="white", alpha=0.7))
 
-    plt.title('Spatial Distribution of Livability Scores in DMV Area', fontsize=15)
+    plt.title(f'Spatial Distribution of Livability Scores in {title}', fontsize=15)
     plt.xlabel('Longitude (West)')
     plt.ylabel('Latitude (North)')
     plt.grid(True, linestyle='--', alpha=0.3)
     
     plt.tight_layout()
-    plt.savefig('chart_spatial_map_fixed.png', dpi=300)
-    print("圖表 3 (修正版) 完成: chart_spatial_map_fixed.png")
-
-plot_spatial_heatmap_fixed(df)
+    plt.savefig(out_path, dpi=dpi)
+    plt.close()
+    print(f"圖表 3 (修正版) 完成: {out_path}")
 
 # Correlation Matrix
-def plot_correlation(df):
+def plot_correlation(df, out_path='chart_correlation.png', dpi=300):
     plt.figure(figsize=(10, 8))
     
     cols = ['Livability_Score', 'Score_Transport', 'Score_Food', 'Score_Lifestyle', 
@@ -151,11 +179,13 @@ def plot_correlation(df):
     
     plt.title('Correlation Matrix of Key Indicators', fontsize=14)
     plt.tight_layout()
-    plt.savefig('chart_correlation.png', dpi=300)
-    print("圖表 4 完成: chart_correlation.png")
+    plt.savefig(out_path, dpi=dpi)
+    plt.close()
+    print(f"圖表 4 完成: {out_path}")
 
 # Price vs Value Zones
-def plot_price_value_zones(df):
+def plot_price_value_zones(df, out_path='chart_price_zones_fixed.png', dpi=300):
+    df = df.copy()
     plt.figure(figsize=(10, 8))
     
     avg_price = df['MedianPrice'].mean()
@@ -204,12 +234,62 @@ def plot_price_value_zones(df):
     plt.ylabel('Livability Score (0-100)', fontsize=12)
     plt.tight_layout()
     
-    plt.savefig('chart_price_zones_fixed.png', dpi=300)
+    plt.savefig(out_path, dpi=dpi)
+    plt.close()
+    print(f"圖表 5 完成: {out_path}")
+
+
+# -----------------------------
+# Chart registry: (name, function, file, columns used)
+# -----------------------------
+CHARTS = [
+    ("value_matrix", plot_value_matrix, 'chart_value_matrix.png',
+     ['City', 'State', 'MedianPrice', 'Livability_Score', 'Score_Transport']),
+    ("radar_profile", plot_radar_chart, 'chart_radar_profile.png',
+     ['ZipCode', 'City', 'Livability_Score', 'Score_Transport', 'Score_Food', 'Score_Lifestyle']),
+    ("spatial_map", plot_spatial_heatmap_fixed, 'chart_spatial_map_fixed.png',
+     ['Latitude', 'Longitude', 'MedianPrice', 'Livability_Score']),
+    ("correlation", plot_correlation, 'chart_correlation.png',
+     ['Livability_Score', 'Score_Transport', 'Score_Food', 'Score_Lifestyle',
+      'MedianPrice', 'DistanceToDC_Meters', 'Growth_5Y']),
+    ("price_zones", plot_price_value_zones, 'chart_price_zones_fixed.png',
+     ['City', 'State', 'MedianPrice', 'Livability_Score']),
+]
+RASTER_CHARTS = {"value_matrix", "spatial_map"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the livability charts")
+    parser.add_argument("data_dir", nargs="?", default=DATA_DIR)
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument("--force", action="store_true", help="re-render charts even if unchanged")
+    parser.add_argument("--raster", choices=["auto", "on", "off"], default="auto",
+                        help="bin large point sets into a grid instead of drawing every marker")
+    parser.add_argument("--region", help="region whose landmarks / title the spatial map uses (default: DMV)")
+    parser.add_argument("--regions-file", default=REGIONS_FILE)
+    args = parser.parse_args()
+
+    try:
+        df = load_dataset(("house", "scores"), columns=CHART_COLUMNS, data_dir=args.data_dir)
+        print(f"sucess: {len(df)} 筆")
+    except FileNotFoundError:
+        print("please check file name is correct")
+        exit()
+
+    raster = {"auto": None, "on": True, "off": False}[args.raster]
+    region = load_regions(args.regions_file)[args.region] if args.region else None
+    renderer = ChartRenderer(args.out_dir, jobs=args.jobs)
+    for name, func, filename, columns in CHARTS:
+        style = {"raster": raster} if name in RASTER_CHARTS else {}
+        if name == "spatial_map" and region is not None:
+            style.update(landmarks=region.landmarks, title=region.title)
+        renderer.add(name, func, df, filename, columns=columns, dpi=args.dpi, **style)
+    status = renderer.render(force=args.force)
+    if "failed" in status.values():
+        exit(1)
 
-plot_price_value_zones(df)
 
 if __name__ == "__main__":
-    plot_value_matrix(df)
-    plot_radar_chart(df)
-    plot_spatial_heatmap(df)
-    plot_correlation(df)
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,168 @@
+import argparse
+import functools
+import hashlib
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from run_yelp_scraper import COUNT_TERMS
+from transit_features import DC_CORE, EARTH_RADIUS_M
+from yelp_tiles import CATEGORY_ALIASES, MAX_RESULTS, is_restaurant
+
+PORT = 8766
+CELL_DEG = 0.01             # businesses are generated per cell of this size, on demand
+CORE_DENSITY = 60           # mean businesses per cell at DC_CORE ...
+BASE_DENSITY = 2            # ... decaying to this far out
+DECAY_KM = 6
+# category aliases drawn for fake businesses, with weights
+ALIAS_WEIGHTS = {
+    "thai": 3, "japanese": 2, "sushi": 2, "ramen": 1, "italian": 4, "tradamerican": 5, "newamerican": 4,
+    "hotdogs": 3, "burgers": 3, "mexican": 4, "chinese": 4, "pizza": 4, "indpak": 2, "mediterranean": 2,
+    "coffee": 5, "cafes": 2, "bars": 4, "pubs": 2, "cocktailbars": 2, "wine_bars": 1,
+}
+PRICES = [None, "$", "$$", "$$$", "$$$$"]
+# =========================================
+
+ALIASES = list(ALIAS_WEIGHTS)
+ALIAS_P = np.array(list(ALIAS_WEIGHTS.values()), dtype=float) / sum(ALIAS_WEIGHTS.values())
+TERM_ALIASES = {term.lower(): CATEGORY_ALIASES[col] for col, term in COUNT_TERMS.items()}
+CATEGORY_FILTERS = {"bars": CATEGORY_ALIASES["Num_Bars"], "coffee": CATEGORY_ALIASES["Num_Coffee"]}
+
+
+@functools.lru_cache(maxsize=65536)
+def cell_businesses(i: int, j: int) -> tuple:
+    # The fake world: a fixed, seeded set of businesses per lat/lon cell, so every query
+    # that overlaps a cell (ZIP searches and tiles alike) sees the same businesses.
+    seed = int(hashlib.md5(f"{i},{j}".encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    lat0, lon0 = i * CELL_DEG, j * CELL_DEG
+    d_km = math.hypot((lat0 - DC_CORE[0]) * 111.0, (lon0 - DC_CORE[1]) * 111.0 * math.cos(math.radians(DC_CORE[0])))
+    n = rng.poisson(BASE_DENSITY + CORE_DENSITY * math.exp(-d_km / DECAY_KM))
+    out = []
+    for k in range(n):
+        aliases = list(dict.fromkeys(str(a) for a in rng.choice(ALIASES, size=1 + (rng.random() < 0.2), p=ALIAS_P)))
+        out.append({
+            "id": f"fk-{i}-{j}-{k}",
+            "rating": float(rng.integers(2, 11)) / 2,
+            "review_count": int(rng.pareto(1.2) * 20),
+            "price": PRICES[rng.choice(5, p=[0.2, 0.3, 0.3, 0.15, 0.05])],
+            "categories": [{"alias": a, "title": a.replace("_", " ").title()} for a in aliases],
+            "coordinates": {"latitude": round(lat0 + rng.random() * CELL_DEG, 6),
+                            "longitude": round(lon0 + rng.random() * CELL_DEG, 6)},
+        })
+    return tuple(out)
+
+
+def _matches(business: dict, params: dict) -> bool:
+    aliases = [c["alias"] for c in business["categories"]]
+    if params.get("price") and business["price"] != "$" * int(params["price"]):
+        return False
+    if "categories" in params:
+        for wanted in params["categories"].split(","):
+            if wanted == "restaurants" and is_restaurant(aliases):
+                return True
+            if any(a in CATEGORY_FILTERS.get(wanted, {wanted}) for a in aliases):
+                return True
+        return False
+    term = params.get("term", "restaurants").lower()
+    if term == "restaurants":
+        return is_restaurant(aliases)
+    return any(a in TERM_ALIASES.get(term, {term}) for a in aliases)
+
+
+def fake_response(params: dict) -> dict:
+    # businesses of the fake world within the search circle, most-reviewed first
+    lat, lon = float(params["latitude"]), float(params["longitude"])
+    radius = float(params.get("radius", 1000))
+    limit, offset = int(params.get("limit", 20)), int(params.get("offset", 0))
+    dlat = math.degrees(radius / EARTH_RADIUS_M)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    hits = []
+    for i in range(math.floor((lat - dlat) / CELL_DEG), math.floor((lat + dlat) / CELL_DEG) + 1):
+        for j in range(math.floor((lon - dlon) / CELL_DEG), math.floor((lon + dlon) / CELL_DEG) + 1):
+            for b in cell_businesses(i, j):
+                c = b["coordinates"]
+                p1, p2 = math.radians(lat), math.radians(c["latitude"])
+                a = (math.sin((p2 - p1) / 2) ** 2
+                     + math.cos(p1) * math.cos(p2) * math.sin(math.radians(c["longitude"] - lon) / 2) ** 2)
+                if 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a)) <= radius and _matches(b, params):
+                    hits.append(b)
+    hits.sort(key=lambda b: (-b["review_count"], b["id"]))
+    return {"total": len(hits), "businesses": hits[offset:offset + limit]}
+
+
+class FakeYelpServer:
+    # Local stand-in for /v3/businesses/search over the fake world above, with a fixed
+    # per-request latency and an optional share of HTTP 429 responses. Point the scraper
+    # at it via YELP_SEARCH_URL.
+    def __init__(self, port: int = 0, latency: float = 0.05, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/v3/businesses/search"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                with server.lock:
+                    server.requests += 1
+                    n = server.requests
+                time.sleep(server.latency)
+                if server.error_rate and (n * 2654435761) % 1000 < server.error_rate * 1000:
+                    code, body = 429, {"error": {"code": "TOO_MANY_REQUESTS_PER_SECOND"}}
+                elif int(params.get("offset", 0)) + int(params.get("limit", 20)) > MAX_RESULTS:
+                    code, body = 400, {"error": {"code": "VALIDATION_ERROR"}}
+                else:
+                    code, body = 200, fake_response(params)
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "FakeYelpServer":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Yelp search endpoint for local scraper runs")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429")
+    args = parser.parse_args()
+
+    server = FakeYelpServer(args.port, args.latency, args.error_rate)
+    print(f"fake Yelp on {server.url} (export YELP_SEARCH_URL={server.url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
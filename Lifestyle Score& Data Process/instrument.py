@@ -0,0 +1,165 @@
+import atexit
+import functools
+import json
+import os
+import resource
+import threading
+import time
+
+import numpy as np
+
+# Tracing is off unless URBURN_TRACE names a JSONL file; span() then returns a shared
+# no-op object and traced() returns the function unchanged, so the hooks cost nothing.
+# URBURN_PROFILE additionally names a cProfile dump (pstats format; snakeviz,
+# speedscope and py-spy's viewers read it) written at exit.
+TRACE_ENV = "URBURN_TRACE"
+PROFILE_ENV = "URBURN_PROFILE"
+TRACE_FILE = os.environ.get(TRACE_ENV, "")
+PROFILE_FILE = os.environ.get(PROFILE_ENV, "")
+ENABLED = bool(TRACE_FILE)
+# =========================================
+
+_write_lock = threading.Lock()
+_stacks = {}    # thread id -> open spans, innermost last
+_profiler = None
+
+
+def _emit(event: dict) -> None:
+    line = json.dumps(event, default=str)
+    with _write_lock:
+        with open(TRACE_FILE, "a") as f:
+            f.write(line + "\n")
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return float("nan")
+
+
+def _start_profiler() -> None:
+    global _profiler
+    if PROFILE_FILE and _profiler is None:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+        atexit.register(_dump_profile)
+
+
+def _dump_profile() -> None:
+    _profiler.disable()
+    _profiler.dump_stats(PROFILE_FILE.replace("{pid}", str(os.getpid())))
+
+
+class Span:
+    # One timed region. `rows` can be set inside the block; HTTP calls made while the
+    # span is innermost (on this thread, or from pool threads while it is open on the
+    # main thread) are counted on it.
+    def __init__(self, name: str, **fields):
+        self.name = name
+        self.fields = fields
+        self.rows = fields.pop("rows", None)
+        self.http = []    # (status, seconds)
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        stack = _stacks.setdefault(threading.get_ident(), [])
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_rss = _rss_mb()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        _stacks[threading.get_ident()].pop()
+        event = {
+            "type": "span", "name": self.name, "parent": self.parent, "pid": os.getpid(),
+            "ts": round(time.time(), 3), "wall_s": round(wall, 6), "cpu_s": round(cpu, 6),
+            "rss_mb": round(_rss_mb(), 1), "rss_delta_mb": round(_rss_mb() - self.start_rss, 1),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "rows": self.rows, "error": exc_type.__name__ if exc_type else None, **self.fields,
+        }
+        if self.http:
+            status = [s for s, _ in self.http]
+            ms = np.array([t for _, t in self.http]) * 1000
+            event["http"] = {
+                "count": len(self.http),
+                "status": {str(s): status.count(s) for s in sorted(set(status), key=str)},
+                "ms_mean": round(float(ms.mean()), 2), "ms_p50": round(float(np.percentile(ms, 50)), 2),
+                "ms_p95": round(float(np.percentile(ms, 95)), 2), "ms_max": round(float(ms.max()), 2),
+            }
+        _emit(event)
+        return False
+
+    def add(self, **fields) -> None:
+        self.fields.update(fields)
+
+
+class _NoopSpan:
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def add(self, **fields) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **fields):
+    if not ENABLED:
+        return _NOOP
+    _start_profiler()
+    return Span(name, **fields)
+
+
+def traced(name: str = None):
+    # decorator form of span(); rows are taken from len() of a DataFrame/array result
+    def wrap(func):
+        if not ENABLED:
+            return func
+        label = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            with span(label) as s:
+                out = func(*args, **kwargs)
+                s.rows = _rows(out)
+                return out
+        return inner
+    return wrap
+
+
+def _rows(out):
+    # len() of a DataFrame/array result, or of the first item of a tuple result
+    if isinstance(out, tuple) and out:
+        out = out[0]
+    if hasattr(out, "__len__") and not isinstance(out, (str, dict)):
+        return len(out)
+    return None
+
+
+def record_http(url: str, status, seconds: float, **fields) -> None:
+    # one "http" event per external call, also aggregated on the innermost open span
+    if not ENABLED:
+        return
+    stack = _stacks.get(threading.get_ident()) or _stacks.get(threading.main_thread().ident) or []
+    owner = stack[-1] if stack else None
+    if owner is not None:
+        with owner.lock:
+            owner.http.append((status, seconds))
+    _emit({"type": "http", "span": owner.name if owner else None, "pid": os.getpid(), "ts": round(time.time(), 3),
+           "url": url, "status": status, "ms": round(seconds * 1000, 2), **fields})
@@ -0,0 +1,291 @@
+import argparse
+import io
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from datasets import HAS_ARROW, HOUSE_COLUMNS, KEY, normalize_zip
+from instrument import span
+
+# written beside, never over, DMV_House_Price_Data.csv (price_history / transit_features read that)
+OUTPUT_FILE = "./urburn_dataset/DMV_House_Price_Data_Listings.csv"
+
+BLOCK_BYTES = 64 * 2 ** 20      # CSV bytes parsed per task; bounds each worker's memory
+RELATIVE_ACCURACY = 0.01        # sketch quantiles are within 1% of a true listing price
+QUANTILES = {"Price_P10": 0.1, "Price_P25": 0.25, "MedianPrice": 0.5, "Price_P75": 0.75, "Price_P90": 0.9}
+# input column -> candidate names in listing exports, first match wins (case-insensitive)
+COLUMN_CANDIDATES = {
+    "zip": ["ZipCode", "zip_code", "zip", "zipcode_5", "zip5", "zip_5", "RegionName", "postal_code", "postalcode", "postcode"],
+    "price": ["Price", "ListPrice", "list_price", "SalePrice", "sale_price"],
+    "lat": ["Latitude", "lat"],
+    "lon": ["Longitude", "lon", "lng"],
+    "city": ["City"],
+    "state": ["State", "StateName"],
+}
+# =========================================
+
+
+# -----------------------------
+# Per-ZIP mergeable sketch: log-spaced buckets with relative accuracy (DDSketch-style)
+# -----------------------------
+class ZipSketch:
+    # counts: (ZipCode, bucket) -> listings, where bucket i holds prices in
+    # (gamma^(i-1), gamma^i]; stats: per-ZIP count / sum / min / max and coordinate sums.
+    # Two sketches merge by adding counts and combining stats, so blocks can be sketched
+    # in any order on any worker and merged at the end with the same result.
+    def __init__(self, alpha: float = RELATIVE_ACCURACY):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.counts = pd.Series(dtype="int64", index=pd.MultiIndex.from_arrays([[], []], names=[KEY, "bucket"]))
+        self.stats = pd.DataFrame(columns=["n", "sum", "min", "max", "lat_sum", "lon_sum", "geo_n", "City", "State"])
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, alpha: float = RELATIVE_ACCURACY) -> "ZipSketch":
+        # df: ZipCode, price and optionally lat / lon / City / State
+        sketch = cls(alpha)
+        df = df[np.isfinite(df["price"]) & (df["price"] > 0)]
+        if df.empty:
+            return sketch
+        bucket = np.ceil(np.log(df["price"].to_numpy()) / np.log(sketch.gamma)).astype(np.int32)
+        sketch.counts = df.groupby([df[KEY].to_numpy(), bucket]).size().rename_axis([KEY, "bucket"]).astype("int64")
+
+        has_geo = df["lat"].notna() & df["lon"].notna() if "lat" in df else pd.Series(False, index=df.index)
+        g = df.assign(lat=df["lat"].where(has_geo, 0.0) if "lat" in df else 0.0,
+                      lon=df["lon"].where(has_geo, 0.0) if "lon" in df else 0.0,
+                      geo=has_geo.astype(int)).groupby(KEY)
+        stats = pd.DataFrame({"n": g.size(), "sum": g["price"].sum(), "min": g["price"].min(),
+                              "max": g["price"].max(), "lat_sum": g["lat"].sum(), "lon_sum": g["lon"].sum(),
+                              "geo_n": g["geo"].sum()})
+        for col in ("City", "State"):
+            stats[col] = g[col].first() if col in df else None
+        sketch.stats = stats
+        return sketch
+
+    def merge(self, other: "ZipSketch") -> "ZipSketch":
+        if other.alpha != self.alpha:
+            raise ValueError("cannot merge sketches with different accuracy")
+        if other.stats.empty:
+            return self
+        if self.stats.empty:
+            self.counts, self.stats = other.counts, other.stats
+            return self
+        self.counts = self.counts.add(other.counts, fill_value=0).astype("int64")
+        a, b = self.stats.align(other.stats, join="outer")
+        merged = a[["n", "sum", "lat_sum", "lon_sum", "geo_n"]].fillna(0) + b[["n", "sum", "lat_sum", "lon_sum", "geo_n"]].fillna(0)
+        merged["min"] = np.fmin(a["min"].astype(float), b["min"].astype(float))
+        merged["max"] = np.fmax(a["max"].astype(float), b["max"].astype(float))
+        for col in ("City", "State"):
+            merged[col] = a[col].combine_first(b[col])
+        self.stats = merged
+        return self
+
+    def quantiles(self, qs: dict = QUANTILES) -> pd.DataFrame:
+        # one column per quantile, found for every ZIP at once with a global cumsum and
+        # searchsorted; values are bucket midpoints (relative error <= alpha)
+        counts = self.counts[self.counts > 0].sort_index()
+        zips = counts.index.get_level_values(KEY)
+        buckets = counts.index.get_level_values("bucket").to_numpy(dtype=float)
+        cum = np.cumsum(counts.to_numpy())
+        first = np.r_[True, zips[1:] != zips[:-1]]
+        starts = np.flatnonzero(first)
+        offset = np.r_[0, cum[starts[1:] - 1]]
+        totals = np.r_[cum[starts[1:] - 1], cum[-1:]] - offset
+        out = pd.DataFrame(index=pd.Index(zips[first], name=KEY))
+        for col, q in qs.items():
+            rank = offset + np.floor(q * (totals - 1)) + 1
+            idx = np.searchsorted(cum, rank)
+            out[col] = 2 * self.gamma ** buckets[idx] / (self.gamma + 1)
+        return out
+
+    def summary(self, qs: dict = QUANTILES) -> pd.DataFrame:
+        stats = self.stats
+        out = self.quantiles(qs)
+        out["Listing_Count"] = stats["n"].astype("int64")
+        out["Price_Mean"] = stats["sum"] / stats["n"]
+        geo = stats["geo_n"].replace(0, np.nan)
+        out["Latitude"] = stats["lat_sum"] / geo
+        out["Longitude"] = stats["lon_sum"] / geo
+        out["City"] = stats["City"]
+        out["State"] = stats["State"]
+        return out
+
+
+# -----------------------------
+# Bounded-memory tasks: newline-aligned CSV byte blocks or Parquet row groups
+# -----------------------------
+def resolve_columns(header, overrides: dict = None) -> dict:
+    # logical name -> column in this file (zip and price are required); an override must
+    # match exactly, candidates match ignoring case
+    overrides = overrides or {}
+    header = list(header)
+    lower = {}
+    for col in header:
+        lower.setdefault(col.lower(), col)
+    found = {}
+    for name, candidates in COLUMN_CANDIDATES.items():
+        if overrides.get(name):
+            match = overrides[name] if overrides[name] in header else None
+        else:
+            match = next((lower[c.lower()] for c in candidates if c.lower() in lower), None)
+        if match is not None:
+            found[name] = match
+    missing = [n for n in ("zip", "price") if n not in found]
+    if missing:
+        raise ValueError(f"no {' / '.join(missing)} column among {list(header)[:20]}")
+    return found
+
+
+def file_columns(path: str, overrides: dict = None) -> dict:
+    # resolved once per file in the parent, so a bad header fails before any task starts
+    if os.path.splitext(path)[1].lower() == ".parquet":
+        if not HAS_ARROW:
+            raise ImportError(f"reading {path} needs pyarrow (pip install pyarrow)")
+        import pyarrow.parquet as pq
+        header = pq.ParquetFile(path).schema_arrow.names
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+    try:
+        return resolve_columns(header, overrides)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+
+def plan_tasks(paths, block_bytes: int = BLOCK_BYTES) -> list:
+    tasks = []
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".parquet":
+            if not HAS_ARROW:
+                raise ImportError(f"reading {path} needs pyarrow (pip install pyarrow)")
+            import pyarrow.parquet as pq
+            tasks += [(path, "parquet", g, None) for g in range(pq.ParquetFile(path).num_row_groups)]
+            continue
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            f.readline()
+            start = f.tell()
+            while start < size:
+                f.seek(min(start + block_bytes, size))
+                if f.tell() < size:
+                    f.readline()    # extend to the end of the current line
+                end = f.tell()
+                tasks.append((path, "csv", start, end))
+                start = end
+    return tasks
+
+
+def read_task(task, cols: dict) -> pd.DataFrame:
+    # cols: file_columns() for the task's file. Assumes listing rows carry no quoted
+    # newlines, so byte blocks split on line ends
+    path, kind, a, b = task
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+        raw = pq.ParquetFile(path).read_row_group(a, columns=list(cols.values())).to_pandas()
+    else:
+        with open(path, "rb") as f:
+            header = f.readline()
+            f.seek(a)
+            body = f.read(b - a)
+        raw = pd.read_csv(io.BytesIO(header + body), usecols=list(cols.values()),
+                          dtype={cols["zip"]: "string"}, low_memory=False)
+    df = pd.DataFrame({KEY: normalize_zip(raw[cols["zip"]]),
+                       "price": pd.to_numeric(raw[cols["price"]], errors="coerce").to_numpy(dtype=float)})
+    for name in ("lat", "lon"):
+        if name in cols:
+            df[name] = pd.to_numeric(raw[cols[name]], errors="coerce").to_numpy(dtype=float)
+    for name, col in (("city", "City"), ("state", "State")):
+        if name in cols:
+            df[col] = raw[cols[name]].to_numpy()
+    return df[df[KEY].notna()]
+
+
+def sketch_task(task, cols: dict, alpha: float = RELATIVE_ACCURACY) -> ZipSketch:
+    return ZipSketch.from_frame(read_task(task, cols), alpha)
+
+
+def ingest(paths, jobs: int = None, block_bytes: int = BLOCK_BYTES, overrides: dict = None,
+           alpha: float = RELATIVE_ACCURACY) -> ZipSketch:
+    # at most 2 x jobs blocks are in flight, so memory stays bounded whatever the input size
+    columns = {path: file_columns(path, overrides) for path in paths}
+    tasks = plan_tasks(paths, block_bytes)
+    jobs = jobs or os.cpu_count() or 1
+    total = ZipSketch(alpha)
+    with span("listings.ingest", files=len(paths), tasks=len(tasks)) as s:
+        if jobs == 1:
+            for done, task in enumerate(tasks, 1):
+                total.merge(sketch_task(task, columns[task[0]], alpha))
+                print(f"[{done}/{len(tasks)}] blocks sketched...", end="\r")
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                queue = list(reversed(tasks))
+                running = set()
+                done = 0
+                while queue or running:
+                    while queue and len(running) < 2 * jobs:
+                        task = queue.pop()
+                        running.add(pool.submit(sketch_task, task, columns[task[0]], alpha))
+                    finished, running = wait(running, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        total.merge(fut.result())
+                        done += 1
+                    print(f"[{done}/{len(tasks)}] blocks sketched...", end="\r")
+        print()
+        s.rows = int(total.stats["n"].sum()) if not total.stats.empty else 0
+    return total
+
+
+# -----------------------------
+# House-schema output
+# -----------------------------
+def house_table(sketch: ZipSketch, min_listings: int = 1, stations: str = None, history: str = None) -> pd.DataFrame:
+    # DMV_House_Price_Data.csv columns first (transit columns when a station file is
+    # given, growth columns from a price_history store), then the extra percentiles
+    summary = sketch.summary()
+    summary = summary[summary["Listing_Count"] >= min_listings].reset_index()
+    out = pd.DataFrame({KEY: summary[KEY]})
+    for col in HOUSE_COLUMNS:
+        out[col] = summary[col] if col in summary else np.nan
+
+    if stations:
+        from transit_features import StationIndex, load_stations, refresh_transit_columns
+        geo = out["Latitude"].notna() & out["Longitude"].notna()
+        refreshed = refresh_transit_columns(out[geo], StationIndex(load_stations(stations)))
+        out = pd.concat([refreshed, out[~geo]]).sort_index()
+    if history:
+        from price_history import PriceHistory, refresh_growth_columns
+        out = refresh_growth_columns(out, PriceHistory(history))
+
+    extras = [c for c in summary.columns if c not in out.columns]
+    return pd.concat([out, summary[extras]], axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream listing files into per-ZIP price medians and percentiles")
+    parser.add_argument("inputs", nargs="+", help="listing CSV / Parquet files")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--jobs", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--block-mb", type=float, default=BLOCK_BYTES / 2 ** 20)
+    parser.add_argument("--alpha", type=float, default=RELATIVE_ACCURACY, help="relative accuracy of the quantiles")
+    parser.add_argument("--min-listings", type=int, default=5, help="drop ZIPs with fewer listings")
+    for name in COLUMN_CANDIDATES:
+        parser.add_argument(f"--{name}-col", help=f"{name} column (default: first of {COLUMN_CANDIDATES[name]})")
+    parser.add_argument("--stations", help="station CSV; fills NearestStation / MetroDistanceMeters / DistanceToDC_Meters")
+    parser.add_argument("--history", help="price_history.py store; fills Growth_* / Price_Volatility")
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        if not os.path.exists(path):
+            print(f"Error: {path}")
+            exit()
+
+    overrides = {name: getattr(args, f"{name}_col") for name in COLUMN_CANDIDATES}
+    sketch = ingest(args.inputs, args.jobs, int(args.block_mb * 2 ** 20), overrides, args.alpha)
+    out = house_table(sketch, args.min_listings, args.stations, args.history)
+    out.to_csv(args.output, index=False)
+    print(f"{len(out)} zip codes from {int(out['Listing_Count'].sum())} listings: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
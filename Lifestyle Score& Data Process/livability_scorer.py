@@ -0,0 +1,169 @@
+import copy
+import json
+
+import numpy as np
+import pandas as pd
+
+from instrument import traced
+
+# name -> (source column(s), log1p?, invert?)
+# invert=True means "smaller is better" (distances), i.e. score = 1 - minmax(x)
+SUB_FEATURES = {
+    "Metro": (["MetroDistanceMeters"], True, True),
+    "DC": (["DistanceToDC_Meters"], True, True),
+    "Rest_Count": (["Yelp_Restaurant_Count"], True, False),
+    "Rating": (["Yelp_Avg_Rating"], False, False),
+    "Diversity": (["Num_Thai", "Num_Japanese", "Num_Italian", "Num_American"], False, False),
+    "Coffee": (["Num_Coffee"], False, False),
+    "Bars": (["Num_Bars"], False, False),
+    "HighEnd": (["Num_HighEnd_Price4"], False, False),
+}
+# neighbourhood means of the Yelp sub-features (<col>_Lag from spatial_graph.add_spatial_lags);
+# they only count when a weight config gives them a weight
+LAG_SUFFIX = "_Lag"
+SUB_FEATURES.update({
+    name + LAG_SUFFIX: ([c + LAG_SUFFIX for c in cols], use_log, invert)
+    for name, (cols, use_log, invert) in list(SUB_FEATURES.items()) if name not in ("Metro", "DC")
+})
+# review-text sentiment per ZIP (review_sentiment.py); scored as Score_Sentiment with weight 0
+# unless a weight config weights it (see OPTIONAL_SCORES), e.g.
+# "Score_Sentiment": {"weight": 0.1, "Sentiment": 1.0}
+SUB_FEATURES["Sentiment"] = (["Yelp_Sentiment"], False, False)
+# sub-features whose columns only exist when the matching stage ran; a missing column
+# reads as 0 for these, while any other weighted sub-feature raises (raw_features)
+OPTIONAL_FEATURES = {name for name in SUB_FEATURES if name.endswith(LAG_SUFFIX)} | {"Sentiment"}
+FEATURE_NAMES = list(SUB_FEATURES)
+
+# sub-score -> its weight in Livability_Score plus the weights of its sub-features
+DEFAULT_WEIGHTS = {
+    "Score_Transport": {"weight": 0.4, "Metro": 0.7, "DC": 0.3},
+    "Score_Food": {"weight": 0.3, "Rest_Count": 0.6, "Rating": 0.4},
+    "Score_Lifestyle": {"weight": 0.3, "Diversity": 0.3, "Coffee": 0.3, "Bars": 0.2, "HighEnd": 0.2},
+}
+SCORE_COLUMNS = list(DEFAULT_WEIGHTS) + ["Livability_Score"]
+# sub-score -> (input column, weights) added whenever the column is present and the
+# weight config does not define it; weight 0 keeps Livability_Score unchanged
+OPTIONAL_SCORES = {
+    "Score_Sentiment": ("Yelp_Sentiment", {"weight": 0.0, "Sentiment": 1.0}),
+}
+
+
+def load_weights(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def with_optional_scores(weights: dict, columns) -> dict:
+    # weights (default: DEFAULT_WEIGHTS) plus the OPTIONAL_SCORES whose column is in `columns`
+    weights = copy.deepcopy(weights or DEFAULT_WEIGHTS)
+    for score, (column, spec) in OPTIONAL_SCORES.items():
+        if column in columns and score not in weights:
+            weights[score] = dict(spec)
+    return weights
+
+
+class LivabilityScorer:
+    # Min-max normalises the sub-features and combines them with a weight config,
+    # as one (n x features) @ (features x sub-scores) product.
+    # fit() keeps the per-feature min/max so new ZIPs are scored on the same scale.
+    def __init__(self, weights: dict = None):
+        self.weights = copy.deepcopy(weights or DEFAULT_WEIGHTS)
+        self.score_names = list(self.weights)
+        self.sub_weights = np.zeros((len(FEATURE_NAMES), len(self.score_names)))
+        self.score_weights = np.zeros(len(self.score_names))
+        for j, score in enumerate(self.score_names):
+            for key, w in self.weights[score].items():
+                if key == "weight":
+                    self.score_weights[j] = w
+                elif key in SUB_FEATURES:
+                    self.sub_weights[FEATURE_NAMES.index(key), j] = w
+                else:
+                    raise ValueError(f"Unknown sub-feature '{key}' in {score}")
+        self.invert = np.array([SUB_FEATURES[name][2] for name in FEATURE_NAMES])
+        self.min_ = None
+        self.max_ = None
+
+    @property
+    def feature_weights(self) -> np.ndarray:
+        # effective weight of each normalised sub-feature in Livability_Score (before x100)
+        return self.sub_weights @ self.score_weights
+
+    def raw_features(self, df: pd.DataFrame) -> np.ndarray:
+        # a missing column adds nothing to its feature, which is only allowed for the
+        # OPTIONAL_FEATURES and for features no sub-score weights
+        weighted = self.sub_weights.any(axis=1)
+        missing = [f"{name} ({c})" for k, name in enumerate(FEATURE_NAMES)
+                   if weighted[k] and name not in OPTIONAL_FEATURES
+                   for c in SUB_FEATURES[name][0] if c not in df.columns]
+        if missing:
+            raise ValueError(f"input columns missing for weighted sub-features: {', '.join(missing)}")
+        X = np.zeros((len(df), len(FEATURE_NAMES)))
+        for k, name in enumerate(FEATURE_NAMES):
+            cols, use_log, _ = SUB_FEATURES[name]
+            for col in cols:
+                if col in df.columns:
+                    X[:, k] += pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=float)
+            if use_log:
+                X[:, k] = np.log1p(X[:, k])
+        return X
+
+    @traced("scorer.fit")
+    def fit(self, df: pd.DataFrame) -> "LivabilityScorer":
+        X = self.raw_features(df)
+        self.min_ = X.min(axis=0)
+        self.max_ = X.max(axis=0)
+        return self
+
+    def normalize(self, df: pd.DataFrame) -> np.ndarray:
+        if self.min_ is None:
+            raise RuntimeError("LivabilityScorer is not fitted; call fit() or load() first")
+        X = self.raw_features(df)
+        span = self.max_ - self.min_
+        span[span == 0] = 1.0  # same as MinMaxScaler for constant columns
+        N = (X - self.min_) / span
+        N[:, self.invert] = 1 - N[:, self.invert]
+        return N
+
+    def score_matrix(self, N: np.ndarray) -> np.ndarray:
+        # columns: one per sub-score, then the 0-100 Livability_Score
+        S = N @ self.sub_weights
+        livability = np.round((S @ self.score_weights) * 100, 1)
+        return np.column_stack([S, livability])
+
+    @traced("scorer.transform")
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        scores = self.score_matrix(self.normalize(df))
+        return pd.DataFrame(scores, columns=self.score_names + ["Livability_Score"], index=df.index)
+
+    def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.fit(df).transform(df)
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        # df with the sub-scores and Livability_Score appended (or replaced)
+        scores = self.transform(df)
+        out = df.drop(columns=[c for c in scores.columns if c in df.columns])
+        return pd.concat([out, scores], axis=1)
+
+    def to_dict(self) -> dict:
+        return {
+            "weights": self.weights,
+            "features": FEATURE_NAMES,
+            "min": None if self.min_ is None else self.min_.tolist(),
+            "max": None if self.max_ is None else self.max_.tolist(),
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "LivabilityScorer":
+        with open(path) as f:
+            state = json.load(f)
+        if state["features"] != FEATURE_NAMES:
+            raise ValueError(f"{path} was fitted on features {state['features']}, expected {FEATURE_NAMES}")
+        scorer = cls(state["weights"])
+        if state["min"] is not None:
+            scorer.min_ = np.array(state["min"], dtype=float)
+            scorer.max_ = np.array(state["max"], dtype=float)
+        return scorer
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from datasets import KEY, normalize_zip, read_table
+
+STORE_DIR = "./urburn_dataset/price_history"
+HOUSE_FILE = "./urburn_dataset/DMV_House_Price_Data.csv"
+OUTPUT_FILE = "./urburn_dataset/DMV_House_Price_Data_History.csv"
+
+VALUES_FILE = "values.f32"
+META_FILE = "meta.json"
+# Growth_* column -> horizon in months
+HORIZONS = {"Growth_1Y": 12, "Growth_3Y": 36, "Growth_5Y": 60, "Growth_10Y": 120}
+VOL_WINDOW = 120            # months of month-over-month changes behind Price_Volatility
+ZILLOW_ZIP_COL = "RegionName"
+MONTH_COLUMN = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
+# =========================================
+
+
+# -----------------------------
+# Store: float32 values on disk, one row of ZIPs per month
+# -----------------------------
+class PriceHistory:
+    # values.f32 holds a (months x ZIPs) float32 array and meta.json the ZIP index and
+    # first month. Month-major on disk means a monthly refresh is a single tail write of
+    # one row; `matrix` gives the same memory map as a ZIP x month view. NaN = no value.
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, META_FILE)) as f:
+            meta = json.load(f)
+        self.zips = pd.Index(meta["zips"], name=KEY)
+        self.start = pd.Period(meta["start"], freq="M")
+        self.n_months = meta["months"]
+        self.values = self._map()
+
+    def _map(self):
+        if self.n_months == 0:
+            return np.zeros((0, len(self.zips)), dtype=np.float32)
+        return np.memmap(os.path.join(self.store_dir, VALUES_FILE), dtype=np.float32, mode="r",
+                         shape=(self.n_months, len(self.zips)))
+
+    @classmethod
+    def create(cls, store_dir: str, zips, start: str) -> "PriceHistory":
+        os.makedirs(store_dir, exist_ok=True)
+        zips = normalize_zip(pd.Series(list(zips))).tolist()
+        if len(set(zips)) != len(zips):
+            raise ValueError("duplicate ZIP codes in the store index")
+        open(os.path.join(store_dir, VALUES_FILE), "wb").close()
+        _write_meta(store_dir, {"zips": zips, "start": str(pd.Period(start, freq="M")), "months": 0})
+        return cls(store_dir)
+
+    @property
+    def months(self) -> pd.PeriodIndex:
+        return pd.period_range(self.start, periods=self.n_months, freq="M")
+
+    @property
+    def end(self) -> pd.Period:
+        return self.start + (self.n_months - 1)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self.values.T
+
+    def append_month(self, values: pd.Series, month: str = None) -> None:
+        # values: price per ZipCode for the month after the last stored one. ZIPs not in
+        # the index are dropped (see extend_zips); missing ZIPs are stored as NaN.
+        month = pd.Period(month, freq="M") if month else self.start + self.n_months
+        if month != self.start + self.n_months:
+            raise ValueError(f"expected {self.start + self.n_months}, got {month}; months are append-only")
+        values = pd.Series(values.to_numpy(), index=normalize_zip(pd.Series(values.index)))
+        row = values[~values.index.duplicated()].reindex(self.zips).to_numpy(dtype=np.float32)
+        self.append_rows(row[None, :])
+
+    def append_rows(self, rows: np.ndarray) -> None:
+        # bytes past the recorded month count (an interrupted append) are cut off first,
+        # then the new rows go on the end; the history itself is never rewritten
+        rows = np.ascontiguousarray(rows, dtype=np.float32)
+        if rows.ndim != 2 or rows.shape[1] != len(self.zips):
+            raise ValueError(f"expected rows of {len(self.zips)} ZIPs, got shape {rows.shape}")
+        self.values = None
+        with open(os.path.join(self.store_dir, VALUES_FILE), "r+b") as f:
+            f.truncate(self.n_months * len(self.zips) * 4)
+            f.seek(0, os.SEEK_END)
+            f.write(rows.tobytes())
+        self.n_months += len(rows)
+        _write_meta(self.store_dir, self._meta())
+        self.values = self._map()
+
+    def extend_zips(self, new_zips) -> None:
+        # new ZIPs widen every row, so unlike append_month this rewrites the file
+        new_zips = [z for z in normalize_zip(pd.Series(list(new_zips))).unique() if z not in self.zips]
+        if not new_zips:
+            return
+        old = np.array(self.values)
+        self.values = None
+        wide = np.full((self.n_months, len(self.zips) + len(new_zips)), np.nan, dtype=np.float32)
+        wide[:, :len(self.zips)] = old
+        tmp = os.path.join(self.store_dir, VALUES_FILE + ".tmp")
+        wide.tofile(tmp)
+        os.replace(tmp, os.path.join(self.store_dir, VALUES_FILE))
+        self.zips = self.zips.append(pd.Index(new_zips, name=KEY))
+        _write_meta(self.store_dir, self._meta())
+        self.values = self._map()
+
+    def _meta(self) -> dict:
+        return {"zips": self.zips.tolist(), "start": str(self.start), "months": self.n_months}
+
+    def series(self, zip_code: str) -> pd.Series:
+        return pd.Series(self.values[:, self.zips.get_loc(zip_code)], index=self.months, name=zip_code)
+
+    # -----------------------------
+    # Metrics for every ZIP at once (vectorised over the month axis)
+    # -----------------------------
+    def _t(self, at) -> int:
+        # month row for `at`: None = latest, an int indexes like a list (-1 = latest),
+        # anything else is a month inside the stored range
+        if at is None:
+            return self.n_months - 1
+        if isinstance(at, (int, np.integer)):
+            t = int(at) + self.n_months if at < 0 else int(at)
+        else:
+            t = (pd.Period(at, freq="M") - self.start).n
+        if not 0 <= t < self.n_months:
+            raise ValueError(f"{at} is outside the stored months {self.start}..{self.end}")
+        return t
+
+    def growth(self, months: int, at=None) -> np.ndarray:
+        t = self._t(at)
+        if t - months < 0:
+            return np.full(len(self.zips), np.nan, dtype=np.float32)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.values[t] / self.values[t - months] - 1
+
+    def returns(self, window: int = None, at=None) -> np.ndarray:
+        # month-over-month changes over the trailing window, (window x ZIPs)
+        t = self._t(at)
+        lo = 0 if window is None else max(t - window, 0)
+        V = np.asarray(self.values[lo:t + 1], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return V[1:] / V[:-1] - 1
+
+    def volatility(self, window: int = VOL_WINDOW, at=None) -> np.ndarray:
+        # std of the month-over-month changes in the trailing window, NaN months skipped
+        R = self.returns(window, at)
+        ok = np.isfinite(R)
+        n = ok.sum(axis=0)
+        R = np.where(ok, R, 0.0)
+        mean = R.sum(axis=0) / np.maximum(n, 1)
+        var = (np.where(ok, R - mean, 0.0) ** 2).sum(axis=0) / np.maximum(n - 1, 1)
+        return np.where(n > 1, np.sqrt(var), np.nan)
+
+    def rolling_volatility(self, window: int = 12) -> np.ndarray:
+        # (months x ZIPs) trailing std of monthly changes from running sums, O(months x ZIPs);
+        # row t covers the changes into months t-window+1..t
+        R = self.returns()
+        out = np.full((self.n_months, len(self.zips)), np.nan)
+        if len(R) < window:
+            return out
+        ok = np.isfinite(R)
+        R = np.where(ok, R, 0.0)
+        zero = np.zeros((1, R.shape[1]))
+        sums = []
+        for a in (ok.astype(float), R, R * R):
+            c = np.vstack([zero, np.cumsum(a, axis=0)])
+            sums.append(c[window:] - c[:-window])
+        n, s, ss = sums
+        with np.errstate(divide="ignore", invalid="ignore"):
+            var = (ss - s * s / n) / (n - 1)
+        out[window:] = np.where(n > 1, np.sqrt(np.maximum(var, 0)), np.nan)
+        return out
+
+    def drawdowns(self, at=None) -> tuple:
+        # (current drawdown, max drawdown) from the running peak, both <= 0
+        t = self._t(at)
+        V = np.asarray(self.values[:t + 1], dtype=np.float64)
+        peak = np.fmax.accumulate(V, axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            dd = V / peak - 1
+        return dd[-1], np.fmin.reduce(dd, axis=0)
+
+    def snapshot(self, at=None, horizons: dict = None, vol_window: int = VOL_WINDOW) -> pd.DataFrame:
+        # one row per ZIP in the house-price schema, as of month `at` (default: latest)
+        t = self._t(at)
+        out = pd.DataFrame({KEY: self.zips.to_numpy(), "MedianPrice": np.asarray(self.values[t], dtype=np.float64)})
+        for col, months in (horizons or HORIZONS).items():
+            out[col] = self.growth(months, t)
+        out["Price_Volatility"] = self.volatility(vol_window, t)
+        out["Current_Drawdown"], out["Max_Drawdown"] = self.drawdowns(t)
+        return out
+
+
+def _write_meta(store_dir: str, meta: dict) -> None:
+    tmp = os.path.join(store_dir, META_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(store_dir, META_FILE))
+
+
+# -----------------------------
+# Import / refresh helpers
+# -----------------------------
+def import_zillow(path: str, store_dir: str, chunk_months: int = 60) -> PriceHistory:
+    # Zillow-style wide CSV: one row per ZIP (RegionName), one column per month
+    header = pd.read_csv(path, nrows=0).columns
+    month_cols = sorted((c for c in header if MONTH_COLUMN.match(c)), key=lambda c: pd.Period(c[:7], freq="M"))
+    if not month_cols:
+        raise ValueError(f"{path} has no YYYY-MM[-DD] month columns")
+    zip_col = ZILLOW_ZIP_COL if ZILLOW_ZIP_COL in header else KEY
+    wide = pd.read_csv(path, usecols=[zip_col] + month_cols, dtype={zip_col: "string"})
+    wide[zip_col] = normalize_zip(wide[zip_col])
+    wide = wide.drop_duplicates(zip_col).set_index(zip_col)
+
+    months = pd.PeriodIndex([c[:7] for c in month_cols], freq="M")
+    full = pd.period_range(months[0], months[-1], freq="M")
+    wide.columns = months
+    wide = wide.T.reindex(full)    # gaps in the monthly sequence become NaN rows
+
+    store = PriceHistory.create(store_dir, wide.columns, str(full[0]))
+    for start in range(0, len(wide), chunk_months):
+        store.append_rows(wide.iloc[start:start + chunk_months].to_numpy(dtype=np.float32))
+    return store
+
+
+def refresh_growth_columns(df: pd.DataFrame, store: PriceHistory, at=None) -> pd.DataFrame:
+    # replace Growth_* / Price_Volatility from the store and append the drawdowns.
+    # Only ZIPs missing from the store keep their old values; a stored ZIP whose horizon
+    # reaches before the first month gets NaN, so an as-of snapshot never mixes in
+    # present-day growth.
+    snap = store.snapshot(at).drop(columns=["MedianPrice"]).set_index(KEY)
+    out = df.copy()
+    keys = normalize_zip(out[KEY])
+    stored = keys.isin(store.zips).to_numpy()
+    for col in snap.columns:
+        new = keys.map(snap[col]).to_numpy(dtype=float)
+        if col in out.columns:
+            old = pd.to_numeric(out[col], errors="coerce").to_numpy(dtype=float)
+            new = np.where(stored, new, old)
+        out[col] = new
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monthly ZIP price history: import, append and growth metrics")
+    parser.add_argument("command", choices=["import", "append", "metrics", "refresh"])
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--input", help="import: Zillow-style wide CSV; append: CSV with ZipCode and --value-col")
+    parser.add_argument("--month", help="append: YYYY-MM (default: the month after the last one)")
+    parser.add_argument("--value-col", default="MedianPrice")
+    parser.add_argument("--at", help="metrics/refresh: as of this YYYY-MM (default: latest)")
+    parser.add_argument("--house", default=HOUSE_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        store = import_zillow(args.input, args.store)
+        print(f"{len(store.zips)} ZIPs x {store.n_months} months ({store.start}..{store.end}): {args.store}")
+        return
+
+    store = PriceHistory(args.store)
+    if args.command == "append":
+        table = read_table(args.input)
+        store.append_month(table.set_index(KEY)[args.value_col], args.month)
+        print(f"appended {store.end}; {store.n_months} months stored")
+    elif args.command == "metrics":
+        snap = store.snapshot(args.at)
+        snap.to_csv(args.output, index=False)
+        print(f"metrics as of {args.at or store.end} for {len(snap)} ZIPs: {args.output}")
+    else:
+        out = refresh_growth_columns(read_table(args.house), store, args.at)
+        out.to_csv(args.output, index=False)
+        print(f"growth columns from {store.n_months} months of history: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
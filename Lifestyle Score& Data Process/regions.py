@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from datasets import KEY, read_table, write_table
+from instrument import span
+from livability_scorer import LivabilityScorer
+from transit_features import DC_CORE, StationIndex, haversine_meters, load_stations, refresh_transit_columns
+
+REGIONS_FILE = "./urburn_dataset/regions.json"
+# file names every shard keeps, so the per-metro scripts run unchanged on a shard directory
+HOUSE_FILE = "DMV_House_Price_Data.csv"
+YELP_FILE = "DMV_Yelp_Dataset.csv"
+
+# name -> region; regions.json uses the same layout (core / landmarks as [lat, lon],
+# bbox as [min_lat, min_lon, max_lat, max_lon], optional "stations" CSV relative to the
+# JSON file). No station file ships with the dataset, so the DMV shard keeps the
+# MetroDistanceMeters / NearestStation values already in DMV_House_Price_Data.csv.
+DEFAULT_REGIONS = {
+    "dmv": {
+        "title": "DMV Area",
+        "core": list(DC_CORE),
+        "landmarks": {"DC Core": [38.9072, -77.0369], "Dulles Airport": [38.9531, -77.4565],
+                      "Alexandria": [38.8048, -77.0469]},
+        "bbox": [37.8, -78.7, 39.8, -76.2],
+    },
+}
+# =========================================
+
+
+# -----------------------------
+# Region: the per-metro constants that used to be hard-wired to DC
+# -----------------------------
+class Region:
+    # DistanceToDC_Meters keeps its column name but is measured from `core`, so every
+    # downstream script reads the region's centrality feature without changes.
+    def __init__(self, name: str, title: str, core, landmarks: dict, bbox, stations: str = None):
+        self.name = name
+        self.title = title
+        self.core = tuple(core)
+        self.landmarks = {k: tuple(v) for k, v in landmarks.items()}
+        self.bbox = tuple(bbox)
+        self.stations = stations
+
+    def contains(self, lat, lon) -> np.ndarray:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        return (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+
+    def to_dict(self) -> dict:
+        return {"title": self.title, "core": list(self.core), "bbox": list(self.bbox), "stations": self.stations,
+                "landmarks": {k: list(v) for k, v in self.landmarks.items()}}
+
+
+def load_regions(path: str = None) -> dict:
+    # regions.json when it exists, else DEFAULT_REGIONS (stations resolved next to the file)
+    config, base = DEFAULT_REGIONS, os.path.dirname(REGIONS_FILE)
+    if path and os.path.exists(path):
+        with open(path) as f:
+            config, base = json.load(f), os.path.dirname(os.path.abspath(path))
+    regions = {}
+    for name, spec in config.items():
+        stations = spec.get("stations")
+        if stations and not os.path.isabs(stations):
+            stations = os.path.join(base, stations)
+        regions[name] = Region(name, spec.get("title", name), spec["core"], spec.get("landmarks", {}),
+                               spec["bbox"], stations)
+    return regions
+
+
+def assign_regions(df: pd.DataFrame, regions: dict) -> pd.Series:
+    # a ZIP belongs to the region whose bbox holds it; where bboxes overlap, to the
+    # nearest core. ZIPs outside every bbox get NaN.
+    lat = df["Latitude"].to_numpy(dtype=float)
+    lon = df["Longitude"].to_numpy(dtype=float)
+    names = list(regions)
+    dist = np.full((len(df), len(names)), np.inf)
+    for j, name in enumerate(names):
+        region = regions[name]
+        inside = region.contains(lat, lon)
+        dist[inside, j] = haversine_meters(lat[inside], lon[inside], *region.core)
+    best = dist.argmin(axis=1) if names else np.zeros(len(df), dtype=int)
+    found = np.isfinite(dist.min(axis=1)) if names else np.zeros(len(df), dtype=bool)
+    return pd.Series(np.where(found, np.array(names + [None], dtype=object)[best], None), index=df.index,
+                     name="Region")
+
+
+# -----------------------------
+# Shards: one directory per region holding that region's house / Yelp tables
+# -----------------------------
+def localize(df: pd.DataFrame, region: Region) -> pd.DataFrame:
+    # transit columns from the region's stations and distance to the region's core
+    df = df.copy()
+    if region.stations and not os.path.exists(region.stations):
+        raise FileNotFoundError(f"stations file for region '{region.name}' not found: {region.stations}")
+    if region.stations:
+        return refresh_transit_columns(df, StationIndex(load_stations(region.stations)), core=region.core)
+    df["DistanceToDC_Meters"] = haversine_meters(df["Latitude"].to_numpy(dtype=float),
+                                                 df["Longitude"].to_numpy(dtype=float), *region.core).round(2)
+    return df
+
+
+def split_dataset(house: str, yelp: str, regions: dict, out_dir: str) -> dict:
+    # writes <out_dir>/<region>/{DMV_House_Price_Data,DMV_Yelp_Dataset}.csv; returns ZIPs per region
+    house_df, yelp_df = read_table(house), read_table(yelp)
+    label = assign_regions(house_df, regions)
+    yelp_label = yelp_df[KEY].astype(str).map(dict(zip(house_df[KEY].astype(str), label)))
+    counts = {}
+    for name, region in regions.items():
+        shard = os.path.join(out_dir, name)
+        os.makedirs(shard, exist_ok=True)
+        with span("regions.split", region=name) as s:
+            h = localize(house_df[label == name].reset_index(drop=True), region)
+            y = yelp_df[yelp_label == name].reset_index(drop=True)
+            transit = [c for c in h.columns if c in y.columns and c != KEY]
+            y[transit] = y[[KEY]].merge(h[[KEY] + transit], on=KEY, how="left")[transit].to_numpy()
+            write_table(h, os.path.join(shard, HOUSE_FILE))
+            write_table(y, os.path.join(shard, YELP_FILE))
+            s.rows = counts[name] = len(h)
+    dropped = int(label.isna().sum())
+    if dropped:
+        print(f"{dropped} ZIPs fall outside every region bbox and were left out")
+    return counts
+
+
+# -----------------------------
+# Cross-region normalisation
+# -----------------------------
+def merged_scorer(scorer_paths) -> LivabilityScorer:
+    # per-region min/max are mergeable: the pooled scale is their elementwise min / max
+    scorers = [LivabilityScorer.load(p) for p in scorer_paths]
+    if any(s.weights != scorers[0].weights for s in scorers[1:]):
+        raise ValueError("regions were scored with different weight configs")
+    merged = LivabilityScorer(scorers[0].weights)
+    merged.min_ = np.min([s.min_ for s in scorers], axis=0)
+    merged.max_ = np.max([s.max_ for s in scorers], axis=0)
+    return merged
+
+
+def normalize_regions(shard_dirs: dict, out_path: str, scorer_out: str = None) -> pd.DataFrame:
+    # shard_dirs: region -> shard work dir (Final_Project_Data_With_Scores.csv,
+    # livability_scorer.json and optionally UC/ZIP_Residuals.csv). Adds the score on the
+    # pooled scale, the in-region percentile, and residuals in region standard deviations.
+    frames = []
+    for name, shard in shard_dirs.items():
+        df = read_table(os.path.join(shard, "Final_Project_Data_With_Scores.csv"))
+        df.insert(1, "Region", name)
+        residuals = os.path.join(shard, "UC", "ZIP_Residuals.csv")
+        if os.path.exists(residuals):
+            res = read_table(residuals, columns=[KEY, "Residual"])
+            df = df.merge(res, on=KEY, how="left")
+            df["Residual_Z"] = df["Residual"] / df["Residual"].std()
+        df["Livability_Region_Pct"] = df["Livability_Score"].rank(pct=True).round(4)
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True)
+
+    scorer = merged_scorer([os.path.join(shard, "livability_scorer.json") for shard in shard_dirs.values()])
+    df["Livability_Score_Global"] = scorer.transform(df)["Livability_Score"].to_numpy()
+    if scorer_out:
+        scorer.save(scorer_out)
+    front = [KEY, "Region", "City", "State", "MedianPrice", "Livability_Score", "Livability_Score_Global",
+             "Livability_Region_Pct"] + [c for c in ("Residual", "Residual_Z") if c in df.columns]
+    df = df[[c for c in front if c in df.columns] + [c for c in df.columns if c not in front]]
+    write_table(df, out_path)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split the dataset into per-region shards and normalise across them")
+    parser.add_argument("command", choices=["list", "split", "normalize"])
+    parser.add_argument("--regions-file", default=REGIONS_FILE)
+    parser.add_argument("--regions", nargs="*", help="region names (default: all)")
+    parser.add_argument("--house", help="split: house price table")
+    parser.add_argument("--yelp", help="split: merged Yelp dataset")
+    parser.add_argument("--out-dir", default="./regions", help="split: shard root; normalize: shard root to read")
+    parser.add_argument("--output", default="All_Regions_Scores.csv", help="normalize: combined table")
+    parser.add_argument("--scorer", help="normalize: where to save the pooled scorer stats")
+    args = parser.parse_args()
+
+    regions = load_regions(args.regions_file)
+    if args.regions:
+        missing = [r for r in args.regions if r not in regions]
+        if missing:
+            parser.error(f"unknown regions: {', '.join(missing)}")
+        regions = {r: regions[r] for r in args.regions}
+
+    if args.command == "list":
+        for name, region in regions.items():
+            print(f"{name}: {region.title} core={region.core} bbox={region.bbox} stations={region.stations}")
+    elif args.command == "split":
+        if not args.house or not args.yelp:
+            parser.error("split needs --house and --yelp")
+        for name, n in split_dataset(args.house, args.yelp, regions, args.out_dir).items():
+            print(f"{name}: {n} ZIPs -> {os.path.join(args.out_dir, name)}")
+    else:
+        shards = {name: os.path.join(args.out_dir, name) for name in regions}
+        df = normalize_regions(shards, args.output, args.scorer)
+        print(f"{len(df)} ZIPs across {len(shards)} regions: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
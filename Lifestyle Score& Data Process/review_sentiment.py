@@ -0,0 +1,284 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+
+from datasets import KEY, normalize_zip, read_table
+from instrument import span
+
+REVIEWS_FILE = "./urburn_dataset/yelp_academic_dataset_review.json"
+BUSINESS_FILE = "./urburn_dataset/yelp_academic_dataset_business.json"
+CACHE_FILE = "review_sentiment.sqlite"
+OUTPUT_FILE = "./urburn_dataset/Yelp_Sentiment.csv"
+
+BATCH_SIZE = 20000          # reviews per worker task
+SQL_CHUNK = 900             # ids per "IN (...)" lookup (SQLite variable limit)
+NORMALIZE_ALPHA = 15        # VADER-style squash: s / sqrt(s^2 + alpha) maps sums to (-1, 1)
+NEGATION_SCALE = -0.74      # valence of a word inside a negation window ("not good")
+PRIOR_REVIEWS = 20          # ZIP means are shrunk toward the overall mean with this many pseudo-reviews
+
+# word -> valence on the VADER -4..4 scale; a small restaurant-review lexicon used when
+# no --lexicon file is given (a VADER lexicon file can replace it)
+LEXICON = {
+    "amazing": 2.8, "awesome": 3.1, "best": 3.2, "delicious": 2.9, "excellent": 2.7, "fantastic": 2.6,
+    "fresh": 1.3, "friendly": 2.2, "good": 1.9, "great": 3.1, "happy": 2.7, "helpful": 1.8,
+    "incredible": 2.6, "love": 3.2, "loved": 2.9, "lovely": 2.8, "nice": 1.8, "perfect": 2.7,
+    "pleasant": 2.3, "recommend": 1.5, "recommended": 1.8, "tasty": 2.0, "wonderful": 2.7, "yummy": 2.4,
+    "attentive": 1.6, "authentic": 1.4, "clean": 1.7, "cozy": 1.6, "flavorful": 2.0, "generous": 2.3,
+    "favorite": 2.0, "fast": 0.8, "beautiful": 2.9, "enjoy": 2.2, "enjoyed": 2.3, "impressed": 2.1,
+    "outstanding": 3.0, "polite": 1.7, "quick": 0.9, "reasonable": 1.0, "solid": 1.3, "superb": 3.1,
+    "worth": 0.9, "welcoming": 1.9, "cheap": 0.3, "affordable": 1.4, "gem": 2.2, "satisfied": 1.8,
+    "bad": -2.5, "awful": -2.0, "bland": -1.4, "boring": -1.3, "burnt": -1.5, "cold": -0.7,
+    "dirty": -1.9, "disappointed": -1.9, "disappointing": -2.2, "disgusting": -2.9, "expensive": -0.9,
+    "gross": -2.1, "horrible": -2.5, "mediocre": -1.1, "meh": -0.9, "nasty": -2.6, "overpriced": -1.8,
+    "poor": -2.1, "rude": -2.0, "slow": -1.2, "soggy": -1.4, "stale": -1.6, "terrible": -2.1,
+    "worst": -3.1, "wrong": -2.1, "hate": -2.7, "hated": -3.2, "sick": -1.7, "unfriendly": -1.9,
+    "overcooked": -1.5, "undercooked": -1.6, "greasy": -1.2, "salty": -0.8, "dry": -0.8, "noisy": -1.1,
+    "crowded": -0.9, "wait": -0.4, "waited": -0.7, "never": -0.3, "avoid": -1.7, "complaint": -1.6,
+    "unacceptable": -2.0, "ignored": -1.6, "lukewarm": -1.0, "inedible": -2.4, "filthy": -2.4,
+    "refund": -0.8, "waste": -1.8, "mess": -1.5, "tasteless": -1.9, "annoying": -1.7, "sad": -2.1,
+}
+TOKEN_PATTERN = r"(?u)\b[a-z][a-z_']+\b"
+# a negator flips the next three words ("wasn't very good" -> not_very not_good)
+NEGATION_RE = re.compile(r"\b(?:not|no|never|cannot|without|hardly|[a-z]+n't)\b((?:[ \t]+[a-z']+){1,3})")
+# =========================================
+
+
+# -----------------------------
+# Lexicon scoring: one sparse (reviews x lexicon) count matrix times the valence vector
+# -----------------------------
+def load_lexicon(path: str = None) -> dict:
+    # built-in LEXICON, or a "word<TAB>valence[...]" file such as vader_lexicon.txt
+    if not path:
+        return dict(LEXICON)
+    table = pd.read_csv(path, sep="\t", header=None, usecols=[0, 1], names=["word", "valence"],
+                        quoting=3, keep_default_na=False)
+    return dict(zip(table["word"].str.lower(), table["valence"].astype(float)))
+
+
+def lexicon_digest(lexicon: dict) -> str:
+    # cached scores are only reused for the lexicon they were computed with
+    text = json.dumps(sorted(lexicon.items())) + f"|{NORMALIZE_ALPHA}|{NEGATION_SCALE}"
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+def mark_negation(text: str) -> str:
+    text = text.lower()
+    return NEGATION_RE.sub(lambda m: m.group(0)[:m.start(1) - m.start(0)]
+                           + re.sub(r"([a-z']+)", r"not_\1", m.group(1)), text)
+
+
+class LexiconScorer:
+    # vocabulary = lexicon words plus their not_ forms, so tokenising, counting and
+    # weighting a batch is one CountVectorizer.transform and one sparse mat-vec
+    def __init__(self, lexicon: dict):
+        words = sorted(lexicon)
+        self.vocabulary = words + ["not_" + w for w in words]
+        self.valence = np.array([lexicon[w] for w in words] + [lexicon[w] * NEGATION_SCALE for w in words])
+        self.vectorizer = CountVectorizer(vocabulary=self.vocabulary, token_pattern=TOKEN_PATTERN,
+                                          preprocessor=mark_negation)
+
+    def score(self, texts) -> np.ndarray:
+        # compound sentiment in (-1, 1) per text; texts without lexicon words score 0
+        X = self.vectorizer.transform(pd.Series(texts).fillna("").astype(str))
+        s = X @ self.valence
+        return (s / np.sqrt(s * s + NORMALIZE_ALPHA)).astype(np.float32)
+
+
+_worker_scorer = None
+
+
+def _init_worker(lexicon: dict):
+    global _worker_scorer
+    _worker_scorer = LexiconScorer(lexicon)
+
+
+def _score_batch(texts) -> np.ndarray:
+    return _worker_scorer.score(texts)
+
+
+# -----------------------------
+# Review-id cache: re-runs only score reviews not yet scored with this lexicon
+# -----------------------------
+class SentimentCache:
+    def __init__(self, path: str = CACHE_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reviews (
+                review_id   TEXT PRIMARY KEY,
+                business_id TEXT NOT NULL,
+                stars       REAL,
+                sentiment   REAL NOT NULL,
+                lexicon     TEXT NOT NULL,
+                scored_at   REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def known(self, review_ids, lexicon: str) -> set:
+        ids = list(review_ids)
+        found = set()
+        for start in range(0, len(ids), SQL_CHUNK):
+            chunk = ids[start:start + SQL_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT review_id FROM reviews WHERE lexicon = ? AND review_id IN ({','.join('?' * len(chunk))})",
+                [lexicon] + chunk)
+            found.update(r[0] for r in rows)
+        return found
+
+    def put(self, reviews: pd.DataFrame, sentiment: np.ndarray, lexicon: str) -> None:
+        now = time.time()
+        stars = reviews["stars"] if "stars" in reviews else pd.Series(np.nan, index=reviews.index)
+        rows = zip(reviews["review_id"].astype(str), reviews["business_id"].astype(str),
+                   stars.astype(float), sentiment.astype(float),
+                   [lexicon] * len(reviews), [now] * len(reviews))
+        self.conn.executemany("INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def business_sentiment(self, lexicon: str) -> pd.DataFrame:
+        # per business: review count and sentiment sum over every cached review
+        return pd.read_sql_query(
+            "SELECT business_id, COUNT(*) AS reviews, SUM(sentiment) AS sentiment_sum, AVG(stars) AS stars "
+            "FROM reviews WHERE lexicon = ? GROUP BY business_id", self.conn, params=[lexicon])
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+# -----------------------------
+# Streaming: review dump -> batches -> worker pool -> cache
+# -----------------------------
+def read_reviews(path: str, batch_size: int = BATCH_SIZE):
+    # JSON lines (Yelp Open Dataset) or CSV with review_id, business_id, text[, stars]
+    if path.lower().endswith(".csv"):
+        chunks = pd.read_csv(path, chunksize=batch_size, dtype={"review_id": str, "business_id": str})
+    else:
+        chunks = pd.read_json(path, lines=True, chunksize=batch_size, dtype=False)
+    for chunk in chunks:
+        yield chunk[[c for c in ("review_id", "business_id", "stars", "text") if c in chunk.columns]]
+
+
+def score_reviews(paths, cache: SentimentCache, lexicon: dict, jobs: int = None,
+                  batch_size: int = BATCH_SIZE) -> dict:
+    # only reviews missing from the cache are sent to the pool; at most 2 x jobs
+    # batches are in flight, so memory does not depend on the size of the dump
+    digest = lexicon_digest(lexicon)
+    jobs = jobs or os.cpu_count() or 1
+    stats = {"read": 0, "cached": 0, "scored": 0}
+    with span("sentiment.score", files=len(paths)) as s, \
+            ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(lexicon,)) as pool:
+        running = {}
+
+        def drain(block: bool):
+            done, _ = wait(running, return_when=FIRST_COMPLETED) if block else (
+                [f for f in running if f.done()], None)
+            for fut in done:
+                batch = running.pop(fut)
+                cache.put(batch, fut.result(), digest)
+                stats["scored"] += len(batch)
+
+        for path in paths:
+            for chunk in read_reviews(path, batch_size):
+                chunk = chunk.dropna(subset=["review_id", "business_id"]).drop_duplicates("review_id")
+                stats["read"] += len(chunk)
+                fresh = chunk[~chunk["review_id"].astype(str).isin(cache.known(chunk["review_id"].astype(str), digest))]
+                stats["cached"] += len(chunk) - len(fresh)
+                if len(fresh):
+                    while len(running) >= 2 * jobs:
+                        drain(block=True)
+                    running[pool.submit(_score_batch, fresh["text"].tolist())] = fresh.drop(columns="text")
+                drain(block=False)
+                print(f"{stats['read']} reviews read, {stats['scored']} scored, {stats['cached']} cached",
+                      end="\r")
+        while running:
+            drain(block=True)
+        print()
+        s.rows = stats["read"]
+        s.add(scored=stats["scored"], cached=stats["cached"])
+    return stats
+
+
+# -----------------------------
+# Business -> ZIP aggregation
+# -----------------------------
+def business_zips(path: str, boundaries: str = None) -> pd.DataFrame:
+    # business_id -> ZipCode from the business dump's postal_code, or by ZCTA polygon
+    # (zcta_geometry.py) when --boundaries is given
+    if path.lower().endswith((".json", ".jsonl")):
+        frames = [c[[col for col in ("business_id", "postal_code", "latitude", "longitude") if col in c.columns]]
+                  for c in pd.read_json(path, lines=True, chunksize=100000, dtype=False)]
+        biz = pd.concat(frames, ignore_index=True)
+    else:
+        biz = read_table(path)
+    if boundaries:
+        from zcta_geometry import ZctaIndex, load_boundaries
+        index = ZctaIndex(load_boundaries(boundaries))
+        zips = index.zip_codes(index.assign(biz["latitude"], biz["longitude"]))
+    else:
+        zips = normalize_zip(biz["postal_code"]).where(biz["postal_code"].astype(str).str.len() > 0)
+    return pd.DataFrame({"business_id": biz["business_id"].astype(str), KEY: zips}).dropna()
+
+
+def zip_sentiment(business: pd.DataFrame, zips: pd.DataFrame, prior: float = PRIOR_REVIEWS) -> pd.DataFrame:
+    # review-weighted mean per ZIP, shrunk toward the overall mean so ZIPs with a
+    # handful of reviews do not land at the extremes
+    df = business.merge(zips, on="business_id", how="inner")
+    overall = df["sentiment_sum"].sum() / max(df["reviews"].sum(), 1)
+    g = df.groupby(KEY)
+    out = pd.DataFrame({"n": g["reviews"].sum(), "s": g["sentiment_sum"].sum(), "b": g.size()})
+    return pd.DataFrame({
+        KEY: out.index,
+        "Yelp_Sentiment": ((out["s"] + prior * overall) / (out["n"] + prior)).round(4).to_numpy(),
+        "Yelp_Sentiment_Reviews": out["n"].astype(np.int64).to_numpy(),
+        "Yelp_Sentiment_Businesses": out["b"].astype(np.int64).to_numpy(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score review text and aggregate sentiment per ZIP code")
+    parser.add_argument("--reviews", nargs="+", default=[REVIEWS_FILE], help="review JSONL / CSV dumps")
+    parser.add_argument("--businesses", default=BUSINESS_FILE, help="business JSONL / table with postal_code")
+    parser.add_argument("--boundaries", help="assign businesses by ZCTA polygon instead of postal_code")
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--lexicon", help="word<TAB>valence file (default: built-in restaurant lexicon)")
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    for path in args.reviews + [args.businesses]:
+        if not os.path.exists(path):
+            print(f"Error: {path}")
+            exit()
+
+    lexicon = load_lexicon(args.lexicon)
+    cache = SentimentCache(args.cache)
+    stats = score_reviews(args.reviews, cache, lexicon, args.jobs, args.batch_size)
+    print(f"{stats['scored']} reviews scored, {stats['cached']} reused from {args.cache}")
+
+    business = cache.business_sentiment(lexicon_digest(lexicon))
+    cache.close()
+    out = zip_sentiment(business, business_zips(args.businesses, args.boundaries))
+    out.to_csv(args.output, index=False)
+    print(f"{len(out)} zip codes from {len(business)} businesses: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
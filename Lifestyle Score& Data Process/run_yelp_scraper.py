@@ -1,111 +1,347 @@
+import argparse
+import numpy as np
 import pandas as pd
 import requests
+import threading
 import time
 import os
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from requests.adapters import HTTPAdapter
+from yelp_cache import ResponseCache, CACHE_FILE, DEFAULT_TTL_DAYS, cache_key
+from datasets import HAS_ARROW, write_table
+from instrument import record_http, traced
+from yelp_tiles import BUSINESS_DB, MAX_RESULTS, PAGE_LIMIT, TILE_SIZE_M, BusinessStore, TileGrid, zip_counts
 
-API_KEY = "" 
+API_KEY = os.environ.get("YELP_API_KEY", "")
 
 if os.path.exists("Yelp_Data.csv"):
     INPUT_FILE = "Yelp_Data.csv"
 else:
     INPUT_FILE = "Yelp_Data_v2.csv"
 
-OUTPUT_YELP_ONLY = "Yelp_Raw_Data.csv"          
-OUTPUT_FULL_MERGED = "DMV_Completed_Dataset.csv" 
+OUTPUT_YELP_ONLY = "Yelp_Raw_Data.csv"
+OUTPUT_YELP_TABLE = "Yelp_Data.parquet"      # compact hand-off for the next stages
+OUTPUT_FULL_MERGED = "DMV_Completed_Dataset.csv"
+OUTPUT_FAILED = "Yelp_Failed_ZipCodes.csv"
+
+YELP_SEARCH_URL = os.environ.get("YELP_SEARCH_URL", "https://api.yelp.com/v3/businesses/search")  # fake_yelp.py for local runs
+SEARCH_RADIUS = 1000
+RATE_LIMIT_QPS = 5      # set to the Yelp API quota (requests per second)
+MAX_WORKERS = 16        # concurrent connections in the shared pool
+CACHE_TTL_DAYS = DEFAULT_TTL_DAYS
 # =========================================
 
-def get_yelp_data(api_key, lat, lon):
-    headers = {"Authorization": f"Bearer {api_key}"}
-    url = "https://api.yelp.com/v3/businesses/search"
-    
+# column -> search term for the limit=1 "how many are there" sub-queries
+COUNT_TERMS = {
+    "Num_Thai": "Thai",
+    "Num_Coffee": "Coffee",
+    "Num_FastFood": "Fast Food",
+    "Num_Japanese": "Japanese",
+    "Num_Italian": "Italian",
+    "Num_American": "American",
+    "Num_Bars": "Bars",
+}
+COUNT_COLUMNS = list(COUNT_TERMS) + ["Num_HighEnd_Price4"]
+
+
+class YelpRequestError(Exception):
+    def __init__(self, status_code, params):
+        super().__init__(f"HTTP {status_code} for {params.get('term')} @ ({params.get('latitude')}, {params.get('longitude')})")
+        self.status_code = status_code
+
+
+class TokenBucket:
+    # Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`.
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_session(api_key, pool_size=MAX_WORKERS):
+    session = requests.Session()
+    session.headers.update({"Authorization": f"Bearer {api_key}"})
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def build_queries(lat, lon, radius=SEARCH_RADIUS):
     base_params = {
         "latitude": lat,
         "longitude": lon,
-        "radius": 1000, 
+        "radius": radius,
     }
-    
+    queries = {"general": {**base_params, "term": "restaurants", "sort_by": "review_count", "limit": 50}}
+    for col, term in COUNT_TERMS.items():
+        queries[col] = {**base_params, "term": term, "limit": 1}
+    queries["Num_HighEnd_Price4"] = {**base_params, "term": "restaurants", "price": "4", "limit": 1} # $$$$
+    return queries
+
+
+def fetch(session, limiter, params, cache=None):
+    if cache is not None:
+        data = cache.get(params)
+        if data is not None:
+            return data
+    if limiter is not None:
+        limiter.acquire()
+    start = time.perf_counter()
+    try:
+        res = session.get(YELP_SEARCH_URL, params=params, timeout=30)
+    except requests.RequestException as e:
+        record_http(YELP_SEARCH_URL, type(e).__name__, time.perf_counter() - start, term=params.get("term"))
+        raise
+    record_http(YELP_SEARCH_URL, res.status_code, time.perf_counter() - start, term=params.get("term"))
+    if res.status_code != 200:
+        # never cached: a failed query must be retried on the next run, not read back as zeros
+        raise YelpRequestError(res.status_code, params)
+    data = res.json()
+    if cache is not None:
+        cache.put(params, data)
+    return data
+
+
+def summarize(zipcode, responses):
+    # responses must hold every query from build_queries; incomplete ZIPs are not summarized
+    general = responses["general"]
+    record = {"ZipCode": str(zipcode)}
+
+    businesses = general.get("businesses", [])
+    record["Yelp_Restaurant_Count"] = general.get("total", 0)
+
+    if businesses:
+        avg_rating = sum([b['rating'] for b in businesses]) / len(businesses)
+        avg_review_count = sum([b['review_count'] for b in businesses]) / len(businesses)
+    else:
+        avg_rating = 0
+        avg_review_count = 0
+    record["Yelp_Avg_Rating"] = round(avg_rating, 2)
+    record["Yelp_Avg_Review_Count"] = round(avg_review_count, 1)
+
+    for col in COUNT_COLUMNS:
+        record[col] = responses[col].get("total", 0)
+    return record
+
+
+def get_yelp_data(api_key, lat, lon, session=None, limiter=None, cache=None):
+    # Single-ZIP serial lookup, kept for ad-hoc use; bulk runs go through collect_yelp_data.
+    # Errors propagate to the caller instead of turning into a row of zeros.
+    session = session or make_session(api_key)
+    responses = {name: fetch(session, limiter, params, cache) for name, params in build_queries(lat, lon).items()}
+    record = summarize("", responses)
+    return tuple(record[c] for c in ["Yelp_Restaurant_Count", "Yelp_Avg_Rating", "Yelp_Avg_Review_Count"] + COUNT_COLUMNS)
+
+
+@traced("yelp.collect")
+def collect_yelp_data(df, api_key, qps=RATE_LIMIT_QPS, workers=MAX_WORKERS, cache=None):
+    # Every (ZIP, sub-query) pair goes into one pool, so throughput is bounded by
+    # the token bucket instead of by 9 sequential round trips per ZIP.
+    # Returns (records, failed): ZIPs with any failed query are listed in `failed`
+    # with the error and left out of `records`; a rerun refetches only those
+    # queries because everything that succeeded is already in `cache`.
+    session = make_session(api_key, workers)
+    limiter = TokenBucket(qps)
+    responses = defaultdict(dict)
+    errors = {}
+
+    pool = ThreadPoolExecutor(max_workers=workers)
     try:
-        params_general = base_params.copy()
-        params_general.update({"term": "restaurants", "sort_by": "review_count", "limit": 50})
-        
-        res = requests.get(url, headers=headers, params=params_general)
-        if res.status_code != 200: return 0, 0, 0, 0, 0, 0, 0, 0, 0
-            
-        data = res.json()
-        total_rest_count = data.get("total", 0)
-        businesses = data.get("businesses", [])
-        
-        if businesses:
-            avg_rating = sum([b['rating'] for b in businesses]) / len(businesses)
-            avg_review_count = sum([b['review_count'] for b in businesses]) / len(businesses)
+        futures = {}
+        for i, row in df.iterrows():
+            for name, params in build_queries(row['Latitude'], row['Longitude']).items():
+                futures[pool.submit(fetch, session, limiter, params, cache)] = (i, name)
+
+        for done, fut in enumerate(as_completed(futures), 1):
+            i, name = futures[fut]
+            try:
+                responses[i][name] = fut.result()
+            except Exception as e:
+                errors.setdefault(i, f"{name}: {e}")
+            print(f"[{done}/{len(futures)}] requests done...", end="\r")
+    except KeyboardInterrupt:
+        print("\nInterrupted: keeping completed zip codes, rerun to resume")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    n_queries = len(build_queries(0, 0))
+    records, failed = [], []
+    for i in df.index:
+        if i not in errors and len(responses[i]) == n_queries:
+            records.append(summarize(df.at[i, 'ZipCode'], responses[i]))
         else:
-            avg_rating = 0
-            avg_review_count = 0
-            
-        def get_count(term=None, price=None):
-            p = base_params.copy()
-            if term: p['term'] = term
-            if price: 
-                p['term'] = "restaurants"
-                p['price'] = price
-            p['limit'] = 1 
-            r = requests.get(url, headers=headers, params=p)
-            return r.json().get('total', 0) if r.status_code == 200 else 0
-
-        n_thai = get_count(term="Thai")
-        n_coffee = get_count(term="Coffee")
-        n_fast = get_count(term="Fast Food")
-        n_jap = get_count(term="Japanese")
-        n_ita = get_count(term="Italian")
-        n_amer = get_count(term="American") 
-        n_bars = get_count(term="Bars")    
-        n_exp = get_count(price="4") # $$$$
-        
-        return total_rest_count, avg_rating, avg_review_count, n_thai, n_coffee, n_fast, n_jap, n_ita,n_amer,n_bars, n_exp
-        
-    except Exception as e:
-        print(f" Error: {e}")
-        return 0, 0, 0, 0, 0, 0, 0, 0, 0
+            failed.append({"ZipCode": str(df.at[i, 'ZipCode']), "Error": errors.get(i, "not fetched")})
+    return records, failed
 
-if __name__ == "__main__":
-    if not os.path.exists(INPUT_FILE):
-        print(f"Error {INPUT_FILE}"); exit()
 
-    print(f"read: {INPUT_FILE}")
-    df = pd.read_csv(INPUT_FILE)
-    
+@traced("yelp.collect_tiles")
+def collect_tiles(df, api_key, store, qps=RATE_LIMIT_QPS, workers=MAX_WORKERS, cache=None,
+                  tile_size=TILE_SIZE_M, radius=SEARCH_RADIUS):
+    # Tile mode: nearby ZIPs are searched together with one circle around their ZIP
+    # circles, each tile paged through once (restaurants, bars and coffee together) into
+    # the business table, and the per-ZIP counts are derived locally. Tiles with more
+    # results than paging can reach, or that would take fewer requests in parts, are
+    # split: groups into smaller groups, single ZIPs into square tiles under their circle
+    # (TileGrid.split / should_split).
+    # Returns (records, failed, stats) like collect_yelp_data.
+    df = df.dropna(subset=['Latitude', 'Longitude'])
+    lat, lon = df['Latitude'].to_numpy(dtype=float), df['Longitude'].to_numpy(dtype=float)
+    grid = TileGrid(lat, lon, tile_size, radius)
+    session = make_session(api_key, workers)
+    limiter = TokenBucket(qps)
+    stats = {"tiles": 0, "splits": 0, "requests": 0}
+    failed_tiles = {}
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    pending = {}     # future -> (cache key, offset, tile)
+    sharers = {}     # first-page key -> tiles waiting for it
+    totals = {}      # first-page key -> total, once fetched
+    pages = set()
+
+    def request(params, offset, tile):
+        pending[pool.submit(fetch, session, limiter, params, cache)] = (cache_key(params), offset, tile)
+        stats["requests"] += 1
+
+    def search(tile):
+        # a group split down to one ZIP, and the squares around a lone ZIP, resolve to the
+        # same circle, which is then fetched once and every tile sharing it is expanded
+        # from that one answer
+        stats["tiles"] += 1
+        params = grid.params(tile)
+        key = cache_key(params)
+        if key in totals:
+            expand(tile, totals[key])
+        elif key in sharers:
+            sharers[key].append(tile)
+        else:
+            sharers[key] = [tile]
+            request(params, 0, tile)
+
+    def expand(tile, total):
+        # after the first page: split the tile, or page through the rest of its circle
+        children = grid.split(tile) if total > PAGE_LIMIT else []
+        if grid.should_split(children, total):
+            stats["splits"] += 1
+            for child in children:
+                search(child)
+            return
+        for offset in range(PAGE_LIMIT, min(total, MAX_RESULTS), PAGE_LIMIT):
+            params = grid.params(tile, offset)
+            if cache_key(params) not in pages:
+                pages.add(cache_key(params))
+                request(params, offset, tile)
+
+    try:
+        for tile in grid.cover():
+            search(tile)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                key, offset, tile = pending.pop(fut)
+                waiting = sharers.pop(key, [tile]) if offset == 0 else [tile]
+                try:
+                    data = fut.result()
+                except Exception as e:
+                    failed_tiles.update({t: str(e) for t in waiting})
+                    continue
+                store.upsert(data.get("businesses", []))
+                if offset == 0:
+                    totals[key] = data.get("total", 0)
+                    for t in waiting:
+                        expand(t, totals[key])
+            print(f"[{stats['requests'] - len(pending)}/{stats['requests']}] tile requests done, "
+                  f"{len(store)} businesses...", end="\r")
+    except KeyboardInterrupt:
+        print("\nInterrupted: completed pages are cached, rerun to resume")
+        failed_tiles["interrupted"] = "not fetched"
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    counts = zip_counts(df, store.load(), radius)
+    # a ZIP is only as complete as the tiles under its circle
+    bad = np.zeros(len(df), dtype=bool)
+    for tile in failed_tiles:
+        bad |= True if tile == "interrupted" else grid.touches(tile)
+    error = next(iter(failed_tiles.values()), "")
+    failed = [{"ZipCode": z, "Error": f"tile: {error}"} for z in counts.loc[bad, "ZipCode"]]
+    return counts.loc[~bad].to_dict("records"), failed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect Yelp amenity counts for every ZIP code centroid")
+    parser.add_argument("--input", default=INPUT_FILE, help="CSV with ZipCode, Latitude, Longitude")
+    parser.add_argument("--output", default=OUTPUT_YELP_ONLY)
+    parser.add_argument("--merged", default=OUTPUT_FULL_MERGED)
+    parser.add_argument("--table", default=OUTPUT_YELP_TABLE)
+    parser.add_argument("--failed", default=OUTPUT_FAILED)
+    parser.add_argument("--cache", default=CACHE_FILE)
+    parser.add_argument("--qps", type=float, default=RATE_LIMIT_QPS)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--mode", choices=["zip", "tiles"], default="zip",
+                        help="zip: 9 searches per ZIP; tiles: shared tiles paged once, counts derived locally")
+    parser.add_argument("--businesses", default=BUSINESS_DB, help="tiles mode: local business table")
+    parser.add_argument("--tile-size", type=float, default=TILE_SIZE_M, help="tiles mode: side of the squares a dense ZIP is split into (m)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error {args.input}"); exit()
+
+    print(f"read: {args.input}")
+    df = pd.read_csv(args.input)
+
     # df = df.head(5) # 測試用
-    
+
     print(f"read {len(df)} data...")
-    results = []
-    
-    for i, row in df.iterrows():
-        zipcode = row['ZipCode']
-        print(f"[{i+1}/{len(df)}] find Zip: {zipcode}...", end="\r")
-        
-        data = get_yelp_data(API_KEY, row['Latitude'], row['Longitude'])
-        
-        results.append({
-            "ZipCode": str(zipcode),
-            "Yelp_Restaurant_Count": data[0],
-            "Yelp_Avg_Rating": round(data[1], 2),
-            "Yelp_Avg_Review_Count": round(data[2], 1),
-            "Num_Thai": data[3],
-            "Num_Coffee": data[4],
-            "Num_FastFood": data[5],
-            "Num_Japanese": data[6],
-            "Num_Italian": data[7],
-            "Num_American": data[8], 
-            "Num_Bars": data[9],   
-            "Num_HighEnd_Price4": data[10]
-        })
-        time.sleep(0.2)
-
-    yelp_df = pd.DataFrame(results)
-    yelp_df.to_csv(OUTPUT_YELP_ONLY, index=False)
-    print(f"\n\n scuess: {OUTPUT_YELP_ONLY}")
+    cache = ResponseCache(args.cache, ttl_days=CACHE_TTL_DAYS)
+    print(f"cache: {args.cache} ({len(cache)} responses, {cache.evict()} evicted)")
+
+    start = time.time()
+    if args.mode == "tiles":
+        store = BusinessStore(args.businesses)
+        results, failed, stats = collect_tiles(df, API_KEY, store, qps=args.qps, workers=args.workers,
+                                               cache=cache, tile_size=args.tile_size)
+        print(f"\n{stats['tiles']} tiles ({stats['splits']} split), {stats['requests']} requests, "
+              f"{len(store)} businesses in {args.businesses}")
+        store.close()
+    else:
+        results, failed = collect_yelp_data(df, API_KEY, qps=args.qps, workers=args.workers, cache=cache)
+    print(f"\n{len(results)}/{len(df)} zip codes in {time.time() - start:.1f}s "
+          f"(cache hits {cache.hits}, misses {cache.misses})")
+    cache.close()
+
+    if failed:
+        pd.DataFrame(failed).to_csv(args.failed, index=False)
+        print(f"{len(failed)} zip codes failed, see {args.failed}; rerun to fetch only the missing queries")
+
+    yelp_df = pd.DataFrame(results, columns=["ZipCode", "Yelp_Restaurant_Count", "Yelp_Avg_Rating",
+                                             "Yelp_Avg_Review_Count"] + COUNT_COLUMNS)
+    yelp_df.to_csv(args.output, index=False)
+    print(f"\n\n scuess: {args.output}")
+    if HAS_ARROW:
+        write_table(yelp_df, args.table)
+        print(f"table: {args.table}")
 
     df['ZipCode'] = df['ZipCode'].astype(str)
     final_df = pd.merge(df, yelp_df, on='ZipCode', how='left')
-    final_df.to_csv(OUTPUT_FULL_MERGED, index=False)
-    print(f"combine {OUTPUT_FULL_MERGED}")
\ No newline at end of file
+    final_df.to_csv(args.merged, index=False)
+    print(f"combine {args.merged}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.neighbors import BallTree
+
+from datasets import read_table
+from instrument import traced
+from transit_features import EARTH_RADIUS_M
+
+INPUT_FILE = "./urburn_dataset/Final_Project_Data_With_Scores.csv"
+OUTPUT_DIR = "./urburn_dataset/spatial"
+
+DEFAULT_K = 8
+LAG_SUFFIX = "_Lag"
+# Yelp-derived columns whose neighbourhood average is used by scoring and clustering
+LAG_COLUMNS = ["Yelp_Restaurant_Count", "Yelp_Avg_Rating", "Num_Thai", "Num_Coffee", "Num_FastFood",
+               "Num_Japanese", "Num_Italian", "Num_American", "Num_Bars", "Num_HighEnd_Price4"]
+MORAN_COLUMNS = ["Livability_Score", "Score_Transport", "Score_Food", "Score_Lifestyle", "MedianPrice"]
+PERMUTATIONS = 999
+PERMUTATION_CHUNK = 64      # permutations drawn at once in local_moran (memory is chunk x nnz)
+ALPHA = 0.05
+QUADRANTS = np.array(["HH", "LH", "LL", "HL"])
+# =========================================
+
+
+# -----------------------------
+# Neighbour graphs as row-standardised CSR matrices (no n x n distances)
+# -----------------------------
+def _coords(df: pd.DataFrame) -> np.ndarray:
+    return np.radians(df[["Latitude", "Longitude"]].to_numpy(dtype=float))
+
+
+def _csr(rows: np.ndarray, cols: np.ndarray, n: int) -> sparse.csr_matrix:
+    W = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n, n))
+    W.sum_duplicates()
+    W.data[:] = 1.0
+    return row_standardize(W)
+
+
+def row_standardize(W: sparse.csr_matrix) -> sparse.csr_matrix:
+    # each row sums to 1, so W @ x is the neighbour mean; rows without neighbours stay 0
+    sums = np.asarray(W.sum(axis=1)).ravel()
+    sums[sums == 0] = 1.0
+    return sparse.diags(1.0 / sums) @ W
+
+
+def knn_weights(df: pd.DataFrame, k: int = DEFAULT_K) -> sparse.csr_matrix:
+    # k nearest other ZIPs by great-circle distance; a point is never its own neighbour,
+    # even when several ZIPs share a centroid
+    coords = _coords(df)
+    n = len(coords)
+    k = min(k, n - 1)
+    _, idx = BallTree(coords, metric="haversine").query(coords, k=k + 1)
+    is_self = idx == np.arange(n)[:, None]
+    order = np.argsort(is_self, axis=1, kind="stable")[:, :k]
+    cols = np.take_along_axis(idx, order, axis=1)
+    return _csr(np.repeat(np.arange(n), k), cols.ravel(), n)
+
+
+def distance_band_weights(df: pd.DataFrame, radius_m: float, min_k: int = 1) -> sparse.csr_matrix:
+    # every ZIP within radius_m; isolated ZIPs are joined to their min_k nearest so no
+    # row is empty (set min_k=0 to keep islands)
+    coords = _coords(df)
+    n = len(coords)
+    tree = BallTree(coords, metric="haversine")
+    idx = tree.query_radius(coords, r=radius_m / EARTH_RADIUS_M)
+    counts = np.array([len(i) for i in idx])
+    rows = [np.repeat(np.arange(n), counts)]
+    cols = [np.concatenate(idx) if n else np.zeros(0, dtype=int)]
+    if min_k > 0:
+        _, near = tree.query(coords, k=min(min_k + 1, n))
+        rows.append(np.repeat(np.arange(n), near.shape[1]))
+        cols.append(near.ravel())
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    keep = rows != cols
+    return _csr(rows[keep], cols[keep], n)
+
+
+def build_weights(df: pd.DataFrame, k: int = DEFAULT_K, radius_m: float = None) -> sparse.csr_matrix:
+    return distance_band_weights(df, radius_m) if radius_m else knn_weights(df, k)
+
+
+# -----------------------------
+# Spatial lag, global Moran's I and local Moran (LISA)
+# -----------------------------
+def spatial_lag(W: sparse.csr_matrix, X) -> np.ndarray:
+    return W @ np.asarray(X, dtype=float)
+
+
+@traced("spatial.lags")
+def add_spatial_lags(df: pd.DataFrame, W: sparse.csr_matrix, columns=LAG_COLUMNS,
+                     suffix: str = LAG_SUFFIX) -> pd.DataFrame:
+    # appends <col>_Lag (mean over the neighbours) for every column present in df
+    cols = [c for c in columns if c in df.columns]
+    X = df[cols].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=float)
+    lags = pd.DataFrame(spatial_lag(W, X), columns=[c + suffix for c in cols], index=df.index)
+    return pd.concat([df.drop(columns=lags.columns, errors="ignore"), lags], axis=1)
+
+
+def _center(x) -> np.ndarray:
+    x = np.asarray(x, dtype=float)
+    return x - x.mean()
+
+
+def morans_i(W: sparse.csr_matrix, x, permutations: int = PERMUTATIONS, seed: int = 0) -> dict:
+    # I with its expectation and normality-assumption z-score (all O(nnz)), plus a
+    # permutation p-value; permutations run in chunks as sparse (n x P) products
+    z = _center(x)
+    n = len(z)
+    s0 = W.sum()
+    WT = W.T.tocsr()
+    I = n / s0 * (z @ (W @ z)) / (z @ z)
+    e_i = -1.0 / (n - 1)
+    s1 = 0.5 * ((W + WT).power(2)).sum()
+    s2 = float(((np.asarray(W.sum(axis=1)).ravel() + np.asarray(W.sum(axis=0)).ravel()) ** 2).sum())
+    var_i = (n * n * s1 - n * s2 + 3 * s0 * s0) / ((n * n - 1) * s0 * s0) - e_i ** 2
+    out = {"I": float(I), "expected": e_i, "z": float((I - e_i) / np.sqrt(var_i)), "n": n, "nnz": W.nnz}
+    if permutations:
+        rng = np.random.default_rng(seed)
+        perm_i = np.empty(permutations)
+        for start in range(0, permutations, PERMUTATION_CHUNK):
+            stop = min(start + PERMUTATION_CHUNK, permutations)
+            Z = np.column_stack([rng.permutation(z) for _ in range(start, stop)])
+            perm_i[start:stop] = n / s0 * np.einsum("ij,ij->j", Z, W @ Z) / (z @ z)
+        larger = int((perm_i >= I).sum())
+        larger = min(larger, permutations - larger)
+        out["p_sim"] = (larger + 1) / (permutations + 1)
+    return out
+
+
+def local_moran(W: sparse.csr_matrix, x, permutations: int = PERMUTATIONS, seed: int = 0,
+                alpha: float = ALPHA) -> pd.DataFrame:
+    # Local Moran's I_i = z_i (W z)_i / m2 with conditional-permutation pseudo p-values:
+    # each ZIP keeps its value and its neighbour slots are refilled, without replacement,
+    # from the other n-1 ZIPs. As in esda's crand, each permutation draws one ordered
+    # sample of max-degree ZIPs shared by every row (shifted past the row's own index).
+    # Work is chunk x (n + nnz) per batch, so memory does not grow with n^2.
+    W = W.tocsr()
+    z = _center(x)
+    n = len(z)
+    m2 = (z @ z) / n
+    lag = W @ z
+    local_i = z * lag / m2
+
+    out = pd.DataFrame({"Lag": lag, "Local_I": local_i})
+    quadrant = np.where(z >= 0, np.where(lag >= 0, 0, 3), np.where(lag >= 0, 1, 2))
+    out["Quadrant"] = QUADRANTS[quadrant]
+    if not permutations:
+        return out
+
+    rng = np.random.default_rng(seed)
+    degree = np.diff(W.indptr)
+    row_of = np.repeat(np.arange(n), degree)
+    slot = np.arange(W.nnz) - W.indptr[row_of]     # position of each link within its row
+    k_max = int(degree.max()) if n else 0
+    larger = np.zeros(n, dtype=np.int64)
+    for start in range(0, permutations, PERMUTATION_CHUNK):
+        p = min(PERMUTATION_CHUNK, permutations - start)
+        # k_max distinct ZIPs out of n-1 in random order: the k_max smallest random keys
+        keys = rng.random((p, n - 1))
+        picks = np.argpartition(keys, k_max - 1, axis=1)[:, :k_max] if 0 < k_max < n - 1 else \
+            np.tile(np.arange(k_max), (p, 1))
+        picks = np.take_along_axis(picks, np.argsort(np.take_along_axis(keys, picks, axis=1), axis=1), axis=1)
+        draw = picks[:, slot]
+        draw += draw >= row_of          # skip the ZIP itself
+        slots = (np.arange(p)[:, None] * n + row_of).ravel()
+        perm_lag = np.bincount(slots, weights=(W.data * z[draw]).ravel(), minlength=p * n).reshape(p, n)
+        larger += ((z * perm_lag / m2) >= local_i).sum(axis=0)
+    larger = np.minimum(larger, permutations - larger)
+    out["P_Sim"] = (larger + 1) / (permutations + 1)
+    out["Cluster"] = np.where(out["P_Sim"] <= alpha, out["Quadrant"], "ns")
+    return out
+
+
+# -----------------------------
+# CLI: lags, global Moran's I and LISA tables for the scored dataset
+# -----------------------------
+def run_spatial(df: pd.DataFrame, W: sparse.csr_matrix, out_dir: str, columns=MORAN_COLUMNS,
+                permutations: int = PERMUTATIONS, seed: int = 0) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    lagged = add_spatial_lags(df, W)
+    keep = ["ZipCode", "City", "State"] + [c + LAG_SUFFIX for c in LAG_COLUMNS if c + LAG_SUFFIX in lagged.columns]
+    lagged[[c for c in keep if c in lagged.columns]].to_csv(os.path.join(out_dir, "Spatial_Lags.csv"), index=False)
+
+    summary = {}
+    lisa = df[[c for c in ("ZipCode", "City", "State") if c in df.columns]].copy()
+    for col in columns:
+        if col not in df.columns:
+            continue
+        x = pd.to_numeric(df[col], errors="coerce")
+        x = x.fillna(x.median()).to_numpy(dtype=float)
+        summary[col] = morans_i(W, x, permutations, seed)
+        local = local_moran(W, x, permutations, seed)
+        for name in local.columns:
+            lisa[f"{col}_{name}"] = local[name].to_numpy()
+        print(f"{col}: Moran's I={summary[col]['I']:.3f} z={summary[col]['z']:.2f} "
+              f"p_sim={summary[col].get('p_sim', float('nan')):.3f}")
+    lisa.to_csv(os.path.join(out_dir, "LISA.csv"), index=False)
+    with open(os.path.join(out_dir, "Morans_I.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spatial lags, Moran's I and LISA over ZIP centroids")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--out-dir", default=OUTPUT_DIR)
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="k nearest neighbours")
+    parser.add_argument("--radius-m", type=float, help="distance band in meters (replaces --k)")
+    parser.add_argument("--columns", nargs="+", default=MORAN_COLUMNS)
+    parser.add_argument("--permutations", type=int, default=PERMUTATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = read_table(args.input).dropna(subset=["Latitude", "Longitude"]).reset_index(drop=True)
+    W = build_weights(df, args.k, args.radius_m)
+    print(f"{len(df)} ZIPs, {W.nnz} neighbour links")
+    run_spatial(df, W, args.out_dir, args.columns, args.permutations, args.seed)
+    print(f"saved Spatial_Lags.csv, LISA.csv and Morans_I.json to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
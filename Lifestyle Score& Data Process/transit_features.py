@@ -0,0 +1,106 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+from datasets import read_table
+
+STATIONS_FILE = "./urburn_dataset/Metro_Stations.csv"
+INPUT_FILE = "./urburn_dataset/DMV_House_Price_Data.csv"
+OUTPUT_FILE = "./urburn_dataset/DMV_House_Price_Data_Transit.csv"
+
+EARTH_RADIUS_M = 6371000.0
+# Metro Center; DistanceToDC_Meters in DMV_House_Price_Data.csv is measured from here
+DC_CORE = (38.898303, -77.028099)
+# =========================================
+
+
+def haversine_meters(lat, lon, lat0, lon0):
+    lat, lon, lat0, lon0 = map(np.radians, (lat, lon, lat0, lon0))
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def load_stations(path: str = STATIONS_FILE, name_col: str = "Name",
+                  lat_col: str = "Latitude", lon_col: str = "Longitude") -> pd.DataFrame:
+    stations = pd.read_csv(path, usecols=[name_col, lat_col, lon_col])
+    stations = stations.rename(columns={name_col: "Name", lat_col: "Latitude", lon_col: "Longitude"})
+    return stations.dropna(subset=["Latitude", "Longitude"]).reset_index(drop=True)
+
+
+class StationIndex:
+    # BallTree (haversine metric) over station coordinates; queries take degree arrays
+    # and return meters, so any batch of points is answered in O(log stations) each.
+    def __init__(self, stations: pd.DataFrame):
+        self.names = stations["Name"].to_numpy()
+        coords = np.radians(stations[["Latitude", "Longitude"]].to_numpy(dtype=float))
+        self.tree = BallTree(coords, metric="haversine")
+
+    @staticmethod
+    def _query_points(lat, lon) -> np.ndarray:
+        return np.radians(np.column_stack([np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)]))
+
+    def nearest(self, lat, lon, k: int = 1):
+        # (n x k) distances in meters and station names, nearest first
+        k = min(k, len(self.names))
+        dist, idx = self.tree.query(self._query_points(lat, lon), k=k)
+        return dist * EARTH_RADIUS_M, self.names[idx]
+
+    def count_within(self, lat, lon, radius_m: float) -> np.ndarray:
+        return self.tree.query_radius(self._query_points(lat, lon), r=radius_m / EARTH_RADIUS_M, count_only=True)
+
+
+def build_transit_features(points: pd.DataFrame, index: StationIndex, k: int = 3,
+                           radii_m=(800, 1600), core=DC_CORE) -> pd.DataFrame:
+    # NearestStation / MetroDistanceMeters / DistanceToDC_Meters in the same units as
+    # DMV_House_Price_Data.csv, plus the k nearest stations and station counts per radius
+    lat = points["Latitude"].to_numpy(dtype=float)
+    lon = points["Longitude"].to_numpy(dtype=float)
+    dist, names = index.nearest(lat, lon, k=k)
+
+    out = pd.DataFrame(index=points.index)
+    out["NearestStation"] = names[:, 0]
+    out["MetroDistanceMeters"] = dist[:, 0].round(2)
+    out["DistanceToDC_Meters"] = haversine_meters(lat, lon, core[0], core[1]).round(2)
+    for j in range(1, dist.shape[1]):
+        out[f"Station_{j + 1}"] = names[:, j]
+        out[f"Station_{j + 1}_Meters"] = dist[:, j].round(2)
+    for r in radii_m:
+        out[f"Stations_Within_{int(r)}m"] = index.count_within(lat, lon, r)
+    return out
+
+
+def refresh_transit_columns(df: pd.DataFrame, index: StationIndex, **kwargs) -> pd.DataFrame:
+    # replace the precomputed transit columns, keeping column order; extra features are appended
+    features = build_transit_features(df, index, **kwargs)
+    out = df.copy()
+    for col in features.columns:
+        out[col] = features[col]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute Metro / DC distance features from a local station file")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--stations", default=STATIONS_FILE)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--radius", type=float, nargs="+", default=[800, 1600])
+    args = parser.parse_args()
+
+    for path in (args.input, args.stations):
+        if not os.path.exists(path):
+            print(f"Error: {path}")
+            exit()
+
+    df = read_table(args.input)
+    index = StationIndex(load_stations(args.stations))
+    out = refresh_transit_columns(df, index, k=args.k, radii_m=args.radius)
+    out.to_csv(args.output, index=False)
+    print(f"transit features for {len(out)} zip codes: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,87 +1,106 @@
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import MinMaxScaler
+import argparse
 import os
 
+import numpy as np
+import pandas as pd
+
+from datasets import HAS_ARROW, KEY, normalize_zip, read_table, write_table
+from livability_scorer import LivabilityScorer, load_weights, with_optional_scores
+from spatial_graph import add_spatial_lags, build_weights
+
 INPUT_FILE = "./urburn_dataset/DMV_Yelp_Dataset.csv"
 OUTPUT_FULL = "./urburn_dataset/Final_Project_Data_With_Scores.csv"
 OUTPUT_SCORES_ONLY = "./urburn_dataset/Livability_Scores_Only.csv"
+OUTPUT_SCORES_TABLE = "./urburn_dataset/Livability_Scores.parquet"
+OUTPUT_SCORER = "./urburn_dataset/livability_scorer.json"
 # =========================================
-if not os.path.exists(INPUT_FILE):
-    print(f"Error: {INPUT_FILE}")
-    exit()
-
-df = pd.read_csv(INPUT_FILE)
-print(f"Get {len(df)} data")
-
-# fill out misdata
-numeric_cols = df.select_dtypes(include=[np.number]).columns
-df[numeric_cols] = df[numeric_cols].fillna(0)
-
-scaler = MinMaxScaler()
-
-# Transport Score)
-df['Log_Metro_Dist'] = np.log1p(df['MetroDistanceMeters'])
-df['Log_DC_Dist'] = np.log1p(df['DistanceToDC_Meters'])
-
-norm_metro = 1 - scaler.fit_transform(df[['Log_Metro_Dist']])
-norm_dc = 1 - scaler.fit_transform(df[['Log_DC_Dist']])
-df['Score_Transport'] = (0.7 * norm_metro) + (0.3 * norm_dc)
-
-# Food Score
-df['Log_Rest_Count'] = np.log1p(df['Yelp_Restaurant_Count'])
-
-norm_rest_count = scaler.fit_transform(df[['Log_Rest_Count']])
-norm_rating = scaler.fit_transform(df[['Yelp_Avg_Rating']])
-
-df['Score_Food'] = (0.6 * norm_rest_count) + (0.4 * norm_rating)
-
-# Lifestyle Score
-for col in ['Num_Bars', 'Num_American', 'Num_Thai', 'Num_Japanese', 'Num_Italian', 'Num_Coffee', 'Num_HighEnd_Price4']:
-    if col not in df.columns:
-        df[col] = 0
-
-# metrics
-df['Diversity_Count'] = df['Num_Thai'] + df['Num_Japanese'] + df['Num_Italian'] + df['Num_American']
-
-norm_coffee = scaler.fit_transform(df[['Num_Coffee']])
-norm_bars = scaler.fit_transform(df[['Num_Bars']])
-norm_diversity = scaler.fit_transform(df[['Diversity_Count']])
-norm_high_end = scaler.fit_transform(df[['Num_HighEnd_Price4']])
-
-df['Score_Lifestyle'] = (0.3 * norm_diversity) + \
-                        (0.3 * norm_coffee) + \
-                        (0.2 * norm_bars) + \
-                        (0.2 * norm_high_end)
-
-# Final Livability Index
-df['Livability_Score'] = (0.4 * df['Score_Transport']) + \
-                         (0.3 * df['Score_Food']) + \
-                         (0.3 * df['Score_Lifestyle'])
-
-# turn to 0-100 score
-df['Livability_Score'] = round(df['Livability_Score'] * 100, 1)
-
-cols_to_drop = ['Log_Metro_Dist', 'Log_DC_Dist', 'Log_Rest_Count', 'Diversity_Count']
-df_final = df.drop(columns=cols_to_drop)
-
-
-
-df_final.to_csv(OUTPUT_FULL, index=False)
-print(f"save for all data: {OUTPUT_FULL}")
 
 # Scores Only
-score_cols = [
-    'ZipCode', 'City', 'State', 'MedianPrice', 
-    'Livability_Score', 'Score_Transport', 'Score_Food', 'Score_Lifestyle'
+SCORE_COLS = [
+    'ZipCode', 'City', 'State', 'MedianPrice',
+    'Livability_Score', 'Score_Transport', 'Score_Food', 'Score_Lifestyle', 'Score_Sentiment'
 ]
 
-existing_cols = [c for c in score_cols if c in df_final.columns]
-df_scores = df_final[existing_cols]
-
-df_scores.to_csv(OUTPUT_SCORES_ONLY, index=False)
-print(f"score only: {OUTPUT_SCORES_ONLY}")
 
-print("="*30)
-print("check:")
-print(df_scores.head())
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description="Compute Livability_Score for every ZIP code")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output-full", default=OUTPUT_FULL)
+    parser.add_argument("--output-scores", default=OUTPUT_SCORES_ONLY)
+    parser.add_argument("--output-table", default=OUTPUT_SCORES_TABLE,
+                        help="columnar scores hand-off read by the later stages (needs pyarrow)")
+    parser.add_argument("--weights", help="JSON weight config (default: livability_scorer.DEFAULT_WEIGHTS)")
+    parser.add_argument("--scorer", default=OUTPUT_SCORER,
+                        help="where the fitted min/max stats are saved")
+    parser.add_argument("--use-fitted", action="store_true",
+                        help="score with the stats already in --scorer instead of refitting")
+    parser.add_argument("--spatial-k", type=int, default=0,
+                        help="add <col>_Lag neighbour means over the k nearest ZIPs before scoring (0 = off)")
+    parser.add_argument("--spatial-radius-m", type=float,
+                        help="use a distance band in meters instead of k nearest for the lags")
+    parser.add_argument("--sentiment", help="per-ZIP Yelp_Sentiment table from review_sentiment.py")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: {args.input}")
+        exit()
+
+    df = read_table(args.input)
+    print(f"Get {len(df)} data")
+
+    # ZIPs without a centroid get no neighbours (NaN lags); decided before the fill below
+    # turns missing coordinates into (0, 0)
+    geo = df[["Latitude", "Longitude"]].notna().all(axis=1) if {"Latitude", "Longitude"} <= set(df.columns) \
+        else pd.Series(False, index=df.index)
+
+    # fill out misdata
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    df[numeric_cols] = df[numeric_cols].fillna(0)
+
+    if args.sentiment:
+        # ZIPs without reviews get the median sentiment, i.e. neither reward nor penalty
+        sentiment = read_table(args.sentiment)
+        sentiment = sentiment.set_index(normalize_zip(sentiment[KEY])).drop(columns=KEY)
+        keys = normalize_zip(df[KEY])
+        for col in sentiment.columns:
+            df[col] = keys.map(sentiment[col]).to_numpy()
+        df["Yelp_Sentiment"] = df["Yelp_Sentiment"].fillna(df["Yelp_Sentiment"].median())
+        print(f"sentiment for {int(df['Yelp_Sentiment_Reviews'].notna().sum())} of {len(df)} ZIPs")
+        df = df.fillna({"Yelp_Sentiment_Reviews": 0, "Yelp_Sentiment_Businesses": 0})
+
+    if args.spatial_k or args.spatial_radius_m:
+        W = build_weights(df[geo], args.spatial_k, args.spatial_radius_m)
+        df = pd.concat([add_spatial_lags(df[geo], W), df[~geo]]).loc[df.index]
+        if (~geo).any():
+            print(f"{int((~geo).sum())} ZIPs without coordinates get no spatial lags")
+        print(f"spatial lags over {W.nnz} neighbour links")
+
+    if args.use_fitted:
+        scorer = LivabilityScorer.load(args.scorer)
+    else:
+        weights = load_weights(args.weights) if args.weights else None
+        scorer = LivabilityScorer(with_optional_scores(weights, df.columns)).fit(df)
+        scorer.save(args.scorer)
+        print(f"scorer stats: {args.scorer}")
+
+    df_final = scorer.score(df)
+
+    df_final.to_csv(args.output_full, index=False)
+    print(f"save for all data: {args.output_full}")
+
+    existing_cols = [c for c in SCORE_COLS if c in df_final.columns]
+    df_scores = df_final[existing_cols]
+
+    df_scores.to_csv(args.output_scores, index=False)
+    print(f"score only: {args.output_scores}")
+    if HAS_ARROW:
+        write_table(df_final[['ZipCode'] + scorer.score_names + ['Livability_Score']], args.output_table)
+        print(f"score table: {args.output_table}")
+
+    print("="*30)
+    print("check:")
+    print(df_scores.head())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+from datasets import read_table
+from livability_scorer import LivabilityScorer, FEATURE_NAMES, OPTIONAL_FEATURES, SUB_FEATURES, load_weights
+
+INPUT_FILE = "./urburn_dataset/DMV_Yelp_Dataset.csv"
+OUTPUT_STABILITY = "./urburn_dataset/Weight_Sweep_Rank_Stability.csv"
+OUTPUT_WEIGHTS = "./urburn_dataset/Weight_Sweep_Vectors.csv"
+# =========================================
+
+
+def simplex_grid(n_dims: int, steps: int) -> np.ndarray:
+    # every weight vector with entries in {0, 1/steps, ..., 1} that sums to 1
+    rows = []
+    for cuts in itertools.combinations(range(steps + n_dims - 1), n_dims - 1):
+        bounds = (-1,) + cuts + (steps + n_dims - 1,)
+        rows.append([bounds[i + 1] - bounds[i] - 1 for i in range(n_dims)])
+    return np.array(rows, dtype=float) / steps
+
+
+def dirichlet_weights(n_samples: int, n_dims: int, alpha: float = 1.0, seed: int = 42) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.full(n_dims, alpha), size=n_samples)
+
+
+def expand_score_weights(scorer: LivabilityScorer, W: np.ndarray) -> np.ndarray:
+    # (m x sub-scores) top-level weights -> (m x features), keeping the scorer's sub-weights
+    return W @ scorer.sub_weights.T
+
+
+def sweep_scores(N: np.ndarray, E: np.ndarray) -> np.ndarray:
+    # (n x features) @ (features x m): one Livability_Score column per weight vector
+    return (N @ E.T) * 100
+
+
+def ols_residuals(X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    # closed-form simple regression y ~ a + b*x fitted independently for every column of X
+    x_mean = X.mean(axis=0)
+    Xc = X - x_mean
+    yc = y - y.mean()
+    var = (Xc ** 2).sum(axis=0)
+    slope = np.divide(Xc.T @ yc, var, out=np.zeros_like(var), where=var > 0)
+    return yc[:, None] - Xc * slope
+
+
+def residual_ranks(R: np.ndarray) -> np.ndarray:
+    # rank 1 = most negative residual (most undervalued), per column
+    ranks = np.empty(R.shape, dtype=np.int32)
+    order = np.argsort(R, axis=0, kind="stable")
+    np.put_along_axis(ranks, order, np.arange(1, R.shape[0] + 1, dtype=np.int32)[:, None], axis=0)
+    return ranks
+
+
+def run_sweep(df: pd.DataFrame, E: np.ndarray, scorer: LivabilityScorer = None,
+              top_k: int = 20, chunk_size: int = 2000) -> pd.DataFrame:
+    # E: (m x features) effective feature weights. Returns one row of rank-stability stats per ZIP.
+    # ZIPs without a positive price cannot be fitted (as in residual_engine.run_engine);
+    # they are left out after normalising, so the feature scales match the full table
+    scorer = scorer or LivabilityScorer().fit(df)
+    price = pd.to_numeric(df["MedianPrice"], errors="coerce")
+    usable = (price > 0).to_numpy()
+    N = scorer.normalize(df)[usable]
+    df = df[usable].reset_index(drop=True)
+    y = price[usable].to_numpy(dtype=float)
+    n = len(df)
+
+    rank_sum = np.zeros(n)
+    rank_sq = np.zeros(n)
+    rank_min = np.full(n, n, dtype=np.int32)
+    rank_max = np.zeros(n, dtype=np.int32)
+    top_hits = np.zeros(n)
+
+    # chunked over weight vectors so n x m never has to fit in memory at once
+    for start in range(0, len(E), chunk_size):
+        ranks = residual_ranks(ols_residuals(sweep_scores(N, E[start:start + chunk_size]), y))
+        rank_sum += ranks.sum(axis=1)
+        rank_sq += (ranks.astype(float) ** 2).sum(axis=1)
+        rank_min = np.minimum(rank_min, ranks.min(axis=1))
+        rank_max = np.maximum(rank_max, ranks.max(axis=1))
+        top_hits += (ranks <= top_k).sum(axis=1)
+
+    m = len(E)
+    mean = rank_sum / m
+    base = residual_ranks(ols_residuals(sweep_scores(N, scorer.feature_weights[None, :]), y))[:, 0]
+
+    out = pd.DataFrame({
+        "ZipCode": df["ZipCode"].to_numpy(),
+        "Baseline_Rank": base,
+        "Mean_Rank": mean,
+        "Std_Rank": np.sqrt(np.maximum(rank_sq / m - mean ** 2, 0)),
+        "Best_Rank": rank_min,
+        "Worst_Rank": rank_max,
+        f"Top{top_k}_Share": top_hits / m,
+    })
+    for col in ["City", "State", "MedianPrice"]:
+        if col in df.columns:
+            out.insert(1 + ["City", "State", "MedianPrice"].index(col), col, df[col].to_numpy())
+    return out.sort_values("Mean_Rank").reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Residual-rank stability of ZIPs across Livability_Score weightings")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--output", default=OUTPUT_STABILITY)
+    parser.add_argument("--output-weights", default=OUTPUT_WEIGHTS)
+    parser.add_argument("--weights", help="JSON weight config used for the baseline and sub-weights")
+    parser.add_argument("--level", choices=["scores", "features"], default="scores",
+                        help="sweep the sub-score weights (keeping sub-feature weights) or all feature weights")
+    parser.add_argument("--grid-steps", type=int, help="simplex grid resolution (otherwise Dirichlet draws)")
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: {args.input}")
+        exit()
+
+    df = read_table(args.input)
+    scorer = LivabilityScorer(load_weights(args.weights) if args.weights else None).fit(df)
+
+    if args.level == "scores":
+        names = scorer.score_names
+    else:
+        # lag / sentiment sub-features are only swept when the input carries their columns
+        names = [f for f in FEATURE_NAMES
+                 if f not in OPTIONAL_FEATURES or all(c in df.columns for c in SUB_FEATURES[f][0])]
+    if args.grid_steps:
+        W = simplex_grid(len(names), args.grid_steps)
+    else:
+        W = dirichlet_weights(args.samples, len(names), args.alpha, args.seed)
+    if args.level == "scores":
+        E = expand_score_weights(scorer, W)
+    else:
+        E = np.zeros((len(W), len(FEATURE_NAMES)))
+        E[:, [FEATURE_NAMES.index(f) for f in names]] = W
+    print(f"sweeping {len(W)} weight vectors over {len(df)} zip codes")
+
+    stability = run_sweep(df, E, scorer, top_k=args.top_k)
+    stability.to_csv(args.output, index=False)
+    pd.DataFrame(W, columns=names).to_csv(args.output_weights, index=False)
+    print(f"rank stability: {args.output}")
+    print(f"weight vectors: {args.output_weights}")
+    print(stability.head(10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_FILE = "yelp_cache.sqlite"
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_ENTRIES = 500_000
+
+# Only these params identify a query; lat/lon are rounded so float noise in the
+# input CSV does not turn into cache misses.
+KEY_FIELDS = ["latitude", "longitude", "term", "categories", "price", "radius", "sort_by", "limit", "offset"]
+
+
+def cache_key(params):
+    key = {}
+    for field in KEY_FIELDS:
+        value = params.get(field)
+        if value is None:
+            continue
+        if field in ("latitude", "longitude"):
+            value = round(float(value), 6)
+        key[field] = value
+    return json.dumps(key, sort_keys=True)
+
+
+class ResponseCache:
+    # Persistent (params -> JSON response) store backed by SQLite.
+    #   * entries older than `ttl_days` are treated as missing and refetched
+    #   * `evict()` drops expired rows, then least-recently-used rows above `max_entries`
+    def __init__(self, path=CACHE_FILE, ttl_days=DEFAULT_TTL_DAYS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl_days * 86400 if ttl_days is not None else None
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key         TEXT PRIMARY KEY,
+                response    TEXT NOT NULL,
+                fetched_at  REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses(accessed_at)")
+        self.conn.commit()
+
+    def _expired(self, fetched_at, now):
+        return self.ttl is not None and now - fetched_at > self.ttl
+
+    def get(self, params):
+        key = cache_key(params)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, params, response):
+        # committed immediately so a crash or Ctrl-C keeps everything fetched so far
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (cache_key(params), json.dumps(response), now, now),
+            )
+            self.conn.commit()
+
+    def evict(self):
+        removed = 0
+        with self.lock:
+            if self.ttl is not None:
+                cur = self.conn.execute("DELETE FROM responses WHERE fetched_at < ?", (time.time() - self.ttl,))
+                removed += cur.rowcount
+            if self.max_entries is not None:
+                (count,) = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+                overflow = count - self.max_entries
+                if overflow > 0:
+                    cur = self.conn.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                        (overflow,),
+                    )
+                    removed += cur.rowcount
+            self.conn.commit()
+        return removed
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
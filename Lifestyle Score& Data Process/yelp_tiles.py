@@ -0,0 +1,274 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.neighbors import BallTree
+
+from transit_features import EARTH_RADIUS_M, haversine_meters
+
+BUSINESS_DB = "yelp_businesses.sqlite"
+GROUP_SIZE_M = 4000         # side of the top-level cells whose ZIPs are searched together
+TILE_SIZE_M = 2000          # side of the square tiles a single ZIP's circle is split into
+MIN_TILE_M = 250            # tiles are not split below this even if still over MAX_RESULTS
+PAGE_LIMIT = 50             # businesses per search page (Yelp maximum)
+MAX_RESULTS = 240           # Yelp search never returns past offset + limit = 240
+TILE_CATEGORIES = "restaurants,bars,coffee"
+TOP_BY_REVIEWS = 50         # Yelp_Avg_Rating / _Review_Count average the 50 most-reviewed, as the ZIP queries do
+# =========================================
+
+# count column -> Yelp category aliases that count towards it (what the term queries of
+# run_yelp_scraper.COUNT_TERMS match)
+CATEGORY_ALIASES = {
+    "Num_Thai": {"thai"},
+    "Num_Coffee": {"coffee", "coffeeroasteries", "cafes"},
+    "Num_FastFood": {"hotdogs", "burgers", "chickenshop"},
+    "Num_Japanese": {"japanese", "sushi", "ramen", "izakaya"},
+    "Num_Italian": {"italian"},
+    "Num_American": {"tradamerican", "newamerican"},
+    "Num_Bars": {"bars", "cocktailbars", "wine_bars", "sportsbars", "pubs", "divebars", "beerbar"},
+}
+# a business with only these aliases is not a restaurant (it came in through bars/coffee)
+NON_RESTAURANT_ALIASES = CATEGORY_ALIASES["Num_Bars"] | CATEGORY_ALIASES["Num_Coffee"]
+
+
+def is_restaurant(aliases) -> bool:
+    return any(a not in NON_RESTAURANT_ALIASES for a in aliases)
+
+
+# -----------------------------
+# Tile geometry: ZIP groups and square cells on a local equirectangular plane, both
+# split as quadtrees
+# -----------------------------
+class TileGrid:
+    # Two kinds of tile, both in meters east/north of the region's mean point on an
+    # equirectangular plane:
+    # - ("zips", ix, iy, size): the ZIPs whose centroid lies in that cell, searched with
+    #   the circle around their ZIP circles. The top level is GROUP_SIZE_M cells, so a
+    #   sparse area costs one request for several ZIPs; a group splits into the quarters
+    #   holding ZIPs, and a single ZIP into the square cells under its circle.
+    # - (ix, iy, size): the square [ix*size, (ix+1)*size) x [iy*size, (iy+1)*size),
+    #   searched with the smaller of the circle through its corners and the circle
+    #   around the ZIP circles it touches; either one holds every business that matters.
+    def __init__(self, lat, lon, size_m: float = TILE_SIZE_M, radius_m: float = 1000,
+                 group_m: float = GROUP_SIZE_M):
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        self.lat0 = float(lat.mean())
+        self.lon0 = float(lon.mean())
+        self.kx = math.radians(1) * EARTH_RADIUS_M * math.cos(math.radians(self.lat0))
+        self.ky = math.radians(1) * EARTH_RADIUS_M
+        self.size = size_m
+        self.radius_m = radius_m
+        self.group_m = group_m
+        self.x = (lon - self.lon0) * self.kx
+        self.y = (lat - self.lat0) * self.ky
+
+    def to_latlon(self, x: float, y: float) -> tuple:
+        return self.lat0 + y / self.ky, self.lon0 + x / self.kx
+
+    def cover(self) -> list:
+        # one top-level group per GROUP_SIZE_M cell holding a ZIP centroid
+        size = self.group_m
+        return sorted({("zips", int(ix), int(iy), size)
+                       for ix, iy in zip(np.floor(self.x / size), np.floor(self.y / size))})
+
+    def members(self, tile) -> np.ndarray:
+        # positions of the ZIPs in a group tile
+        _, ix, iy, size = tile
+        return np.flatnonzero((np.floor(self.x / size) == ix) & (np.floor(self.y / size) == iy))
+
+    def cells(self, idx) -> list:
+        # the TILE_SIZE_M squares that intersect at least one of the given ZIP circles
+        r, size = self.radius_m, self.size
+        tiles = set()
+        for px, py in zip(self.x[idx], self.y[idx]):
+            for ix in range(math.floor((px - r) / size), math.floor((px + r) / size) + 1):
+                for iy in range(math.floor((py - r) / size), math.floor((py + r) / size) + 1):
+                    dx = max(ix * size - px, 0, px - (ix + 1) * size)
+                    dy = max(iy * size - py, 0, py - (iy + 1) * size)
+                    if dx * dx + dy * dy <= r * r:
+                        tiles.add((ix, iy, size))
+        return sorted(tiles)
+
+    def touches(self, tile) -> np.ndarray:
+        # which ZIP circles the tile's search has to cover: a group's members, or the
+        # circles intersecting a square
+        if tile[0] == "zips":
+            mask = np.zeros(len(self.x), dtype=bool)
+            mask[self.members(tile)] = True
+            return mask
+        ix, iy, size = tile
+        dx = np.maximum(np.maximum(ix * size - self.x, self.x - (ix + 1) * size), 0)
+        dy = np.maximum(np.maximum(iy * size - self.y, self.y - (iy + 1) * size), 0)
+        return dx * dx + dy * dy <= self.radius_m * self.radius_m
+
+    def split(self, tile) -> list:
+        # a group: the quarters holding ZIPs, or once it is down to one ZIP (or MIN_TILE_M)
+        # the squares under its circles. A square: the four children that still touch a
+        # ZIP circle (none below MIN_TILE_M)
+        if tile[0] == "zips":
+            _, ix, iy, size = tile
+            idx = self.members(tile)
+            if len(idx) < 2 or size / 2 < MIN_TILE_M:
+                return self.cells(idx)
+            children = [("zips", cx, cy, size / 2) for cx in (2 * ix, 2 * ix + 1) for cy in (2 * iy, 2 * iy + 1)]
+            return [c for c in children if len(self.members(c))]
+        ix, iy, size = tile
+        if size / 2 < MIN_TILE_M:
+            return []
+        children = [(cx, cy, size / 2) for cx in (2 * ix, 2 * ix + 1) for cy in (2 * iy, 2 * iy + 1)]
+        return [c for c in children if self.touches(c).any()]
+
+    def circle(self, tile) -> tuple:
+        # (lat, lon, radius_m) searched for the tile. The centre comes from the plane, but
+        # the radius is the haversine distance to the square's corners (or to the touched
+        # ZIP centroids plus their radius), so projection error cannot leave gaps.
+        near = self.touches(tile)
+        if tile[0] == "zips":
+            lat, lon, r = 0.0, 0.0, math.inf
+        else:
+            ix, iy, size = tile
+            corners_x = np.array([ix, ix + 1, ix, ix + 1]) * size
+            corners_y = np.array([iy, iy, iy + 1, iy + 1]) * size
+            cx, cy = (ix + 0.5) * size, (iy + 0.5) * size
+            lat, lon = np.round(self.to_latlon(cx, cy), 6)
+            r = haversine_meters(*self.to_latlon(corners_x, corners_y), lat, lon).max()
+        if near.any():
+            x, y = self.x[near], self.y[near]
+            zlat, zlon = np.round(self.to_latlon((x.min() + x.max()) / 2, (y.min() + y.max()) / 2), 6)
+            zr = haversine_meters(*self.to_latlon(x, y), zlat, zlon).max() + self.radius_m
+            if zr < r:
+                lat, lon, r = zlat, zlon, zr
+        return float(lat), float(lon), int(math.ceil(r)) + 1
+
+    def params(self, tile, offset: int = 0) -> dict:
+        lat, lon, radius = self.circle(tile)
+        return {"latitude": lat, "longitude": lon, "radius": radius, "categories": TILE_CATEGORIES,
+                "limit": min(PAGE_LIMIT, MAX_RESULTS - offset), "offset": offset}
+
+    @staticmethod
+    def should_split(children: list, total: int) -> bool:
+        # split when paging cannot reach every result, or when the quarters that still
+        # touch a ZIP circle would (at even density) take fewer requests than the pages
+        if not children:
+            return False
+        if total > MAX_RESULTS:
+            return True
+        return len(children) * math.ceil(total / 4 / PAGE_LIMIT) < math.ceil(total / PAGE_LIMIT) - 1
+
+
+# -----------------------------
+# Local business table keyed by Yelp id
+# -----------------------------
+class BusinessStore:
+    # SQLite table of every business seen by a tile query; a business returned by
+    # several overlapping tiles is stored once.
+    def __init__(self, path: str = BUSINESS_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS businesses (
+                id           TEXT PRIMARY KEY,
+                latitude     REAL,
+                longitude    REAL,
+                rating       REAL,
+                review_count INTEGER,
+                price        TEXT,
+                categories   TEXT NOT NULL,
+                fetched_at   REAL NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def upsert(self, businesses) -> int:
+        now = time.time()
+        rows = []
+        for b in businesses:
+            coords = b.get("coordinates") or {}
+            if coords.get("latitude") is None or coords.get("longitude") is None:
+                continue
+            aliases = [c["alias"] for c in b.get("categories", []) if "alias" in c]
+            rows.append((b["id"], coords["latitude"], coords["longitude"], b.get("rating"),
+                         b.get("review_count"), b.get("price"), json.dumps(aliases), now))
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO businesses VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.commit()
+        return len(rows)
+
+    def load(self) -> pd.DataFrame:
+        with self.lock:
+            df = pd.read_sql_query("SELECT id, latitude, longitude, rating, review_count, price, categories "
+                                   "FROM businesses", self.conn)
+        df["categories"] = df["categories"].map(json.loads)
+        return df
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM businesses").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+# -----------------------------
+# Per-ZIP counts derived from the business table
+# -----------------------------
+def business_flags(businesses: pd.DataFrame) -> pd.DataFrame:
+    # one 0/1 column per output count
+    aliases = businesses["categories"]
+    flags = pd.DataFrame(index=businesses.index)
+    flags["Yelp_Restaurant_Count"] = aliases.map(is_restaurant)
+    for col, wanted in CATEGORY_ALIASES.items():
+        flags[col] = aliases.map(lambda a, w=wanted: any(x in w for x in a))
+    flags["Num_HighEnd_Price4"] = flags["Yelp_Restaurant_Count"] & (businesses["price"] == "$$$$")
+    return flags.astype(np.float32)
+
+
+def zip_counts(points: pd.DataFrame, businesses: pd.DataFrame, radius_m: float) -> pd.DataFrame:
+    # Same columns as run_yelp_scraper.summarize: counts within radius_m of each ZIP
+    # centroid (a sparse ZIP x business incidence matrix times the flag columns), plus
+    # the mean rating / review count of the 50 most-reviewed restaurants.
+    out = pd.DataFrame({"ZipCode": points["ZipCode"].astype(str).to_numpy()})
+    flags = business_flags(businesses)
+    if len(businesses):
+        tree = BallTree(np.radians(businesses[["latitude", "longitude"]].to_numpy(dtype=float)), metric="haversine")
+        idx = tree.query_radius(np.radians(points[["Latitude", "Longitude"]].to_numpy(dtype=float)),
+                                r=radius_m / EARTH_RADIUS_M)
+    else:
+        idx = [np.zeros(0, dtype=int) for _ in range(len(points))]
+    counts = np.array([len(i) for i in idx])
+    M = sparse.csr_matrix((np.ones(counts.sum(), dtype=np.float32),
+                           (np.repeat(np.arange(len(points)), counts),
+                            np.concatenate(idx) if len(idx) else np.zeros(0, dtype=int))),
+                          shape=(len(points), len(businesses)))
+    totals = M @ flags.to_numpy()
+    for j, col in enumerate(flags.columns):
+        out[col] = totals[:, j].astype(int)
+
+    restaurant = flags["Yelp_Restaurant_Count"].to_numpy(dtype=bool)
+    rating = businesses["rating"].to_numpy(dtype=float)
+    reviews = businesses["review_count"].to_numpy(dtype=float)
+    avg_rating = np.zeros(len(points))
+    avg_reviews = np.zeros(len(points))
+    for k, near in enumerate(idx):
+        near = near[restaurant[near]]
+        if len(near) > TOP_BY_REVIEWS:
+            near = near[np.argpartition(-reviews[near], TOP_BY_REVIEWS - 1)[:TOP_BY_REVIEWS]]
+        if len(near):
+            avg_rating[k] = np.nanmean(rating[near])
+            avg_reviews[k] = np.nanmean(reviews[near])
+    out.insert(2, "Yelp_Avg_Rating", avg_rating.round(2))
+    out.insert(3, "Yelp_Avg_Review_Count", avg_reviews.round(1))
+    return out
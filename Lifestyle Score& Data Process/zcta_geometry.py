@@ -0,0 +1,249 @@
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from datasets import KEY, normalize_zip, read_table
+from instrument import span, traced
+from transit_features import EARTH_RADIUS_M
+
+try:
+    import shapely  # noqa: F401  (STRtree / vectorised predicates, shapely >= 2)
+    from shapely import STRtree
+    HAS_SHAPELY = True
+except ImportError:
+    HAS_SHAPELY = False
+
+ZCTA_FILE = "./urburn_dataset/zcta_boundaries.geojson"
+OUTPUT_FILE = "./urburn_dataset/ZCTA_Densities.csv"
+
+# feature property holding the ZCTA code / land area (m^2), first match wins
+# (Census cartographic files: ZCTA5CE20 / ALAND20; older vintages use the 10 suffix)
+ID_FIELDS = ["ZCTA5CE20", "ZCTA5CE10", "GEOID20", "GEOID10", "ZCTA5", "ZipCode"]
+LAND_FIELDS = ["ALAND20", "ALAND10", "ALAND"]
+QUERY_CHUNK = 2_000_000     # points binned per pass; bounds the per-point work arrays
+CELL_DEG = 0.01             # grid cell (about 1 km) used to batch points before the tree query
+# =========================================
+
+
+def _require_shapely():
+    if not HAS_SHAPELY:
+        raise ImportError("ZCTA polygons need shapely >= 2 (pip install shapely)")
+
+
+# -----------------------------
+# Boundaries: loaded once, indexed by an STRtree over the polygons
+# -----------------------------
+def load_boundaries(path: str = ZCTA_FILE, bbox=None) -> pd.DataFrame:
+    # ZipCode, geometry, Area_km2 from a GeoJSON FeatureCollection (or a shapefile when
+    # geopandas is installed). bbox = (min_lat, min_lon, max_lat, max_lon) keeps only
+    # the ZCTAs whose bounds intersect it, so a national file can serve one region.
+    _require_shapely()
+    if os.path.splitext(path)[1].lower() in (".shp", ".zip", ".gpkg"):
+        import geopandas as gpd  # optional; GeoJSON needs nothing beyond shapely
+        frame = gpd.read_file(path).to_crs(4326)
+        props = pd.DataFrame(frame.drop(columns="geometry"))
+        geoms = np.asarray(frame.geometry.values, dtype=object)
+    else:
+        with open(path) as f:
+            features = json.load(f)["features"]
+        props = pd.DataFrame([feat.get("properties") or {} for feat in features])
+        geoms = shapely.from_geojson([json.dumps(feat["geometry"]) for feat in features])
+
+    id_field = next((c for c in ID_FIELDS if c in props.columns), None)
+    if id_field is None:
+        raise ValueError(f"no ZCTA id among {list(props.columns)[:20]} (expected one of {ID_FIELDS})")
+    out = pd.DataFrame({KEY: normalize_zip(props[id_field]).to_numpy(), "geometry": geoms})
+    land_field = next((c for c in LAND_FIELDS if c in props.columns), None)
+    out["Area_km2"] = (pd.to_numeric(props[land_field], errors="coerce").to_numpy() / 1e6 if land_field
+                       else np.nan)
+    out["Area_km2"] = out["Area_km2"].fillna(pd.Series(polygon_area_km2(out["geometry"].to_numpy())))
+
+    if bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        b = shapely.bounds(out["geometry"].to_numpy())
+        keep = (b[:, 0] <= max_lon) & (b[:, 2] >= min_lon) & (b[:, 1] <= max_lat) & (b[:, 3] >= min_lat)
+        out = out[keep].reset_index(drop=True)
+    return out
+
+
+def polygon_area_km2(geoms) -> np.ndarray:
+    # area on a local equirectangular plane around each polygon (well under 1% off at
+    # ZCTA scale); used when the file has no ALAND field
+    centroids = shapely.centroid(geoms)
+    lat0 = np.radians(shapely.get_y(centroids))
+    k = math.radians(1) * EARTH_RADIUS_M / 1000
+    areas = np.empty(len(geoms))
+    for i, (geom, c) in enumerate(zip(geoms, np.cos(lat0))):
+        scaled = shapely.transform(geom, lambda xy, c=c: xy * np.array([k * c, k]))
+        areas[i] = shapely.area(scaled)
+    return areas
+
+
+class ZctaIndex:
+    # STRtree over the ZCTA polygons. assign() never builds point geometries: points are
+    # binned into CELL_DEG grid cells, the tree is queried once with the occupied cells,
+    # cells lying inside a single polygon are assigned wholesale, and only points in
+    # cells that cross a boundary get an exact test (intersects_xy on prepared polygons).
+    def __init__(self, boundaries: pd.DataFrame, cell_deg: float = CELL_DEG):
+        _require_shapely()
+        self.zips = boundaries[KEY].to_numpy()
+        self.geoms = boundaries["geometry"].to_numpy()
+        self.area_km2 = boundaries["Area_km2"].to_numpy(dtype=float)
+        self.cell = cell_deg
+        self.tree = STRtree(self.geoms)
+        shapely.prepare(self.geoms)
+
+    def __len__(self):
+        return len(self.zips)
+
+    @traced("zcta.assign")
+    def assign(self, lat, lon) -> np.ndarray:
+        # polygon index per point, -1 outside every ZCTA; a point on a shared edge goes
+        # to the lowest polygon index so it is counted exactly once
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        out = np.full(len(lat), -1, dtype=np.int64)
+        valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+        for start in range(0, len(valid), QUERY_CHUNK):
+            rows = valid[start:start + QUERY_CHUNK]
+            out[rows] = self._assign_chunk(lat[rows], lon[rows])
+        return out
+
+    def _assign_chunk(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        out = np.full(len(lat), -1, dtype=np.int64)
+        ci = np.floor(lon / self.cell).astype(np.int64)
+        cj = np.floor(lat / self.cell).astype(np.int64)
+        ci0, cj0 = ci.min(), cj.min()
+        height = cj.max() - cj0 + 1
+        cells, inverse = np.unique((ci - ci0) * height + (cj - cj0), return_inverse=True)
+        x0 = (cells // height + ci0) * self.cell
+        y0 = (cells % height + cj0) * self.cell
+        boxes = shapely.box(x0, y0, x0 + self.cell, y0 + self.cell)
+
+        # cells inside one polygon: every point in them belongs to it
+        owner = np.full(len(cells), -1, dtype=np.int64)
+        cell_in, poly_in = self.tree.query(boxes, predicate="within")
+        owner[cell_in] = poly_in
+        out[:] = owner[inverse]
+
+        # boundary cells: test their points against each polygon the cell touches
+        cell_x, poly_x = self.tree.query(boxes, predicate="intersects")
+        keep = owner[cell_x] < 0
+        cell_x, poly_x = cell_x[keep], poly_x[keep]
+        if not len(cell_x):
+            return out
+        by_cell = np.argsort(inverse, kind="stable")
+        starts = np.searchsorted(inverse[by_cell], np.arange(len(cells)))
+        sizes = np.bincount(inverse, minlength=len(cells))
+        order = np.argsort(poly_x, kind="stable")
+        cell_x, poly_x = cell_x[order], poly_x[order]
+        for poly in np.unique(poly_x):
+            touched = cell_x[poly_x == poly]
+            pts = by_cell[np.concatenate([np.arange(starts[c], starts[c] + sizes[c]) for c in touched])]
+            pts = pts[out[pts] < 0]
+            hit = shapely.intersects_xy(self.geoms[poly], lon[pts], lat[pts])
+            out[pts[hit]] = poly
+        return out
+
+    def zip_codes(self, idx: np.ndarray) -> np.ndarray:
+        return np.where(idx >= 0, self.zips[np.maximum(idx, 0)], None)
+
+    def counts(self, idx: np.ndarray, weights=None) -> np.ndarray:
+        keep = idx >= 0
+        w = None if weights is None else np.asarray(weights, dtype=float)[keep]
+        return np.bincount(idx[keep], weights=w, minlength=len(self))
+
+
+# -----------------------------
+# Per-ZCTA counts and densities for each point layer
+# -----------------------------
+def layer_densities(index: ZctaIndex, layers: dict) -> pd.DataFrame:
+    # layers: name -> DataFrame with Latitude / Longitude and optional 0/1 flag columns.
+    # Every layer adds <name>_Count and <name>_Per_km2; flag columns add <flag> and
+    # <flag>_Per_km2 (e.g. the Yelp counts of yelp_tiles.business_flags).
+    out = pd.DataFrame({KEY: index.zips, "Area_km2": index.area_km2.round(3)})
+    area = np.where(index.area_km2 > 0, index.area_km2, np.nan)
+    for name, points in layers.items():
+        with span("zcta.layer", layer=name) as s:
+            idx = index.assign(points["Latitude"], points["Longitude"])
+            s.rows = len(points)
+            s.add(outside=int((idx < 0).sum()))
+            out[f"{name}_Count"] = index.counts(idx).astype(np.int64)
+            out[f"{name}_Per_km2"] = (out[f"{name}_Count"] / area).round(4)
+            for col in points.columns.drop(["Latitude", "Longitude"], errors="ignore"):
+                if pd.api.types.is_numeric_dtype(points[col]):
+                    total = index.counts(idx, points[col].to_numpy())
+                    out[col] = total.astype(np.int64) if np.array_equal(total, total.round()) else total.round(4)
+                    out[f"{col}_Per_km2"] = (out[col] / area).round(4)
+    return out
+
+
+def business_layer(path: str) -> pd.DataFrame:
+    # the tile-mode business table (run_yelp_scraper.py --mode tiles) with its count flags
+    from yelp_tiles import BusinessStore, business_flags
+    store = BusinessStore(path)
+    businesses = store.load()
+    store.close()
+    return pd.concat([businesses[["latitude", "longitude"]].set_axis(["Latitude", "Longitude"], axis=1),
+                      business_flags(businesses)], axis=1)
+
+
+def point_layer(path: str, lat_col: str = None, lon_col: str = None) -> pd.DataFrame:
+    # any CSV / Parquet of points (listings, stations); coordinates only
+    df = read_table(path)
+    lat_col = lat_col or next(c for c in ("Latitude", "latitude", "lat") if c in df.columns)
+    lon_col = lon_col or next(c for c in ("Longitude", "longitude", "lon", "lng") if c in df.columns)
+    return pd.DataFrame({"Latitude": pd.to_numeric(df[lat_col], errors="coerce"),
+                         "Longitude": pd.to_numeric(df[lon_col], errors="coerce")})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign points to ZCTA polygons and write per-area densities")
+    parser.add_argument("--boundaries", default=ZCTA_FILE, help="ZCTA GeoJSON (or shapefile with geopandas)")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"))
+    parser.add_argument("--region", help="use this region's bbox (regions.py) instead of --bbox")
+    parser.add_argument("--regions-file")
+    parser.add_argument("--businesses", help="tile-mode Yelp business table (sqlite)")
+    parser.add_argument("--listings", nargs="*", default=[], help="listing files")
+    parser.add_argument("--stations", help="station CSV")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.boundaries):
+        print(f"Error: {args.boundaries}")
+        exit()
+
+    bbox = args.bbox
+    if args.region:
+        from regions import REGIONS_FILE, load_regions
+        bbox = load_regions(args.regions_file or REGIONS_FILE)[args.region].bbox
+
+    with span("zcta.load") as s:
+        boundaries = load_boundaries(args.boundaries, bbox)
+        index = ZctaIndex(boundaries)
+        s.rows = len(index)
+    print(f"{len(index)} ZCTA polygons")
+
+    layers = {}
+    if args.businesses:
+        layers["Business"] = business_layer(args.businesses)
+    if args.listings:
+        layers["Listing"] = pd.concat([point_layer(p) for p in args.listings], ignore_index=True)
+    if args.stations:
+        layers["Station"] = point_layer(args.stations)
+    if not layers:
+        parser.error("nothing to assign: give --businesses, --listings and/or --stations")
+
+    out = layer_densities(index, layers)
+    out.to_csv(args.output, index=False)
+    for name, points in layers.items():
+        print(f"{name}: {int(out[name + '_Count'].sum())} of {len(points)} points inside a ZCTA")
+    print(f"densities: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
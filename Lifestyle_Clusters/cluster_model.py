@@ -0,0 +1,209 @@
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA
+from sklearn.mixture import GaussianMixture
+from sklearn.preprocessing import StandardScaler
+
+from lifestyle_clustering import FEATURE_COLS, build_features
+from datasets import load_dataset, normalize_zip
+
+MODEL_FILE = "cluster_model.joblib"
+DRIFT_THRESHOLD = 1.5      # batch mean distance-to-center / training mean distance
+CENTER_SHIFT_THRESHOLD = 0.25  # max center movement / mean distance between centers
+# =========================================
+
+
+class ClusterModel:
+    # Persisted KMeans/GMM/PCA state for labelling new or refreshed ZIPs without a refit.
+    #   assign()  -> nearest scaled center, O(k*d) per row, plus GMM label and PCA coords
+    #   update()  -> re-assigns changed ZIPs and moves centers by exact running means;
+    #                label ids never change, so downstream tables stay comparable
+    #   refit()   -> full refit, with new clusters matched to the old ids
+    def __init__(self, k: int = 4, feature_cols=FEATURE_COLS, random_state: int = 42, n_init: int = 20):
+        self.k = k
+        self.feature_cols = list(feature_cols)
+        self.random_state = random_state
+        self.n_init = n_init
+
+    # -----------------------------
+    # Fitting
+    # -----------------------------
+    def _matrix(self, df: pd.DataFrame) -> np.ndarray:
+        feat = build_features(df)
+        X = feat[self.feature_cols].apply(pd.to_numeric, errors='coerce').astype(float)
+        return self.scaler.transform(X.fillna(self.medians).to_numpy())
+
+    def fit(self, df: pd.DataFrame) -> "ClusterModel":
+        feat = build_features(df)
+        X = feat[self.feature_cols].apply(pd.to_numeric, errors='coerce').astype(float)
+        self.medians = X.median()
+        self.scaler = StandardScaler().fit(X.fillna(self.medians).to_numpy())
+        Z = self.scaler.transform(X.fillna(self.medians).to_numpy())
+
+        km = KMeans(n_clusters=self.k, random_state=self.random_state, n_init=self.n_init).fit(Z)
+        self.labels_ids = np.arange(self.k)
+        self._set_members(normalize_zip(df["ZipCode"]).to_numpy(), Z, km.labels_)
+
+        self.gmm = GaussianMixture(n_components=self.k, random_state=self.random_state).fit(Z)
+        self.pca = PCA(n_components=2, random_state=self.random_state).fit(Z)
+
+        self.centers_at_fit = self.centers.copy()
+        self.train_distance = float(self._min_distance(Z)[0].mean())
+        return self
+
+    def _set_members(self, zips: np.ndarray, Z: np.ndarray, labels: np.ndarray) -> None:
+        # per-ZIP scaled vectors and labels, plus per-cluster sums so centers are exact means
+        self.members = pd.DataFrame(Z, index=pd.Index(zips, name="ZipCode"))
+        self.member_labels = pd.Series(labels, index=self.members.index)
+        self.sums = np.zeros((self.k, Z.shape[1]))
+        np.add.at(self.sums, labels, Z)
+        self.counts = np.bincount(labels, minlength=self.k).astype(float)
+
+    @property
+    def centers(self) -> np.ndarray:
+        return self.sums / np.maximum(self.counts, 1)[:, None]
+
+    def _min_distance(self, Z: np.ndarray):
+        # squared-norm expansion: (n x k) distances without an (n x k x d) temporary
+        C = self.centers
+        d2 = (Z ** 2).sum(1)[:, None] - 2 * Z @ C.T + (C ** 2).sum(1)[None, :]
+        idx = d2.argmin(axis=1)
+        return np.sqrt(np.maximum(d2[np.arange(len(Z)), idx], 0)), idx
+
+    # -----------------------------
+    # Incremental use
+    # -----------------------------
+    def assign(self, rows: pd.DataFrame) -> pd.DataFrame:
+        Z = self._matrix(rows)
+        dist, idx = self._min_distance(Z)
+        pca = self.pca.transform(Z)
+        return pd.DataFrame({
+            "ZipCode": normalize_zip(rows["ZipCode"]).to_numpy(),
+            "cluster": self.labels_ids[idx],
+            "gmm_label": self.gmm.predict(Z),
+            "distance": dist,
+            "pca1": pca[:, 0],
+            "pca2": pca[:, 1],
+        }, index=rows.index)
+
+    def drift(self, rows: pd.DataFrame = None) -> dict:
+        shift = np.linalg.norm(self.centers - self.centers_at_fit, axis=1).max()
+        C = self.centers_at_fit
+        spread = np.mean([np.linalg.norm(a - b) for i, a in enumerate(C) for b in C[i + 1:]]) if self.k > 1 else 1.0
+        out = {"center_shift": float(shift / spread)}
+        if rows is not None and len(rows):
+            out["distance_ratio"] = float(self._min_distance(self._matrix(rows))[0].mean() / self.train_distance)
+        return out
+
+    def needs_refit(self, drift: dict) -> bool:
+        return (drift.get("distance_ratio", 0) > DRIFT_THRESHOLD
+                or drift["center_shift"] > CENTER_SHIFT_THRESHOLD)
+
+    def update(self, rows: pd.DataFrame) -> pd.DataFrame:
+        # add new ZIPs / replace refreshed ones; only these rows are touched
+        Z = self._matrix(rows)
+        _, positions = self._min_distance(Z)
+        assigned = self.assign(rows)
+        # a ZIP repeated in the batch keeps its last row, as if the rows were applied in order
+        zips = assigned["ZipCode"].to_numpy()
+        last = ~pd.Index(zips).duplicated(keep="last")
+        zips, Z = zips[last], Z[last]
+        positions = positions[last].astype(self.member_labels.dtype)
+
+        known = pd.Index(zips).isin(self.members.index)
+        if known.any():
+            old = self.member_labels.loc[zips[known]].to_numpy().astype(int)
+            np.subtract.at(self.sums, old, self.members.loc[zips[known]].to_numpy())
+            self.counts -= np.bincount(old, minlength=self.k)
+            self.members.loc[zips[known]] = Z[known]
+            self.member_labels.loc[zips[known]] = positions[known]
+        if (~known).any():
+            index = pd.Index(zips[~known], name="ZipCode")
+            self.members = pd.concat([self.members, pd.DataFrame(Z[~known], index=index,
+                                                                 columns=self.members.columns)])
+            self.member_labels = pd.concat([self.member_labels, pd.Series(positions[~known], index=index)])
+        np.add.at(self.sums, positions, Z)
+        self.counts += np.bincount(positions, minlength=self.k)
+        return assigned
+
+    def refit(self, df: pd.DataFrame) -> "ClusterModel":
+        # full refit; new clusters take the id of the nearest old center (Hungarian match)
+        old_centers = self.scaler.inverse_transform(self.centers)
+        old_ids = self.labels_ids
+        self.fit(df)
+        new_centers = self.scaler.transform(old_centers)
+        cost = np.linalg.norm(self.centers[:, None, :] - new_centers[None, :, :], axis=2)
+        rows, cols = linear_sum_assignment(cost)
+        ids = np.full(self.k, -1)
+        ids[rows] = old_ids[cols]
+        unmatched = ids < 0
+        ids[unmatched] = old_ids.max() + 1 + np.arange(unmatched.sum())
+        self.labels_ids = ids
+        return self
+
+    def labels(self) -> pd.Series:
+        return pd.Series(self.labels_ids[self.member_labels.to_numpy()], index=self.members.index, name="cluster")
+
+    def save(self, path: str = MODEL_FILE) -> None:
+        # plain state dict, so the file loads no matter which module defined the class
+        joblib.dump(self.__dict__, path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_FILE) -> "ClusterModel":
+        model = cls.__new__(cls)
+        model.__dict__.update(joblib.load(path))
+        return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persisted cluster model: fit once, then assign/update ZIPs")
+    parser.add_argument("command", choices=["fit", "assign", "update"])
+    parser.add_argument("--data-dir", default=".", help="full dataset for fit (house + yelp sources)")
+    parser.add_argument("--input", help="CSV of new/changed rows for assign/update")
+    parser.add_argument("--model", default=MODEL_FILE)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--output", default="cluster_assignments.csv")
+    args = parser.parse_args()
+
+    if args.command == "fit":
+        model = ClusterModel(k=args.k).fit(load_dataset(("house", "yelp"), data_dir=args.data_dir))
+        model.save(args.model)
+        model.labels().to_csv(args.output)
+        print(f"fitted k={args.k} on {len(model.members)} zip codes: {args.model}")
+        return
+
+    if not args.input or not os.path.exists(args.model):
+        print("assign/update need --input and an existing --model")
+        exit()
+    rows = pd.read_csv(args.input, dtype={"ZipCode": str})
+    model = ClusterModel.load(args.model)
+
+    if args.command == "assign":
+        model.assign(rows).to_csv(args.output, index=False)
+        print(f"assigned {len(rows)} rows: {args.output}")
+        return
+
+    drift = model.drift(rows)
+    model.update(rows)
+    drift.update(model.drift())
+    print("drift:", drift)
+    if model.needs_refit(drift):
+        print("drift above threshold, refitting on the full dataset")
+        full = load_dataset(("house", "yelp"), data_dir=args.data_dir)
+        full["ZipCode"] = normalize_zip(full["ZipCode"])
+        rows["ZipCode"] = normalize_zip(rows["ZipCode"])
+        full = pd.concat([full[~full["ZipCode"].isin(rows["ZipCode"])], rows], ignore_index=True)
+        model.refit(full)
+    model.save(args.model)
+    model.labels().to_csv(args.output)
+    print(f"updated {len(rows)} zip codes: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
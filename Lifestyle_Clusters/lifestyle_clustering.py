@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score, calinski_harabasz_score
+from sklearn.mixture import GaussianMixture
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "Lifestyle Score& Data Process"))
+from datasets import load_dataset
+from instrument import span, traced
+from spatial_graph import LAG_SUFFIX, add_spatial_lags, build_weights
+
+try:
+    import hdbscan
+except ImportError:
+    hdbscan = None
+
+CUISINE_COLS = ['Num_Thai', 'Num_Coffee', 'Num_FastFood', 'Num_Japanese', 'Num_Italian',
+                'Num_American', 'Num_Bars', 'Num_HighEnd_Price4']
+BASE_FEATURES = [
+    'MedianPrice', 'DistanceToDC_Meters', 'MetroDistanceMeters',
+    'Growth_1Y', 'Growth_3Y', 'Growth_5Y', 'Growth_10Y', 'Price_Volatility',
+    'Yelp_Restaurant_Count', 'Yelp_Avg_Rating', 'Yelp_Avg_Review_Count'
+]
+SHARE_COLS = [f"share_{c.replace('Num_', '').lower()}" for c in CUISINE_COLS]
+FEATURE_COLS = BASE_FEATURES + SHARE_COLS
+# neighbourhood means added with --spatial-k, so a ZIP next to a dining corridor is not
+# clustered as if its own Yelp circle were all there is
+SPATIAL_COLS = ['Yelp_Restaurant_Count', 'Yelp_Avg_Rating'] + SHARE_COLS
+
+CACHE_DIR = ".cluster_cache"
+SILHOUETTE_SAMPLE = 5000   # exact silhouette is O(n^2); above this many rows it is sampled
+# =========================================
+
+
+# -----------------------------
+# Features (cuisine shares plus core signals), same as the notebook
+# -----------------------------
+def build_features(df: pd.DataFrame) -> pd.DataFrame:
+    feat = df.copy()
+    count = pd.to_numeric(feat['Yelp_Restaurant_Count'], errors='coerce').astype(float).replace(0, np.nan)
+    cuisine = feat[CUISINE_COLS].apply(pd.to_numeric, errors='coerce').astype(float)
+    share_df = cuisine.div(count, axis=0).fillna(0)
+    share_df.columns = SHARE_COLS
+    return pd.concat([feat.drop(columns=SHARE_COLS, errors='ignore'), share_df], axis=1)
+
+
+def feature_matrix(feat: pd.DataFrame, feature_cols=FEATURE_COLS) -> np.ndarray:
+    X = feat[feature_cols].apply(pd.to_numeric, errors='coerce').astype(float)
+    return X.fillna(X.median()).to_numpy()
+
+
+# -----------------------------
+# Model cache keyed by feature-matrix hash + model parameters
+# -----------------------------
+def matrix_key(X: np.ndarray, kind: str, params: dict) -> str:
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    h = hashlib.sha256()
+    h.update(f"{X.shape}".encode())
+    h.update(X.tobytes())
+    h.update(json.dumps({"kind": kind, **params}, sort_keys=True).encode())
+    return h.hexdigest()[:24]
+
+
+def make_model(kind: str, k: int, random_state: int = 42, n_init: int = 20, batch_size: int = 4096):
+    if kind == "kmeans":
+        return KMeans(n_clusters=k, random_state=random_state, n_init=n_init)
+    if kind == "minibatch":
+        return MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=n_init, batch_size=batch_size)
+    if kind == "gmm":
+        return GaussianMixture(n_components=k, random_state=random_state)
+    if kind == "hdbscan":
+        if hdbscan is None:
+            raise ImportError("hdbscan is not installed")
+        return hdbscan.HDBSCAN(min_cluster_size=k, metric='euclidean')
+    raise ValueError(f"unknown model kind '{kind}'")
+
+
+def fit_cached(X: np.ndarray, kind: str, k: int, cache_dir: str = CACHE_DIR, **params):
+    # returns (model, labels); a second call with the same matrix and parameters loads from disk
+    key = matrix_key(X, kind, {"k": k, **params})
+    path = os.path.join(cache_dir, f"{kind}_{key}.joblib") if cache_dir else None
+    if path and os.path.exists(path):
+        return joblib.load(path)
+    model = make_model(kind, k, **params)
+    with span("cluster.fit", kind=kind, k=k, rows=len(X)):
+        labels = model.fit_predict(X)
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        joblib.dump((model, labels), path)
+    return model, labels
+
+
+# -----------------------------
+# Scores
+# -----------------------------
+@traced("cluster.scores")
+def cluster_scores(X: np.ndarray, labels: np.ndarray, sample_size: int = SILHOUETTE_SAMPLE,
+                   random_state: int = 42) -> dict:
+    if labels is None:
+        return {'silhouette': None, 'calinski_harabasz': None}
+    # consider only non-noise labels (hdbscan uses -1 as noise)
+    mask = labels >= 0
+    n = int(mask.sum())
+    # both scores need 2 <= clusters <= samples - 1
+    if not 2 <= len(np.unique(labels[mask])) < n:
+        return {'silhouette': None, 'calinski_harabasz': None}
+    sample = sample_size if sample_size and n > sample_size else None
+    return {
+        'silhouette': float(silhouette_score(X[mask], labels[mask], sample_size=sample, random_state=random_state)),
+        'calinski_harabasz': float(calinski_harabasz_score(X[mask], labels[mask])),
+    }
+
+
+def _fit_and_score(args):
+    X, kind, k, cache_dir, params, sample_size = args
+    _, labels = fit_cached(X, kind, k, cache_dir, **params)
+    return k, cluster_scores(X, labels, sample_size)
+
+
+def usable_k(k_values, n_samples: int) -> list:
+    # k >= n_samples cannot be fitted or scored; a table too small for every candidate
+    # falls back to the largest k it can hold
+    k_values = list(k_values)
+    kept = [k for k in k_values if k < n_samples]
+    if kept or not k_values:
+        return kept
+    return [max(1, n_samples - 1)]
+
+
+def select_k(X: np.ndarray, k_values=range(3, 8), kind: str = "kmeans", metric: str = "silhouette",
+             n_jobs: int = None, cache_dir: str = CACHE_DIR, sample_size: int = SILHOUETTE_SAMPLE,
+             **params):
+    # Fits every k in its own process; returns (best_k, {k: scores})
+    k_values = usable_k(k_values, len(X))
+    if not k_values:
+        raise ValueError("no k values to try")
+    tasks = [(X, kind, k, cache_dir, params, sample_size) for k in k_values]
+    if n_jobs == 1 or len(tasks) == 1:
+        results = [_fit_and_score(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(_fit_and_score, tasks))
+    scores = dict(results)
+    best_k = max(scores, key=lambda k: scores[k][metric] if scores[k][metric] is not None else -np.inf)
+    return best_k, scores
+
+
+def _fmt(value, spec: str) -> str:
+    return "n/a" if value is None else format(value, spec)
+
+
+# -----------------------------
+# Full run: scale, choose k, KMeans + GMM (+ HDBSCAN), drop single-ZIP clusters
+# -----------------------------
+def run_clustering(df: pd.DataFrame, k_values=range(3, 8), kind: str = "kmeans", metric: str = "silhouette",
+                   n_jobs: int = None, cache_dir: str = CACHE_DIR, min_cluster_size: int = 2,
+                   spatial_k: int = 0, spatial_radius_m: float = None, **params):
+    feat = build_features(df)
+    feature_cols = FEATURE_COLS
+    if spatial_k or spatial_radius_m:
+        feat = feat.dropna(subset=['Latitude', 'Longitude']).reset_index(drop=True)
+        feat = add_spatial_lags(feat, build_weights(feat, spatial_k, spatial_radius_m), SPATIAL_COLS)
+        feature_cols = FEATURE_COLS + [c + LAG_SUFFIX for c in SPATIAL_COLS]
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(feature_matrix(feat, feature_cols))
+
+    best_k, k_scores = select_k(X_scaled, k_values, kind, metric, n_jobs, cache_dir, **params)
+    for k, s in sorted(k_scores.items()):
+        print(f"k={k}: silhouette={_fmt(s.get('silhouette'), '.3f')} "
+              f"calinski_harabasz={_fmt(s.get('calinski_harabasz'), '.1f')}")
+    print('Chosen k:', best_k)
+
+    model, labels = fit_cached(X_scaled, kind, best_k, cache_dir, **params)
+    centers = pd.DataFrame(scaler.inverse_transform(model.cluster_centers_), columns=feature_cols)
+    centers['cluster'] = range(best_k)
+
+    clusters = feat.copy()
+    clusters['cluster'] = labels
+
+    # remove tiny clusters and re-fit the mixture models on what is left
+    sizes = clusters['cluster'].value_counts()
+    small = sizes[sizes < min_cluster_size].index.tolist()
+    if small:
+        print('Removing clusters with <', min_cluster_size, 'zipcodes:', small)
+        clusters = clusters[~clusters['cluster'].isin(small)].reset_index(drop=True)
+        X_scaled = StandardScaler().fit_transform(feature_matrix(clusters, feature_cols))
+
+    scores = {kind: cluster_scores(X_scaled, clusters['cluster'].to_numpy())}
+    _, gmm_labels = fit_cached(X_scaled, "gmm", max(1, min(best_k, len(X_scaled) - 1)), cache_dir)
+    clusters['gmm_label'] = gmm_labels
+    scores['gmm'] = cluster_scores(X_scaled, gmm_labels)
+    if hdbscan is not None:
+        _, hdb_labels = fit_cached(X_scaled, "hdbscan", 8, cache_dir)
+        clusters['hdbscan_label'] = hdb_labels
+        scores['hdbscan'] = cluster_scores(X_scaled, hdb_labels)
+    return clusters, centers, {"best_k": best_k, "k_scores": k_scores, "final": scores}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lifestyle clustering of ZIP codes (KMeans/MiniBatchKMeans + GMM)")
+    parser.add_argument("--data-dir", default=".")
+    parser.add_argument("--house")
+    parser.add_argument("--yelp")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--k-min", type=int, default=3)
+    parser.add_argument("--k-max", type=int, default=7)
+    parser.add_argument("--kind", choices=["kmeans", "minibatch"], default="kmeans")
+    parser.add_argument("--metric", choices=["silhouette", "calinski_harabasz"], default="silhouette")
+    parser.add_argument("--n-init", type=int, default=20)
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--spatial-k", type=int, default=0,
+                        help="also cluster on neighbour means over the k nearest ZIPs (0 = off)")
+    parser.add_argument("--spatial-radius-m", type=float,
+                        help="distance band in meters for the neighbour means instead of k nearest")
+    args = parser.parse_args()
+
+    paths = {k: v for k, v in (("house", args.house), ("yelp", args.yelp)) if v}
+    df = load_dataset(("house", "yelp"), data_dir=args.data_dir, paths=paths)
+    print(f"Rows: {df.shape[0]}, Columns: {df.shape[1]}")
+    clusters, centers, scores = run_clustering(
+        df, range(args.k_min, args.k_max + 1), args.kind, args.metric, args.jobs, args.cache_dir,
+        spatial_k=args.spatial_k, spatial_radius_m=args.spatial_radius_m, n_init=args.n_init)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    clusters.to_csv(os.path.join(args.out_dir, 'DMV_Yelp_Dataset_with_clusters.csv'), index=False)
+    centers.to_csv(os.path.join(args.out_dir, 'cluster_centers_unscaled.csv'), index=False)
+    with open(os.path.join(args.out_dir, 'cluster_scores.json'), 'w') as f:
+        json.dump(scores, f, indent=2, default=str)
+    print('Saved DMV_Yelp_Dataset_with_clusters.csv, cluster_centers_unscaled.csv and cluster_scores.json')
+    print('Score summary:', scores['final'])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "Lifestyle Score& Data Process"))
+from datasets import KEY, read_source, read_table
+
+CLUSTERS_FILE = "DMV_Yelp_Dataset_with_clusters.csv"
+OUT_DIR = "map"
+MIN_ZOOM = 7
+MAX_ZOOM = 12
+POINTS_ZOOM = 11      # below this, nearby points are merged into one marker per CELL_PX cell
+CELL_PX = 32          # aggregation cell in screen pixels (divides the 256 px tile)
+SIMPLIFY_PX = 1.0     # polygon simplification tolerance in screen pixels at each zoom
+TILE_PX = 256
+# layer -> (column, kind); "category" layers are coloured by id, "numeric" on a ramp
+LAYERS = {
+    "clusters": ("cluster", "category"),
+    "scores": ("Livability_Score", "numeric"),
+}
+POPUP_COLUMNS = ["City", "State", "MedianPrice", "Livability_Score", "cluster", "Yelp_Restaurant_Count",
+                 "DistanceToDC_Meters"]
+# =========================================
+
+
+# -----------------------------
+# Web Mercator tile math
+# -----------------------------
+def tile_coords(lon, lat, z: int):
+    # fractional tile coordinates (x, y) at zoom z
+    n = 2 ** z
+    lat = np.radians(np.clip(np.asarray(lat, dtype=float), -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n
+    return x, y
+
+
+def coord_decimals(z: int) -> int:
+    # enough decimals for ~1/4 pixel at this zoom
+    return int(np.ceil(np.log10(2 ** z * TILE_PX * 4 / 360.0)))
+
+
+# -----------------------------
+# Per-zoom geometry
+# -----------------------------
+def aggregate_points(df: pd.DataFrame, column: str, kind: str, z: int) -> pd.DataFrame:
+    # one marker per CELL_PX screen cell: centroid, count, and mean value (numeric) or
+    # the most common id (category)
+    x, y = tile_coords(df["Longitude"], df["Latitude"], z)
+    cells = pd.DataFrame({
+        "cx": np.floor(x * TILE_PX / CELL_PX).astype(np.int64),
+        "cy": np.floor(y * TILE_PX / CELL_PX).astype(np.int64),
+        "lon": df["Longitude"].to_numpy(), "lat": df["Latitude"].to_numpy(), "v": df[column].to_numpy(),
+    })
+    groups = cells.groupby(["cx", "cy"], sort=False)
+    out = groups.agg(lon=("lon", "mean"), lat=("lat", "mean"), n=("lon", "size"))
+    if kind == "category":
+        out["v"] = groups["v"].agg(lambda s: s.value_counts().index[0] if s.notna().any() else np.nan)
+    else:
+        out["v"] = groups["v"].mean()
+    return out.reset_index(drop=True)
+
+
+def simplify_ring(coords, eps: float) -> np.ndarray:
+    # Douglas-Peucker with an explicit stack; endpoints are always kept
+    pts = np.asarray(coords, dtype=float)
+    if len(pts) <= 4 or eps <= 0:
+        return pts
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        seg = pts[j] - pts[i]
+        rel = pts[i + 1:j] - pts[i]
+        norm = np.hypot(seg[0], seg[1])
+        d = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / norm if norm > 0 else np.hypot(rel[:, 0], rel[:, 1])
+        k = int(d.argmax())
+        if d[k] > eps:
+            m = i + 1 + k
+            keep[m] = True
+            stack += [(i, m), (m, j)]
+    return pts[keep]
+
+
+def simplify_geometry(geom: dict, z: int):
+    # returns a simplified (Multi)Polygon, or None when it collapses below a pixel
+    eps = SIMPLIFY_PX * 360.0 / (TILE_PX * 2 ** z)
+    polygons = geom["coordinates"] if geom["type"] == "MultiPolygon" else [geom["coordinates"]]
+    digits = coord_decimals(z)
+    out = []
+    for polygon in polygons:
+        rings = [np.round(simplify_ring(ring, eps), digits) for ring in polygon]
+        if len(rings[0]) >= 4:
+            out.append([r.tolist() for r in rings if len(r) >= 4])
+    if not out:
+        return None
+    return {"type": "Polygon", "coordinates": out[0]} if len(out) == 1 else {"type": "MultiPolygon", "coordinates": out}
+
+
+# -----------------------------
+# Export
+# -----------------------------
+def load_polygons(path: str, id_field: str) -> dict:
+    with open(path) as f:
+        features = json.load(f)["features"]
+    return {str(f["properties"][id_field]).zfill(5): f["geometry"] for f in features
+            if f.get("geometry") and f["geometry"]["type"] in ("Polygon", "MultiPolygon")}
+
+
+def point_feature(lon, lat, props: dict, digits: int) -> dict:
+    return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [round(lon, digits), round(lat, digits)]},
+            "properties": props}
+
+
+def _value(v, kind: str):
+    if pd.isna(v):
+        return None
+    return int(v) if kind == "category" else round(float(v), 2)
+
+
+def build_tiles(df: pd.DataFrame, column: str, kind: str, z: int, polygons: dict = None) -> dict:
+    # {(x, y): [features]} for one layer and zoom; features carry only id/value/count,
+    # everything else lives in properties.json
+    tiles = {}
+    digits = coord_decimals(z)
+    if polygons:
+        for zipcode, v in zip(df[KEY], df[column]):
+            geom = polygons.get(zipcode)
+            if geom is None:
+                continue
+            simple = simplify_geometry(geom, z)
+            if simple is None:
+                continue
+            rings = simple["coordinates"] if simple["type"] == "MultiPolygon" else [simple["coordinates"]]
+            pts = np.array([p for polygon in rings for p in polygon[0]])
+            x, y = tile_coords(pts[:, 0], pts[:, 1], z)
+            feature = {"type": "Feature", "geometry": simple, "properties": {"id": zipcode, "v": _value(v, kind)}}
+            # a polygon goes into every tile its bounding box touches (no clipping)
+            for tx in range(int(x.min()), int(x.max()) + 1):
+                for ty in range(int(y.min()), int(y.max()) + 1):
+                    tiles.setdefault((tx, ty), []).append(feature)
+        return tiles
+
+    if z < POINTS_ZOOM:
+        agg = aggregate_points(df, column, kind, z)
+        x, y = tile_coords(agg["lon"], agg["lat"], z)
+        for tx, ty, lon, lat, n, v in zip(x.astype(int), y.astype(int), agg["lon"], agg["lat"], agg["n"], agg["v"]):
+            tiles.setdefault((tx, ty), []).append(point_feature(lon, lat, {"n": int(n), "v": _value(v, kind)}, digits))
+        return tiles
+
+    x, y = tile_coords(df["Longitude"], df["Latitude"], z)
+    for tx, ty, lon, lat, zipcode, v in zip(x.astype(int), y.astype(int), df["Longitude"], df["Latitude"],
+                                            df[KEY], df[column]):
+        tiles.setdefault((tx, ty), []).append(point_feature(lon, lat, {"id": zipcode, "v": _value(v, kind)}, digits))
+    return tiles
+
+
+def write_properties(df: pd.DataFrame, out_dir: str) -> None:
+    cols = [c for c in POPUP_COLUMNS if c in df.columns]
+    rows = {z: [None if pd.isna(v) else (round(v, 2) if isinstance(v, float) else v) for v in row]
+            for z, row in zip(df[KEY], df[cols].astype(object).itertuples(index=False))}
+    with open(os.path.join(out_dir, "properties.json"), "w") as f:
+        json.dump({"columns": cols, "rows": rows}, f, separators=(",", ":"))
+
+
+def export_map(df: pd.DataFrame, out_dir: str = OUT_DIR, polygons: dict = None,
+               min_zoom: int = MIN_ZOOM, max_zoom: int = MAX_ZOOM) -> dict:
+    # tiles are written to a fresh directory and swapped in at the end, so a re-export
+    # with fewer zooms or a smaller extent leaves no stale tiles behind
+    os.makedirs(out_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".tiles-", dir=out_dir)
+    try:
+        meta = _export_tiles(df, staging, polygons, min_zoom, max_zoom)
+        tiles = os.path.join(out_dir, "tiles")
+        if os.path.exists(tiles):
+            old = tempfile.mkdtemp(prefix=".tiles-old-", dir=out_dir)
+            os.replace(tiles, os.path.join(old, "tiles"))
+            shutil.rmtree(old)
+        os.replace(staging, tiles)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    df = df.dropna(subset=["Latitude", "Longitude"]).reset_index(drop=True)
+    write_properties(df, out_dir)
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, separators=(",", ":"))
+    with open(os.path.join(out_dir, "index.html"), "w") as f:
+        f.write(VIEWER_HTML)
+    return meta
+
+
+def _export_tiles(df: pd.DataFrame, tiles_dir: str, polygons: dict, min_zoom: int, max_zoom: int) -> dict:
+    df = df.dropna(subset=["Latitude", "Longitude"]).reset_index(drop=True)
+    meta = {"minzoom": min_zoom, "maxzoom": max_zoom,
+            "center": [float(df["Latitude"].mean()), float(df["Longitude"].mean())],
+            "geometry": "polygon" if polygons else "point", "layers": {}}
+    for layer, (column, kind) in LAYERS.items():
+        if column not in df.columns:
+            continue
+        values = pd.to_numeric(df[column], errors="coerce")
+        info = {"kind": kind, "column": column, "min": float(values.min()), "max": float(values.max()), "tiles": []}
+        for z in range(min_zoom, max_zoom + 1):
+            for (x, y), features in build_tiles(df, column, kind, z, polygons).items():
+                path = os.path.join(tiles_dir, layer, str(z), str(x))
+                os.makedirs(path, exist_ok=True)
+                with open(os.path.join(path, f"{y}.json"), "w") as f:
+                    json.dump({"type": "FeatureCollection", "features": features}, f, separators=(",", ":"))
+                info["tiles"].append(f"{z}/{x}/{y}")
+        meta["layers"][layer] = info
+        print(f"{layer}: {len(info['tiles'])} tiles, zoom {min_zoom}-{max_zoom}")
+    return meta
+
+
+# Static viewer: fetches meta.json + properties.json once, then only the tiles that
+# intersect the current view (tiles leaving the view are dropped from the map).
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>DMV Lifestyle Map</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>
+html, body, #map { height: 100%; margin: 0; }
+#panel { position: absolute; top: 10px; right: 10px; z-index: 1000; background: white;
+         padding: 8px 12px; font: 13px sans-serif; border: 1px solid #999; }
+#legend i { display: inline-block; width: 12px; height: 12px; margin-right: 6px; }
+</style>
+</head>
+<body>
+<div id="map"></div>
+<div id="panel"><select id="layer"></select><div id="legend"></div></div>
+<script>
+const PALETTE = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+                 '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf'];
+let meta, props, layerName;
+const loaded = new Map();
+const map = L.map('map', {preferCanvas: true});
+L.tileLayer('https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}{r}.png',
+            {attribution: '&copy; OpenStreetMap contributors &copy; CARTO'}).addTo(map);
+
+function color(v) {
+  const info = meta.layers[layerName];
+  if (v === null) return '#999';
+  if (info.kind === 'category') return PALETTE[v % PALETTE.length];
+  const t = (v - info.min) / ((info.max - info.min) || 1);
+  return `hsl(${Math.round(120 * t)}, 70%, 45%)`;
+}
+
+function visibleTiles(z) {
+  const b = map.getBounds(), n = 2 ** z;
+  const tx = lon => Math.floor((lon + 180) / 360 * n);
+  const ty = lat => Math.floor((1 - Math.asinh(Math.tan(lat * Math.PI / 180)) / Math.PI) / 2 * n);
+  const keys = [];
+  for (let x = tx(b.getWest()); x <= tx(b.getEast()); x++)
+    for (let y = ty(b.getNorth()); y <= ty(b.getSouth()); y++) keys.push(`${z}/${x}/${y}`);
+  return keys;
+}
+
+function popup(feature, layer) {
+  const p = feature.properties;
+  if (p.n) return layer.bindPopup(`${p.n} ZIP codes`).openPopup();
+  const row = props.rows[p.id] || [];
+  const lines = props.columns.map((c, i) => `${c}: ${row[i] === null ? '-' : row[i]}`);
+  layer.bindPopup(`<b>Zip: ${p.id}</b><br>` + lines.join('<br>')).openPopup();
+}
+
+function refresh() {
+  const info = meta.layers[layerName];
+  const z = Math.max(meta.minzoom, Math.min(meta.maxzoom, map.getZoom()));
+  const want = new Set(visibleTiles(z).filter(k => info.tiles.has(k)));
+  for (const [key, group] of loaded)
+    if (!want.has(key)) { map.removeLayer(group); loaded.delete(key); }
+  for (const key of want) {
+    if (loaded.has(key)) continue;
+    const group = L.layerGroup().addTo(map);
+    loaded.set(key, group);
+    fetch(`tiles/${layerName}/${key}.json`).then(r => r.json()).then(fc => {
+      if (loaded.get(key) !== group) return;
+      L.geoJSON(fc, {
+        pointToLayer: (f, ll) => L.circleMarker(ll, {radius: f.properties.n ? Math.min(4 + 2 * Math.log2(f.properties.n), 18) : 5}),
+        style: f => ({color: color(f.properties.v), fillColor: color(f.properties.v), fillOpacity: 0.7, weight: 1}),
+        onEachFeature: (f, l) => l.on('click', () => popup(f, l)),
+      }).addTo(group);
+    });
+  }
+}
+
+function legend() {
+  const info = meta.layers[layerName];
+  const el = document.getElementById('legend');
+  if (info.kind === 'category') {
+    const ids = [];
+    for (let v = info.min; v <= info.max; v++) ids.push(v);
+    el.innerHTML = ids.map(v => `<div><i style="background:${color(v)}"></i>${info.column} ${v}</div>`).join('');
+  } else {
+    el.innerHTML = `<div><i style="background:${color(info.min)}"></i>${info.min.toFixed(1)}</div>` +
+                   `<div><i style="background:${color(info.max)}"></i>${info.max.toFixed(1)}</div>`;
+  }
+}
+
+function selectLayer(name) {
+  for (const group of loaded.values()) map.removeLayer(group);
+  loaded.clear();
+  layerName = name;
+  legend();
+  refresh();
+}
+
+Promise.all([fetch('meta.json').then(r => r.json()), fetch('properties.json').then(r => r.json())])
+  .then(([m, p]) => {
+    meta = m; props = p;
+    const select = document.getElementById('layer');
+    for (const name of Object.keys(meta.layers)) {
+      meta.layers[name].tiles = new Set(meta.layers[name].tiles);
+      select.add(new Option(name, name));
+    }
+    select.onchange = () => selectLayer(select.value);
+    map.setView(meta.center, 10);
+    map.on('moveend', refresh);
+    selectLayer(select.value);
+  });
+</script>
+</body>
+</html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export cluster/score layers as GeoJSON tile pyramids plus a static viewer")
+    parser.add_argument("--clusters", default=CLUSTERS_FILE, help="output of lifestyle_clustering.py")
+    parser.add_argument("--scores", help="Livability_Scores table to add the score layer")
+    parser.add_argument("--polygons", help="ZCTA GeoJSON; tiles then carry simplified polygons instead of points")
+    parser.add_argument("--id-field", default="ZCTA5CE10", help="ZIP property in --polygons")
+    parser.add_argument("--out-dir", default=OUT_DIR)
+    parser.add_argument("--min-zoom", type=int, default=MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=MAX_ZOOM)
+    args = parser.parse_args()
+
+    df = read_table(args.clusters)
+    if args.scores:
+        scores = read_source("scores", args.scores, columns=["Livability_Score"])
+        df = df.drop(columns=["Livability_Score"], errors="ignore").join(scores, on=KEY)
+    polygons = load_polygons(args.polygons, args.id_field) if args.polygons else None
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    export_map(df, args.out_dir, polygons, args.min_zoom, args.max_zoom)
+    print(f"map written to {args.out_dir}; serve it with: python -m http.server -d {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
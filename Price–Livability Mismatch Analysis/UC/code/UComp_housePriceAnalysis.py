@@ -1,4 +1,6 @@
+import argparse
 import os
+import sys
 from typing import Tuple
 import pandas as pd
 import numpy as np
@@ -6,6 +8,14 @@ from sklearn.linear_model import LinearRegression
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Lifestyle Score& Data Process"))
+
+from datasets import HAS_ARROW, load_dataset, write_table
+from chart_renderer import ChartRenderer
+from density_raster import use_raster, bin_points, colorize, draw_raster
+from instrument import traced
+
 DATA_DIR = "UC"
 LIV_FILE = "Livability_Scores.csv"
 HOUSE_FILE = "DMV_House_Price_Data.csv"
@@ -15,18 +25,15 @@ def ensure_output_dir(path: str = DATA_DIR) -> None:
 
 def load_and_merge(liv_path: str = LIV_FILE,
                    house_path: str = HOUSE_FILE) -> pd.DataFrame:
-    liv_df = pd.read_csv(liv_path)
-    house_df = pd.read_csv(house_path)
-
-    merged_df = pd.merge(
-        house_df[["ZipCode", "City", "State", "MedianPrice"]],
-        liv_df[["ZipCode", "Livability_Score"]],
-        on="ZipCode",
+    return load_dataset(
+        ("house", "scores"),
+        columns=["City", "State", "MedianPrice", "Livability_Score"],
+        paths={"house": house_path, "scores": liv_path},
         how="inner",
     )
-    return merged_df
 
 
+@traced("residual.fit")
 def fit_model_and_add_residuals(df: pd.DataFrame) -> Tuple[pd.DataFrame, LinearRegression]:
     model = LinearRegression()
     X = df[["Livability_Score"]]
@@ -38,6 +45,14 @@ def fit_model_and_add_residuals(df: pd.DataFrame) -> Tuple[pd.DataFrame, LinearR
     df["Residual"] = df["MedianPrice"] - df["PredictedPrice"]
     return df, model
 
+def save_residual_table(df: pd.DataFrame, out_dir: str = DATA_DIR) -> None:
+    # one copy, most undervalued first; other orderings come from gem_index.py
+    df = df.sort_values(by="Residual", ascending=True)
+    write_table(df, os.path.join(out_dir, "ZIP_Residuals.csv"))
+    if HAS_ARROW:
+        write_table(df, os.path.join(out_dir, "ZIP_Residuals.parquet"))
+
+
 def save_full_sorted_tables(df: pd.DataFrame, out_dir: str = DATA_DIR) -> None:
     df_sorted_low = df.sort_values(by="Residual", ascending=True)
     df_sorted_low.to_csv(os.path.join(out_dir, "all_zip_low_to_high.csv"), index=False)
@@ -46,51 +61,61 @@ def save_full_sorted_tables(df: pd.DataFrame, out_dir: str = DATA_DIR) -> None:
 
 
 def plot_price_vs_livability(df: pd.DataFrame,
-                             model: LinearRegression,
-                             out_dir: str = DATA_DIR) -> None:
+                             intercept: float,
+                             slope: float,
+                             out_path: str = "price_vs_livability.png",
+                             dpi: int = 300) -> None:
     plt.figure(figsize=(10, 6))
     plt.scatter(df["Livability_Score"], df["MedianPrice"], alpha=0.6)
     x_vals = np.linspace(df["Livability_Score"].min(),
-                         df["Livability_Score"].max(), 100).reshape(-1, 1)
-    y_vals = model.predict(pd.DataFrame(x_vals, columns=["Livability_Score"]))
+                         df["Livability_Score"].max(), 100)
+    y_vals = intercept + slope * x_vals
     plt.plot(x_vals, y_vals)
     plt.title("Livability Score vs Median House Price")
     plt.xlabel("Livability Score")
     plt.ylabel("Median Price ($)")
     plt.grid(True)
-    out_path = os.path.join(out_dir, "price_vs_livability.png")
     plt.tight_layout()
-    plt.savefig(out_path, dpi=300)
+    plt.savefig(out_path, dpi=dpi)
     plt.close()
 
 
 def plot_residual_distribution(df: pd.DataFrame,
-                               out_dir: str = DATA_DIR) -> None:
+                               out_path: str = "residual_distribution.png",
+                               dpi: int = 300) -> None:
     plt.figure(figsize=(10, 6))
     plt.hist(df["Residual"], bins=30)
     plt.title("Distribution of Residuals (Actual - Predicted)")
     plt.xlabel("Residual (USD)")
     plt.ylabel("Count")
     plt.grid(True)
-    out_path = os.path.join(out_dir, "residual_distribution.png")
     plt.tight_layout()
-    plt.savefig(out_path, dpi=300)
+    plt.savefig(out_path, dpi=dpi)
     plt.close()
 
 
 def plot_residual_housing_matrix(df: pd.DataFrame,
-                                 out_dir: str = DATA_DIR) -> None:
+                                 out_path: str = "housing_matrix_residual_based.png",
+                                 dpi: int = 300,
+                                 raster: bool = None) -> None:
     plt.figure(figsize=(12, 8))
-    colors = df["Residual"].apply(lambda x: "green" if x < 0 else "red")
-    plt.scatter(
-        df["MedianPrice"],
-        df["Livability_Score"],
-        c=colors,
-        alpha=0.75,
-        s=70,
-        edgecolor="black",
-        linewidth=0.3,
-    )
+    if use_raster(len(df), raster):
+        # share of undervalued ZIPs per cell: 1 = all green, 0 = all red
+        undervalued = (df["Residual"].to_numpy() < 0).astype(float)
+        _, share, extent = bin_points(df["MedianPrice"], df["Livability_Score"], undervalued)
+        draw_raster(plt.gca(), colorize(share, "RdYlGn", 0.0, 1.0, alpha=0.85), extent,
+                    cmap="RdYlGn", vmin=0.0, vmax=1.0, label="Share undervalued")
+    else:
+        colors = np.where(df["Residual"].to_numpy() < 0, "green", "red")
+        plt.scatter(
+            df["MedianPrice"],
+            df["Livability_Score"],
+            c=colors,
+            alpha=0.75,
+            s=70,
+            edgecolor="black",
+            linewidth=0.3,
+        )
 
     price_mid = df["MedianPrice"].median()
     liv_mid = df["Livability_Score"].median()
@@ -176,21 +201,41 @@ def plot_residual_housing_matrix(df: pd.DataFrame,
     plt.ylabel("Livability Score")
     plt.grid(True, linestyle="--", alpha=0.3)
 
-    out_path = os.path.join(out_dir, "housing_matrix_residual_based.png")
     plt.tight_layout()
-    plt.savefig(out_path, dpi=300)
+    plt.savefig(out_path, dpi=dpi)
     plt.close()
 
 
 def main() -> None:
-    ensure_output_dir(DATA_DIR)
-    merged_df = load_and_merge()
+    parser = argparse.ArgumentParser(description="Price vs livability residual analysis")
+    parser.add_argument("--liv", default=LIV_FILE)
+    parser.add_argument("--house", default=HOUSE_FILE)
+    parser.add_argument("--out-dir", default=DATA_DIR)
+    parser.add_argument("--sorted-copies", action="store_true",
+                        help="also write all_zip_low_to_high.csv / all_zip_high_to_low.csv")
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument("--raster", choices=["auto", "on", "off"], default="auto",
+                        help="bin large point sets into a grid instead of drawing every marker")
+    args = parser.parse_args()
+
+    ensure_output_dir(args.out_dir)
+    merged_df = load_and_merge(args.liv, args.house)
     merged_df, model = fit_model_and_add_residuals(merged_df)
 
-    save_full_sorted_tables(merged_df, DATA_DIR)
-    plot_price_vs_livability(merged_df, model, DATA_DIR)
-    plot_residual_distribution(merged_df, DATA_DIR)
-    plot_residual_housing_matrix(merged_df, DATA_DIR)
+    save_residual_table(merged_df, args.out_dir)
+    if args.sorted_copies:
+        save_full_sorted_tables(merged_df, args.out_dir)
+
+    renderer = ChartRenderer(args.out_dir, jobs=args.jobs)
+    renderer.add("price_vs_livability", plot_price_vs_livability, merged_df, "price_vs_livability.png",
+                 columns=["Livability_Score", "MedianPrice"],
+                 intercept=float(model.intercept_), slope=float(model.coef_[0]))
+    renderer.add("residual_distribution", plot_residual_distribution, merged_df, "residual_distribution.png",
+                 columns=["Residual"])
+    renderer.add("housing_matrix", plot_residual_housing_matrix, merged_df, "housing_matrix_residual_based.png",
+                 columns=["MedianPrice", "Livability_Score", "Residual"],
+                 raster={"auto": None, "on": True, "off": False}[args.raster])
+    renderer.render()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import sys
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Lifestyle Score& Data Process"))
+
+from datasets import load_dataset
+from transit_features import EARTH_RADIUS_M
+
+DATA_DIR = "UC"
+SORT_KEYS = ["Residual", "Livability_Score", "MedianPrice",
+             "Growth_1Y", "Growth_3Y", "Growth_5Y", "Growth_10Y"]
+# default direction per key: cheapest / most undervalued first, otherwise highest first
+ASCENDING = {"Residual": True, "MedianPrice": True}
+CACHE_SIZE = 4096
+SCAN_CHUNK = 256
+PORT = 8765
+# =========================================
+
+
+def load_gem_table(data_dir: str = DATA_DIR, paths: dict = None) -> pd.DataFrame:
+    # residuals + house + scores; each column comes from the one source that owns it
+    return load_dataset(("residuals", "house", "scores"), data_dir=data_dir, paths=paths, how="inner")
+
+
+def _in_range(v: np.ndarray, lo, hi) -> np.ndarray:
+    # NaN is outside every range
+    ok = ~np.isnan(v)
+    if lo is not None:
+        ok &= v >= lo
+    if hi is not None:
+        ok &= v <= hi
+    return ok
+
+
+def _contains(sorted_ids: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    pos = np.searchsorted(sorted_ids, rows)
+    return sorted_ids[np.minimum(pos, len(sorted_ids) - 1)] == rows if len(sorted_ids) else np.zeros(len(rows), bool)
+
+
+class GemIndex:
+    # Read-only query index over the scored/residual table, built once at load:
+    #   - one argsort per SORT_KEYS column (NaNs dropped) plus each row's rank in it; other
+    #     numeric columns get the same sorted ids the first time a range filter uses them
+    #   - row ids per State, and a BallTree (haversine) over lat/lon for radius filters
+    #   - an LRU cache of result row ids keyed on the normalized query
+    # A query never builds an n-row mask: every filter yields a candidate id set from its
+    # index (a searchsorted slice, a State list, BallTree hits). When the smallest set is
+    # small the other filters are checked on it and the top K taken by rank; otherwise the
+    # sort order is walked in chunks, checking the filters on each chunk only.
+    def __init__(self, df: pd.DataFrame, cache_size: int = CACHE_SIZE):
+        self.df = df.reset_index(drop=True)
+        self.n = len(self.df)
+        self.values = {c: self.df[c].to_numpy(dtype=float) for c in self.df.columns
+                       if pd.api.types.is_numeric_dtype(self.df[c])}
+        self.sorted = {}
+        self.order = {}
+        self.rank = {}
+        for key in SORT_KEYS:
+            if key in self.values:
+                ids, _ = self._sorted(key)
+                self.order[key] = ids
+                rank = np.full(self.n, -1, dtype=np.int64)
+                rank[ids] = np.arange(len(ids))
+                self.rank[key] = rank
+        self.states, self.state_code = {}, np.full(self.n, -1, dtype=np.int64)
+        if "State" in self.df:
+            codes, names = pd.factorize(self.df["State"])
+            self.state_code = codes.astype(np.int64)
+            by_code = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[by_code], np.arange(len(names) + 1))
+            self.states = {str(s): (i, by_code[bounds[i]:bounds[i + 1]]) for i, s in enumerate(names)}
+        coords = self.df[["Latitude", "Longitude"]].to_numpy(dtype=float)
+        self.geo_ok = ~np.isnan(coords).any(axis=1)
+        self.geo_ids = np.flatnonzero(self.geo_ok)
+        self.tree = BallTree(np.radians(coords[self.geo_ok]), metric="haversine")
+        self._cached = lru_cache(maxsize=cache_size)(self._query)
+
+    def _sorted(self, col: str):
+        # (row ids in ascending order of col, their values), NaNs left out
+        if col not in self.sorted:
+            v = self.values[col]
+            ids = np.flatnonzero(~np.isnan(v))
+            ids = ids[np.argsort(v[ids], kind="stable")]
+            self.sorted[col] = (ids, v[ids])
+        return self.sorted[col]
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def _filters(self, state, ranges, near, radius_km, metro_km) -> list:
+        # (candidate ids, check) per filter; check(ids) -> bool per id. None when a filter
+        # matches nothing (unknown State).
+        filters = []
+        if state:
+            if state not in self.states:
+                return None
+            code, ids = self.states[state]
+            filters.append((ids, lambda rows, code=code: self.state_code[rows] == code))
+        if metro_km is not None:
+            ranges = ranges + (("MetroDistanceMeters", None, metro_km * 1000),)
+        for col, lo, hi in ranges:
+            if lo is None and hi is None:
+                continue
+            ids, vals = self._sorted(col)
+            a = np.searchsorted(vals, lo, side="left") if lo is not None else 0
+            b = np.searchsorted(vals, hi, side="right") if hi is not None else len(vals)
+            filters.append((ids[a:b], lambda rows, v=self.values[col], lo=lo, hi=hi: _in_range(v[rows], lo, hi)))
+        if near is not None:
+            hits = self.tree.query_radius(np.radians([near]), r=radius_km * 1000 / EARTH_RADIUS_M)[0]
+            hits = np.sort(self.geo_ids[hits])
+            filters.append((hits, lambda rows, hits=hits: _contains(hits, rows)))
+        return filters
+
+    def _query(self, by, k, ascending, state, ranges, near, radius_km, metro_km) -> tuple:
+        filters = self._filters(state, ranges, near, radius_km, metro_km)
+        if filters is None:
+            return ()
+        if filters:
+            best = min(range(len(filters)), key=lambda i: len(filters[i][0]))
+            ids = filters[best][0]
+            # a chunked walk visits about k * n / |ids| rows before it has K hits
+            if len(ids) <= k * self.n / max(len(ids), 1):
+                keep = np.ones(len(ids), bool)
+                for i, (_, check) in enumerate(filters):
+                    if i != best:
+                        keep &= check(ids)
+                ids = ids[keep]
+                rank = self.rank[by][ids]
+                ids, rank = ids[rank >= 0], rank[rank >= 0]
+                rank = rank if ascending else -rank
+                if len(ids) > k:
+                    part = np.argpartition(rank, k - 1)[:k]
+                    ids, rank = ids[part], rank[part]
+                return tuple(ids[np.argsort(rank)].tolist())
+
+        order = self.order[by] if ascending else self.order[by][::-1]
+        found = []
+        for start in range(0, len(order), SCAN_CHUNK):
+            chunk = order[start:start + SCAN_CHUNK]
+            for _, check in filters:
+                chunk = chunk[check(chunk)]
+            found.extend(chunk[:k - len(found)].tolist())
+            if len(found) >= k:
+                break
+        return tuple(found)
+
+    def top_ids(self, by: str = "Residual", k: int = 20, ascending: bool = None, state: str = None,
+                ranges: dict = None, near=None, radius_km: float = None, metro_km: float = None) -> tuple:
+        # ranges: {column: (min, max)}, either bound may be None; near: (lat, lon) with radius_km
+        if by not in self.order:
+            raise ValueError(f"cannot sort by '{by}' (indexed: {', '.join(self.order)})")
+        if int(k) <= 0:
+            raise ValueError(f"k must be positive, got {k}")
+        for col in ranges or {}:
+            if col not in self.values:
+                raise ValueError(f"cannot filter on '{col}'")
+        if (near is None) != (radius_km is None):
+            raise ValueError("near and radius_km must be given together")
+        if near is not None and len(near) != 2:
+            raise ValueError("near must be 'lat,lon'")
+        if metro_km is not None and "MetroDistanceMeters" not in self.values:
+            raise ValueError("cannot filter on 'MetroDistanceMeters'")
+        ascending = ASCENDING.get(by, False) if ascending is None else bool(ascending)
+        ranges = tuple(sorted((c, lo, hi) for c, (lo, hi) in (ranges or {}).items()))
+        near = tuple(float(x) for x in near) if near is not None else None
+        radius_km = float(radius_km) if radius_km is not None else None
+        return self._cached(by, int(k), ascending, state, ranges, near, radius_km, metro_km)
+
+    def top_k(self, *args, **kwargs) -> pd.DataFrame:
+        return self.df.iloc[list(self.top_ids(*args, **kwargs))]
+
+    def cache_info(self):
+        return self._cached.cache_info()
+
+
+# -----------------------------
+# HTTP/JSON front end
+#   GET /top?by=Residual&k=20&state=VA&max_MedianPrice=500000&metro_km=10
+#   GET /top?near=38.90,-77.03&radius_km=5&by=Growth_5Y
+# -----------------------------
+def parse_query(params: dict) -> dict:
+    get = lambda name: params[name][0] if name in params else None
+    query = {"by": get("by") or "Residual", "k": int(get("k") or 20), "state": get("state")}
+    if get("asc") is not None:
+        query["ascending"] = get("asc").lower() in ("1", "true", "yes")
+    for name in ("radius_km", "metro_km"):
+        if get(name) is not None:
+            query[name] = float(get(name))
+    if get("near"):
+        query["near"] = tuple(float(x) for x in get("near").split(","))
+    ranges = {}
+    for name in params:
+        for prefix, pos in (("min_", 0), ("max_", 1)):
+            if name.startswith(prefix):
+                bounds = ranges.setdefault(name[len(prefix):], [None, None])
+                bounds[pos] = float(get(name))
+    query["ranges"] = {c: tuple(b) for c, b in ranges.items()}
+    return query
+
+
+def make_handler(index: GemIndex):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: str) -> None:
+            payload = body.encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/columns":
+                self._send(200, json.dumps({"sort": list(index.order), "filter": list(index.values),
+                                            "states": sorted(index.states)}))
+                return
+            if url.path != "/top":
+                self._send(404, json.dumps({"error": "use /top or /columns"}))
+                return
+            start = time.perf_counter()
+            try:
+                rows = index.top_k(**parse_query(parse_qs(url.query)))
+            except (ValueError, KeyError) as e:
+                self._send(400, json.dumps({"error": str(e)}))
+                return
+            took = (time.perf_counter() - start) * 1000
+            self._send(200, '{"count": %d, "took_ms": %.3f, "results": %s}'
+                       % (len(rows), took, rows.to_json(orient="records")))
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Top-K hidden-gem queries over the residual table")
+    parser.add_argument("command", choices=["serve", "query"])
+    parser.add_argument("--data-dir", default=DATA_DIR, help="folder with ZIP_Residuals, house and score tables")
+    parser.add_argument("--residuals")
+    parser.add_argument("--house")
+    parser.add_argument("--scores")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--query", default="", help="query string for 'query', e.g. 'state=VA&max_MedianPrice=500000'")
+    args = parser.parse_args()
+
+    paths = {k: v for k, v in (("residuals", args.residuals), ("house", args.house), ("scores", args.scores)) if v}
+    index = GemIndex(load_gem_table(args.data_dir, paths))
+    print(f"indexed {index.n} zip codes")
+
+    if args.command == "query":
+        rows = index.top_k(**parse_query(parse_qs(args.query)))
+        print(rows[["ZipCode", "City", "State", "MedianPrice", "Livability_Score", "Residual"]].to_string(index=False))
+        return
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(index))
+    print(f"serving on http://127.0.0.1:{args.port}/top")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
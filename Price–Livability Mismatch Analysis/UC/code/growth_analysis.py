@@ -1,51 +1,41 @@
+import argparse
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.patches import Patch
 
-# -----------------------------
-# Load raw source files
-# -----------------------------
-df_liv = pd.read_csv("Livability_Scores.csv")
-df_hp  = pd.read_csv("DMV_House_Price_Data.csv")
-df_yelp = pd.read_csv("DMV_Yelp_Dataset.csv")
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Lifestyle Score& Data Process"))
 
-# -----------------------------
-# Merge all datasets
-# -----------------------------
-df = df_hp.merge(df_yelp, on="ZipCode", how="left")
-df = df.merge(df_liv, on="ZipCode", how="left")
+from datasets import KEY, load_dataset, normalize_zip, read_table
+from chart_renderer import ChartRenderer
+from instrument import traced
+from price_history import PriceHistory, refresh_growth_columns
+
+DATA_DIR = "."
+GROWTH_COLUMNS = ["Growth_1Y", "Growth_3Y", "Growth_5Y", "Growth_10Y"]
+RATIO_SUFFIX = "_Per_Livability"    # growth per Livability_Score point
+TOP_K = 5
 
 # -----------------------------
-# Fix column naming: prioritize _x version
+# Load all sources as one wide frame keyed on ZipCode
+# (house price columns, Yelp columns and scores are each read from their owner only)
 # -----------------------------
-rename_map = {
-    "City_x": "City",
-    "State_x": "State",
-    "MedianPrice_x": "MedianPrice",
-    "Latitude_x": "Latitude",
-    "Longitude_x": "Longitude",
-    "NearestStation_x": "NearestStation",
-    "MetroDistanceMeters_x": "MetroDistanceMeters",
-    "DistanceToDC_Meters_x": "DistanceToDC_Meters",
-    "Growth_1Y_x": "Growth_1Y",
-    "Growth_3Y_x": "Growth_3Y",
-    "Growth_5Y_x": "Growth_5Y",
-    "Growth_10Y_x": "Growth_10Y",
-    "Price_Volatility_x": "Price_Volatility"
-}
-df = df.rename(columns=rename_map)
-
-# Drop unnecessary duplicated columns (_y)
-df = df[[c for c in df.columns if not c.endswith("_y")]]
+def load_growth_data(data_dir: str = DATA_DIR, paths: dict = None) -> pd.DataFrame:
+    return load_dataset(("house", "yelp", "scores"), data_dir=data_dir, paths=paths)
 
 # -----------------------------
 # Function to plot top/bottom
 # -----------------------------
-def plot_top_bottom(df_sorted, col, title, filename):
-    top5 = df_sorted.head(5)
-    bottom5 = df_sorted.tail(5)
-    combined = pd.concat([top5, bottom5])
-    colors = ["tomato"] * 5 + ["skyblue"] * 5
+def plot_top_bottom(df_sorted, col, title, out_path, dpi=300):
+    # df_sorted: chart_frame() rows, top then bottom, each tagged by its Side
+    top = df_sorted[df_sorted["Side"] == "top"]
+    bottom = df_sorted[df_sorted["Side"] == "bottom"]
+    combined = pd.concat([top, bottom])
+    colors = ["tomato"] * len(top) + ["skyblue"] * len(bottom)
 
     plt.figure(figsize=(14, 7))
     plt.bar(combined["ZipCode"].astype(str), combined[col], color=colors, edgecolor="black")
@@ -59,34 +49,143 @@ def plot_top_bottom(df_sorted, col, title, filename):
     plt.xticks(rotation=45)
 
     legend = [
-        Patch(facecolor="tomato", edgecolor="black", label="Top 5"),
-        Patch(facecolor="skyblue", edgecolor="black", label="Bottom 5")
+        Patch(facecolor="tomato", edgecolor="black", label=f"Top {len(top)}"),
+        Patch(facecolor="skyblue", edgecolor="black", label=f"Bottom {len(bottom)}")
     ]
     plt.legend(handles=legend)
     plt.tight_layout()
-    plt.savefig(filename, dpi=300)
+    plt.savefig(out_path, dpi=dpi)
     plt.close()
 
 # -----------------------------
-# 5-Year Growth Ranking
+# Top / bottom-K for every metric in one pass
 # -----------------------------
-df5 = df.dropna(subset=["Growth_5Y"])
-df5_sorted = df5.sort_values("Growth_5Y", ascending=False)
-df5_sorted.to_csv("Growth_5Y_Ranking.csv", index=False)
+def growth_metrics(df: pd.DataFrame, horizons=GROWTH_COLUMNS):
+    # (names, m x n float matrix): each Growth_* column present plus its growth per
+    # Livability point, one contiguous row per metric in a single preallocated array
+    present = [c for c in horizons if c in df.columns]
+    per_point = "Livability_Score" in df.columns
+    names = present + ([c + RATIO_SUFFIX for c in present] if per_point else [])
+    M = np.empty((len(names), len(df)))
+    for j, col in enumerate(present):
+        M[j] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+    if per_point:
+        score = pd.to_numeric(df["Livability_Score"], errors="coerce").to_numpy(dtype=float)
+        score = np.where(score > 0, score, np.nan)
+        np.divide(M[:len(present)], score, out=M[len(present):])
+    return names, M
 
-plot_top_bottom(df5_sorted, "Growth_5Y",
-                "5-Year Growth — Top 5 vs Bottom 5",
-                "Top5_Bottom5_5Y.png")
 
-# -----------------------------
-# 10-Year Growth Ranking
-# -----------------------------
-df10 = df.dropna(subset=["Growth_10Y"])
-df10_sorted = df10.sort_values("Growth_10Y", ascending=False)
-df10_sorted.to_csv("Growth_10Y_Ranking.csv", index=False)
+def top_k(M: np.ndarray, k: int, largest: bool = True):
+    # (m x k) column indices and values, best first, for every metric row at once:
+    # argpartition picks the k candidates in O(n) per row and only those k are sorted.
+    # NaNs never win; rows with fewer than k values are padded with NaN values.
+    k = min(k, M.shape[1])
+    if k == 0:
+        return np.zeros((len(M), 0), dtype=np.int64), np.zeros((len(M), 0))
+    key = np.negative(M) if largest else M.copy()
+    key[np.isnan(key)] = np.inf
+    part = np.argpartition(key, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(key, part, axis=1)
+    order = np.argsort(vals, axis=1, kind="stable")
+    idx = np.take_along_axis(part, order, axis=1)
+    vals = np.take_along_axis(vals, order, axis=1)
+    vals = np.where(np.isinf(vals), np.nan, -vals if largest else vals)
+    return idx, vals
+
+
+@traced("growth.rank")
+def rank_tables(df: pd.DataFrame, k: int = TOP_K, group: str = None, horizons=GROWTH_COLUMNS) -> pd.DataFrame:
+    # long table: [group,] Metric, Side, Rank, ZipCode, City, State, Value; k rows per
+    # metric, side and group. Groups are visited once over a single row ordering.
+    names, M = growth_metrics(df, horizons)
+    labels = df[[c for c in (KEY, "City", "State") if c in df.columns and c != group]].reset_index(drop=True)
+    if group:
+        codes, uniques = pd.factorize(df[group])
+        order = np.argsort(codes, kind="stable")
+        bounds = np.r_[0, np.cumsum(np.bincount(codes[codes >= 0], minlength=len(uniques)))] + (codes < 0).sum()
+        groups = [(uniques[g], order[bounds[g]:bounds[g + 1]]) for g in range(len(uniques))]
+    else:
+        groups = [(None, None)]
+
+    frames = []
+    for value, rows in groups:
+        sub = M if rows is None else M[:, rows]
+        for side, largest in (("top", True), ("bottom", False)):
+            idx, vals = top_k(sub, k, largest)
+            keep = ~np.isnan(vals)
+            metric, rank = np.nonzero(keep)
+            picked = idx[keep] if rows is None else rows[idx[keep]]
+            part = labels.iloc[picked].reset_index(drop=True)
+            part.insert(0, "Rank", rank + 1)
+            part.insert(0, "Side", side)
+            part.insert(0, "Metric", np.array(names, dtype=object)[metric])
+            if group:
+                part.insert(0, group, value)
+            part["Value"] = vals[keep]
+            frames.append(part)
+    out = pd.concat(frames, ignore_index=True)
+    sort_cols = ([group] if group else []) + ["Metric", "Side", "Rank"]
+    return out.sort_values(sort_cols, kind="stable", ignore_index=True)
+
+
+def chart_frame(table: pd.DataFrame, col: str) -> pd.DataFrame:
+    # top rows then bottom rows, all in descending order of the metric, as plot_top_bottom draws them
+    rows = table[table["Metric"] == col]
+    top = rows[rows["Side"] == "top"]
+    bottom = rows[rows["Side"] == "bottom"].iloc[::-1]
+    return pd.concat([top, bottom])[[KEY, "Side", "Value"]].rename(columns={"Value": col}).reset_index(drop=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Top / bottom growth rankings for every horizon")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--house")
+    parser.add_argument("--yelp")
+    parser.add_argument("--scores")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--jobs", type=int)
+    parser.add_argument("--history", help="price_history.py store; growth columns are recomputed from it")
+    parser.add_argument("--at", help="with --history: rank as of this YYYY-MM (default: latest month)")
+    parser.add_argument("--k", type=int, default=TOP_K, help="ZIPs kept at each end of every ranking")
+    parser.add_argument("--group-by", help="also rank within groups of this column (e.g. State, cluster)")
+    parser.add_argument("--clusters", help="DMV_Yelp_Dataset_with_clusters.csv; adds the 'cluster' column")
+    args = parser.parse_args()
+
+    paths = {k: v for k, v in (("house", args.house), ("yelp", args.yelp), ("scores", args.scores)) if v}
+    df = load_growth_data(args.data_dir, paths)
+    if args.history:
+        store = PriceHistory(args.history)
+        df = refresh_growth_columns(df, store, args.at)
+        print(f"growth from price history: {store.n_months} months, as of {args.at or store.end}")
+    if args.clusters:
+        clusters = read_table(args.clusters, columns=[KEY, "cluster"])
+        cluster = normalize_zip(df[KEY]).map(clusters.set_index(normalize_zip(clusters[KEY]))["cluster"])
+        df["cluster"] = pd.array(cluster.to_numpy(), dtype="Int64")
+    os.makedirs(args.out_dir, exist_ok=True)
+    out = lambda name: os.path.join(args.out_dir, name)
+
+    table = rank_tables(df, args.k)
+    table.to_csv(out("Growth_Rankings.csv"), index=False)
+    print(f"{len(table)} rank rows for {table['Metric'].nunique()} metrics: {out('Growth_Rankings.csv')}")
+    if args.group_by:
+        grouped = rank_tables(df, args.k, args.group_by)
+        grouped.to_csv(out(f"Growth_Rankings_By_{args.group_by}.csv"), index=False)
+        print(f"{grouped[args.group_by].nunique()} {args.group_by} groups: "
+              f"{out(f'Growth_Rankings_By_{args.group_by}.csv')}")
+
+    renderer = ChartRenderer(args.out_dir, jobs=args.jobs)
+    for col in GROWTH_COLUMNS:
+        if col not in set(table["Metric"]):
+            continue
+        horizon = col.split("_")[1]
+        renderer.add(f"top_bottom_{horizon.lower()}", plot_top_bottom, chart_frame(table, col),
+                     f"Top{args.k}_Bottom{args.k}_{horizon}.png", columns=[KEY, "Side", col],
+                     col=col, title=f"{horizon[:-1]}-Year Growth — Top {args.k} vs Bottom {args.k}")
+    renderer.render()
+
+    print("Done! Rank tables and PNG charts exported.")
 
-plot_top_bottom(df10_sorted, "Growth_10Y",
-                "10-Year Growth — Top 5 vs Bottom 5",
-                "Top5_Bottom5_10Y.png")
 
-print("Done! All ranking CSV and PNG charts exported.")
+if __name__ == "__main__":
+    main()
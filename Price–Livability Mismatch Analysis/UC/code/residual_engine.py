@@ -0,0 +1,184 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import HuberRegressor
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+sys.path.insert(0, os.path.join(REPO_ROOT, "Lifestyle Score& Data Process"))
+
+from datasets import load_dataset
+
+DATA_DIR = "UC"
+LIV_FILE = "Livability_Scores.csv"
+HOUSE_FILE = "DMV_House_Price_Data.csv"
+SUB_SCORES = ["Score_Transport", "Score_Food", "Score_Lifestyle"]
+MODELS = ["ols", "log_ols", "huber", "gbm"]
+CLOSED_FORM = {"ols", "log_ols"}
+
+
+def load_inputs(liv_path: str = LIV_FILE, house_path: str = HOUSE_FILE) -> pd.DataFrame:
+    return load_dataset(
+        ("house", "scores"),
+        columns=["City", "State", "MedianPrice", "Livability_Score"] + SUB_SCORES,
+        paths={"house": house_path, "scores": liv_path},
+        how="inner",
+    )
+
+
+# -----------------------------
+# Closed-form OLS over a whole batch of bootstrap resamples
+# -----------------------------
+def bootstrap_counts(rng: np.random.Generator, n: int, size: int) -> np.ndarray:
+    # (size x n) resample multiplicities; equivalent to drawing n rows with replacement
+    return rng.multinomial(n, np.full(n, 1.0 / n), size=size).astype(np.float64)
+
+
+def weighted_ols(W: np.ndarray, x: np.ndarray, y: np.ndarray):
+    # per-row intercept/slope of y ~ a + b*x for weight rows W, via four mat-vec products
+    n = W.sum(axis=1)
+    sx, sy = W @ x, W @ y
+    sxx, sxy = W @ (x * x), W @ (x * y)
+    var = sxx - sx * sx / n
+    slope = np.divide(sxy - sx * sy / n, var, out=np.zeros_like(var), where=var > 0)
+    intercept = (sy - slope * sx) / n
+    return intercept, slope
+
+
+def ols_bootstrap(x: np.ndarray, y: np.ndarray, log_price: bool, n_boot: int, seed: int,
+                  chunk: int = 256) -> np.ndarray:
+    # (n_boot x n) residuals in dollars; every ZIP is scored by every resample's fit
+    target = np.log(y) if log_price else y
+    rng = np.random.default_rng(seed)
+    out = np.empty((n_boot, len(x)), dtype=np.float32)
+    for start in range(0, n_boot, chunk):
+        W = bootstrap_counts(rng, len(x), min(chunk, n_boot - start))
+        a, b = weighted_ols(W, x, target)
+        pred = a[:, None] + b[:, None] * x[None, :]
+        out[start:start + len(W)] = y[None, :] - (np.exp(pred) if log_price else pred)
+    return out
+
+
+# -----------------------------
+# Iterative models: bootstrap chunks spread over a process pool
+# -----------------------------
+def make_model(name: str):
+    if name == "huber":
+        return HuberRegressor(max_iter=500)
+    if name == "gbm":
+        return GradientBoostingRegressor(random_state=42)
+    raise ValueError(f"unknown model '{name}'")
+
+
+def _fit_predict(name: str, X: np.ndarray, y: np.ndarray, idx: np.ndarray = None) -> np.ndarray:
+    model = make_model(name)
+    if name == "huber":
+        # scale price so the Huber epsilon is meaningful
+        scale = y.std() or 1.0
+        fit_X, fit_y = (X, y / scale) if idx is None else (X[idx], y[idx] / scale)
+        return model.fit(fit_X, fit_y).predict(X) * scale
+    fit_X, fit_y = (X, y) if idx is None else (X[idx], y[idx])
+    return model.fit(fit_X, fit_y).predict(X)
+
+
+def _bootstrap_chunk(args) -> np.ndarray:
+    name, X, y, seed, size = args
+    rng = np.random.default_rng(seed)
+    out = np.empty((size, len(y)), dtype=np.float32)
+    for b in range(size):
+        out[b] = y - _fit_predict(name, X, y, rng.integers(0, len(y), len(y)))
+    return out
+
+
+def model_bootstrap(name: str, X: np.ndarray, y: np.ndarray, n_boot: int, seed: int,
+                    jobs: int = None, chunk: int = 25) -> np.ndarray:
+    seeds = np.random.SeedSequence(seed).spawn((n_boot + chunk - 1) // chunk)
+    tasks = [(name, X, y, s, min(chunk, n_boot - i * chunk)) for i, s in enumerate(seeds)]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return np.vstack(list(pool.map(_bootstrap_chunk, tasks)))
+
+
+# -----------------------------
+# Intervals per ZIP
+# -----------------------------
+def residual_ranks(R: np.ndarray) -> np.ndarray:
+    # rank 1 = most undervalued within each resample (row)
+    ranks = np.empty(R.shape, dtype=np.int32)
+    np.put_along_axis(ranks, np.argsort(R, axis=1), np.arange(1, R.shape[1] + 1, dtype=np.int32)[None, :], axis=1)
+    return ranks
+
+
+def summarize(name: str, point: np.ndarray, R: np.ndarray, alpha: float) -> Dict[str, np.ndarray]:
+    lo, hi = 100 * alpha / 2, 100 * (1 - alpha / 2)
+    ranks = residual_ranks(R)
+    return {
+        f"{name}_Residual": point,
+        f"{name}_Residual_Lo": np.percentile(R, lo, axis=0),
+        f"{name}_Residual_Hi": np.percentile(R, hi, axis=0),
+        f"{name}_Rank_Lo": np.percentile(ranks, lo, axis=0),
+        f"{name}_Rank_Hi": np.percentile(ranks, hi, axis=0),
+        f"{name}_P_Undervalued": (R < 0).mean(axis=0),
+    }
+
+
+def run_engine(df: pd.DataFrame, models: List[str] = MODELS, n_boot: int = 2000, n_boot_trees: int = 200,
+               alpha: float = 0.05, seed: int = 42, jobs: int = None) -> pd.DataFrame:
+    # rows without a positive price or with missing scores cannot be fitted (log_ols takes
+    # log(price)); they are dropped up front so no -inf / NaN reaches the bootstrap
+    price = pd.to_numeric(df["MedianPrice"], errors="coerce")
+    usable = (price > 0) & np.isfinite(df[["Livability_Score"] + SUB_SCORES].astype(float)).all(axis=1)
+    if not usable.all():
+        print(f"dropping {int((~usable).sum())} rows with a non-positive / missing price or missing scores")
+        df = df[usable].reset_index(drop=True)
+    y = df["MedianPrice"].to_numpy(dtype=float)
+    x = df["Livability_Score"].to_numpy(dtype=float)
+    X_sub = df[SUB_SCORES].to_numpy(dtype=float)
+    out = df[["ZipCode", "City", "State", "MedianPrice", "Livability_Score"]].copy()
+
+    for name in models:
+        print(f"{name}: bootstrapping...")
+        if name in CLOSED_FORM:
+            log_price = name == "log_ols"
+            target = np.log(y) if log_price else y
+            a, b = weighted_ols(np.ones((1, len(x))), x, target)
+            pred = a[0] + b[0] * x
+            point = y - (np.exp(pred) if log_price else pred)
+            R = ols_bootstrap(x, y, log_price, n_boot, seed)
+        else:
+            X = x[:, None] if name == "huber" else X_sub
+            point = y - _fit_predict(name, X, y)
+            R = model_bootstrap(name, X, y, n_boot_trees, seed, jobs)
+        for col, values in summarize(name, point, R, alpha).items():
+            out[col] = values
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bootstrapped residual intervals for several price models")
+    parser.add_argument("--liv", default=LIV_FILE)
+    parser.add_argument("--house", default=HOUSE_FILE)
+    parser.add_argument("--out-dir", default=DATA_DIR)
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=MODELS)
+    parser.add_argument("--bootstrap", type=int, default=2000, help="resamples for the closed-form OLS models")
+    parser.add_argument("--bootstrap-trees", type=int, default=200, help="resamples for Huber / gradient boosting")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--jobs", type=int)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    df = load_inputs(args.liv, args.house)
+    result = run_engine(df, args.models, args.bootstrap, args.bootstrap_trees, args.alpha, args.seed, args.jobs)
+    sort_col = f"{args.models[0]}_Residual"
+    out_path = os.path.join(args.out_dir, "residual_intervals.csv")
+    result.sort_values(sort_col).to_csv(out_path, index=False)
+    print(f"saved {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_PROCESS_DIR = os.path.join(REPO_ROOT, "Lifestyle Score& Data Process")
+UC_CODE_DIR = os.path.join(REPO_ROOT, "Price–Livability Mismatch Analysis", "UC", "code")
+CLUSTERS_DIR = os.path.join(REPO_ROOT, "Lifestyle_Clusters")
+TEMPLATE_FILE = os.path.join(REPO_ROOT, "Dataset", "DMV_Yelp_Dataset.csv")
+
+for path in (DATA_PROCESS_DIR, UC_CODE_DIR, CLUSTERS_DIR):
+    sys.path.insert(0, path)
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import run_yelp_scraper
+from fake_yelp import FakeYelpServer
+from yelp_tiles import BusinessStore
+from livability_scorer import LivabilityScorer
+from lifestyle_clustering import run_clustering
+from UComp_housePriceAnalysis import fit_model_and_add_residuals
+from growth_analysis import rank_tables
+from chart_renderer import ChartRenderer
+import draw_urburn
+
+SIZES = [300, 3000, 30000, 300000]
+STAGES = ["scrape", "scrape_tiles", "score", "cluster", "residual", "growth", "charts"]
+OUTPUT_FILE = "benchmark_results.json"
+REGRESSION_RATIO = 1.3    # slower than baseline by more than this -> regression
+MIN_SECONDS = 0.05        # ignore stages faster than this when comparing (timer noise)
+SAMPLE_INTERVAL = 0.01    # RSS sampling period in seconds
+# =========================================
+
+COUNT_COLS = ["Yelp_Restaurant_Count"] + run_yelp_scraper.COUNT_COLUMNS
+
+
+# -----------------------------
+# Synthetic data with the DMV_Yelp_Dataset.csv schema
+# -----------------------------
+def synth_dataset(n: int, template: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    # Resamples real rows and jitters them, so distributions and correlations stay
+    # realistic. ZIP codes are unique ids (6 digits once n > 99999).
+    rng = np.random.default_rng(seed)
+    df = template.sample(n, replace=True, random_state=seed).reset_index(drop=True)
+    df["ZipCode"] = [f"{i:05d}" for i in range(n)]
+    df["Latitude"] += rng.normal(0, 0.02, n)
+    df["Longitude"] += rng.normal(0, 0.02, n)
+    for col in ("MedianPrice", "MetroDistanceMeters", "DistanceToDC_Meters", "Yelp_Avg_Review_Count"):
+        df[col] *= rng.lognormal(0, 0.1, n)
+    for col in ("Growth_1Y", "Growth_3Y", "Growth_5Y", "Growth_10Y"):
+        df[col] += rng.normal(0, 0.01, n)
+    for col in COUNT_COLS:
+        df[col] = rng.poisson(df[col].fillna(0).clip(lower=0).to_numpy())
+    df["Yelp_Avg_Rating"] = (df["Yelp_Avg_Rating"] + rng.normal(0, 0.1, n)).clip(0, 5)
+    return df
+
+
+# -----------------------------
+# Measurement
+# -----------------------------
+def current_rss_mb() -> float:
+    # Linux only; returns nan elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return float("nan")
+
+
+class RssSampler:
+    # Peak resident memory while a stage runs (numpy/C allocations included), sampled
+    # from a background thread.
+    def __enter__(self):
+        self.start = self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+def measure(fn, *args, **kwargs):
+    with RssSampler() as mem:
+        start = time.perf_counter()
+        out = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+    return out, {"seconds": round(seconds, 4), "rss_start_mb": round(mem.start, 1),
+                 "rss_peak_delta_mb": round(mem.peak - mem.start, 1)}
+
+
+# -----------------------------
+# Stages: each takes the running context and returns extra result fields
+# -----------------------------
+def stage_scrape(ctx: dict) -> dict:
+    rows = ctx["df"].head(ctx["scrape_rows"])
+    run_yelp_scraper.YELP_SEARCH_URL = ctx["server"].url
+    before = ctx["server"].requests
+    records, failed = run_yelp_scraper.collect_yelp_data(rows, "benchmark", qps=ctx["qps"], workers=ctx["workers"])
+    print()
+    return {"rows": len(rows), "requests": ctx["server"].requests - before, "failed": len(failed)}
+
+
+def stage_scrape_tiles(ctx: dict) -> dict:
+    rows = ctx["df"].head(ctx["scrape_rows"])
+    run_yelp_scraper.YELP_SEARCH_URL = ctx["server"].url
+    before = ctx["server"].requests
+    store = BusinessStore(os.path.join(ctx["tmp"], "businesses.sqlite"))
+    records, failed, stats = run_yelp_scraper.collect_tiles(rows, "benchmark", store, qps=ctx["qps"],
+                                                            workers=ctx["workers"])
+    store.close()
+    print()
+    return {"rows": len(rows), "requests": ctx["server"].requests - before, "failed": len(failed),
+            "tiles": stats["tiles"]}
+
+
+def stage_score(ctx: dict) -> dict:
+    ctx["df"] = LivabilityScorer().fit(ctx["df"]).score(ctx["df"])
+    return {}
+
+
+def stage_cluster(ctx: dict) -> dict:
+    _, _, scores = run_clustering(ctx["df"], range(ctx["k_min"], ctx["k_max"] + 1), kind=ctx["cluster_kind"],
+                                  n_jobs=1, cache_dir=None, n_init=ctx["n_init"])
+    return {"best_k": scores["best_k"]}
+
+
+def stage_residual(ctx: dict) -> dict:
+    cols = ["ZipCode", "City", "State", "MedianPrice", "Livability_Score"]
+    fit_model_and_add_residuals(ctx["df"][cols].dropna())
+    return {}
+
+
+def stage_growth(ctx: dict) -> dict:
+    table = rank_tables(ctx["df"], group="State")
+    table.to_csv(os.path.join(ctx["tmp"], "Growth_Rankings_By_State.csv"), index=False)
+    return {"rank_rows": len(table)}
+
+
+def stage_charts(ctx: dict) -> dict:
+    # rendered serially in-process so the memory sample covers the plotting
+    renderer = ChartRenderer(os.path.join(ctx["tmp"], "charts"), jobs=1)
+    for name, func, filename, columns in draw_urburn.CHARTS:
+        renderer.add(name, func, ctx["df"], filename, columns=columns, dpi=ctx["dpi"])
+    status = renderer.render(force=True)
+    return {"charts": len(status), "failed": sum(v == "failed" for v in status.values())}
+
+
+STAGE_FUNCS = {
+    "scrape": stage_scrape,
+    "scrape_tiles": stage_scrape_tiles,
+    "score": stage_score,
+    "cluster": stage_cluster,
+    "residual": stage_residual,
+    "growth": stage_growth,
+    "charts": stage_charts,
+}
+
+
+def run_benchmarks(sizes=SIZES, stages=STAGES, scrape_rows: int = 300, latency: float = 0.02, qps: float = 200,
+                   workers: int = 16, k_min: int = 3, k_max: int = 7, cluster_kind: str = "kmeans",
+                   n_init: int = 3, dpi: int = 100, seed: int = 0) -> list:
+    template = pd.read_csv(TEMPLATE_FILE, dtype={"ZipCode": str})
+    server = FakeYelpServer(latency=latency).start() if {"scrape", "scrape_tiles"} & set(stages) else None
+    results = []
+    try:
+        for n in sizes:
+            tmp = tempfile.mkdtemp(prefix=f"bench_{n}_")
+            ctx = {"df": synth_dataset(n, template, seed), "tmp": tmp, "server": server,
+                   "scrape_rows": min(n, scrape_rows), "qps": qps, "workers": workers,
+                   "k_min": k_min, "k_max": k_max, "cluster_kind": cluster_kind, "n_init": n_init, "dpi": dpi}
+            # scoring always runs first: every later stage needs the scores
+            order = ["score"] + [s for s in stages if s != "score"]
+            try:
+                for stage in order:
+                    extra, stats = measure(STAGE_FUNCS[stage], ctx)
+                    if stage not in stages:
+                        continue
+                    row = {"stage": stage, "size": n, "rows": n, **stats, **extra}
+                    results.append(row)
+                    print(f"{stage:>8} n={n:<7} {stats['seconds']:9.3f}s  +{stats['rss_peak_delta_mb']:.1f} MB")
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+    finally:
+        if server is not None:
+            server.stop()
+    return results
+
+
+# -----------------------------
+# Result files and comparison
+# -----------------------------
+def run_metadata() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+def compare(results: list, baseline: list, ratio: float = REGRESSION_RATIO) -> list:
+    base = {(r["stage"], r["size"]): r for r in baseline}
+    regressions = []
+    for r in results:
+        old = base.get((r["stage"], r["size"]))
+        if old is None or max(r["seconds"], old["seconds"]) < MIN_SECONDS:
+            continue
+        change = r["seconds"] / max(old["seconds"], 1e-9)
+        flag = "REGRESSION" if change > ratio else ""
+        print(f"{r['stage']:>8} n={r['size']:<7} {old['seconds']:9.3f}s -> {r['seconds']:9.3f}s  x{change:.2f} {flag}")
+        if flag:
+            regressions.append({**r, "baseline_seconds": old["seconds"], "ratio": round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and memory-profile every pipeline stage on synthetic data")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--ratio", type=float, default=REGRESSION_RATIO)
+    parser.add_argument("--scrape-rows", type=int, default=300, help="ZIPs scraped per size (9 requests each)")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake Yelp latency per request (s)")
+    parser.add_argument("--qps", type=float, default=200)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--k-min", type=int, default=3)
+    parser.add_argument("--k-max", type=int, default=7)
+    parser.add_argument("--cluster-kind", choices=["kmeans", "minibatch"], default="kmeans")
+    parser.add_argument("--n-init", type=int, default=3)
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.stages, args.scrape_rows, args.latency, args.qps, args.workers,
+                             args.k_min, args.k_max, args.cluster_kind, args.n_init, args.dpi, args.seed)
+    report = {"meta": run_metadata(), "config": vars(args), "results": results}
+
+    if args.compare:
+        with open(args.compare) as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.ratio)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {args.output}")
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
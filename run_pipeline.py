@@ -0,0 +1,400 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_PROCESS_DIR = os.path.join(REPO_ROOT, "Lifestyle Score& Data Process")
+UC_CODE_DIR = os.path.join(REPO_ROOT, "Price–Livability Mismatch Analysis", "UC", "code")
+DATASET_DIR = os.path.join(REPO_ROOT, "Dataset")
+CLUSTERS_DIR = os.path.join(REPO_ROOT, "Lifestyle_Clusters")
+
+sys.path.insert(0, DATA_PROCESS_DIR)
+from datasets import HAS_ARROW
+from instrument import span
+from regions import DEFAULT_REGIONS, load_regions
+
+WORK_DIR = os.path.join(REPO_ROOT, "pipeline_output")
+STATE_FILE = ".pipeline_state.json"
+# =========================================
+
+
+def file_digest(path: str, _cache={}) -> str:
+    # keyed on (path, size, mtime) so unchanged files are hashed once per run
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    if key not in _cache:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _cache[key] = h.hexdigest()
+    return _cache[key]
+
+
+def local_modules(script: str, _cache={}) -> list:
+    # repo modules a script imports, directly or through other repo modules, resolved the
+    # way the scripts resolve them (their own directory, then the data-process directory);
+    # imports inside functions count too, since several scripts import lazily
+    script = os.path.abspath(script)
+    if script in _cache:
+        return _cache[script]
+    search = [os.path.dirname(script), DATA_PROCESS_DIR]
+    found, todo = set(), [script]
+    while todo:
+        path = todo.pop()
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), filename=path)
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(a.name.split(".")[0] for a in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.add(node.module.split(".")[0])
+        for name in names:
+            module = next((os.path.join(d, name + ".py") for d in search
+                           if os.path.exists(os.path.join(d, name + ".py"))), None)
+            if module and module != script and module not in found:
+                found.add(module)
+                todo.append(module)
+    _cache[script] = sorted(found)
+    return _cache[script]
+
+
+class Stage:
+    # One script invocation with declared input/output files. Its digest covers the
+    # script source, the repo modules it imports, its arguments and the content of every
+    # input, so it only reruns when one of those changes (or an output is missing).
+    def __init__(self, name, script, args=(), inputs=(), outputs=(), cwd=None, params=None):
+        self.name = name
+        self.script = script
+        self.args = [str(a) for a in args]
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.cwd = cwd
+        self.params = params or {}
+
+    def digest(self) -> str:
+        h = hashlib.sha256()
+        h.update(file_digest(self.script).encode())
+        for path in local_modules(self.script):
+            h.update(os.path.relpath(path, REPO_ROOT).encode())
+            h.update(file_digest(path).encode())
+        h.update(json.dumps({"args": self.args, "params": self.params}, sort_keys=True).encode())
+        for path in self.inputs:
+            h.update(path.encode())
+            h.update(file_digest(path).encode() if os.path.exists(path) else b"missing")
+        return h.hexdigest()
+
+    def outputs_exist(self) -> bool:
+        return all(os.path.exists(p) for p in self.outputs)
+
+    def run(self, log_dir: str) -> int:
+        cwd = self.cwd or os.path.dirname(self.script)
+        os.makedirs(cwd, exist_ok=True)
+        for path in self.outputs:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        env = dict(os.environ, MPLBACKEND="Agg")
+        with span("pipeline.stage", stage=self.name) as s, \
+                open(os.path.join(log_dir, f"{self.name}.log"), "w") as log:
+            proc = subprocess.run([sys.executable, self.script] + self.args, cwd=cwd, env=env,
+                                  stdout=log, stderr=subprocess.STDOUT)
+            s.add(returncode=proc.returncode)
+        return proc.returncode
+
+
+def build_stages(work_dir: str, weights: str = None, scrape: bool = False, sweep_samples: int = 5000,
+                 house: str = None, yelp_dataset: str = None, region: str = None, regions_file: str = None,
+                 reviews: list = None, review_businesses: str = None, sentiment: str = None) -> list:
+    # region: stages for one shard of build_region_stages; names get a "<region>." prefix
+    # and the scripts' own pools are limited to one worker so shards share the cores.
+    # sentiment: a Yelp_Sentiment table made elsewhere (reviews adds the stage that makes it)
+    w = lambda *parts: os.path.join(work_dir, *parts)
+    house = house or os.path.join(DATASET_DIR, "DMV_House_Price_Data.csv")
+    yelp_dataset = yelp_dataset or os.path.join(DATASET_DIR, "DMV_Yelp_Dataset.csv")
+    inner = ["--jobs", 1] if region else []
+    stages = []
+
+    if scrape:
+        yelp_dataset = w("DMV_Yelp_Dataset.csv")
+        stages.append(Stage(
+            "scrape", os.path.join(DATA_PROCESS_DIR, "run_yelp_scraper.py"),
+            args=["--input", house, "--output", w("Yelp_Raw_Data.csv"), "--merged", yelp_dataset,
+                  "--table", w("Yelp_Data.parquet"), "--failed", w("Yelp_Failed_ZipCodes.csv"),
+                  "--cache", w("yelp_cache.sqlite"), "--mode", "tiles", "--businesses", w("yelp_businesses.sqlite")],
+            inputs=[house], outputs=[yelp_dataset, w("Yelp_Raw_Data.csv")], cwd=work_dir))
+
+    if reviews:
+        sentiment = w("Yelp_Sentiment.csv")
+        stages.append(sentiment_stage(work_dir, reviews, review_businesses, sentiment))
+
+    full = w("Final_Project_Data_With_Scores.csv")
+    scores = w("Livability_Scores_Only.csv")
+    score_outputs = [full, scores, w("livability_scorer.json")] + ([w("Livability_Scores.parquet")] if HAS_ARROW else [])
+    score_args = ["--input", yelp_dataset, "--output-full", full, "--output-scores", scores,
+                  "--output-table", w("Livability_Scores.parquet"), "--scorer", w("livability_scorer.json")]
+    if weights:
+        score_args += ["--weights", weights]
+    if sentiment:
+        score_args += ["--sentiment", sentiment]
+    stages.append(Stage(
+        "score", os.path.join(DATA_PROCESS_DIR, "urburn_anaylize.py"), args=score_args,
+        inputs=[yelp_dataset] + ([weights] if weights else []) + ([sentiment] if sentiment else []),
+        outputs=score_outputs, cwd=work_dir))
+
+    sweep_args = ["--input", yelp_dataset, "--output", w("sweep", "Weight_Sweep_Rank_Stability.csv"),
+                  "--output-weights", w("sweep", "Weight_Sweep_Vectors.csv"), "--samples", sweep_samples]
+    if weights:
+        sweep_args += ["--weights", weights]
+    stages.append(Stage(
+        "sweep", os.path.join(DATA_PROCESS_DIR, "weight_sweep.py"), args=sweep_args,
+        inputs=[yelp_dataset] + ([weights] if weights else []),
+        outputs=[w("sweep", "Weight_Sweep_Rank_Stability.csv"), w("sweep", "Weight_Sweep_Vectors.csv")],
+        cwd=work_dir))
+
+    stages.append(Stage(
+        "spatial", os.path.join(DATA_PROCESS_DIR, "spatial_graph.py"),
+        args=["--input", full, "--out-dir", w("spatial")], inputs=[full],
+        outputs=[w("spatial", name) for name in ("Spatial_Lags.csv", "LISA.csv", "Morans_I.json")],
+        cwd=work_dir))
+
+    stages.append(Stage(
+        "charts", os.path.join(DATA_PROCESS_DIR, "draw_urburn.py"),
+        args=[work_dir] + inner + (["--region", region, "--regions-file", regions_file] if region else []),
+        inputs=score_outputs + ([regions_file] if region else []),
+        outputs=[w("charts", name) for name in ("chart_value_matrix.png", "chart_radar_profile.png",
+                                                 "chart_spatial_map_fixed.png", "chart_correlation.png",
+                                                 "chart_price_zones_fixed.png")],
+        cwd=w("charts")))
+
+    stages.append(Stage(
+        "cluster", os.path.join(CLUSTERS_DIR, "lifestyle_clustering.py"),
+        args=["--house", house, "--yelp", yelp_dataset, "--out-dir", w("clusters"),
+              "--cache-dir", w("clusters", ".cluster_cache")] + inner,
+        inputs=[house, yelp_dataset],
+        outputs=[w("clusters", name) for name in ("DMV_Yelp_Dataset_with_clusters.csv",
+                                                   "cluster_centers_unscaled.csv", "cluster_scores.json")],
+        cwd=work_dir))
+
+    stages.append(Stage(
+        "map", os.path.join(CLUSTERS_DIR, "map_tiles.py"),
+        args=["--clusters", w("clusters", "DMV_Yelp_Dataset_with_clusters.csv"), "--scores", scores,
+              "--out-dir", w("map")],
+        inputs=[w("clusters", "DMV_Yelp_Dataset_with_clusters.csv"), scores],
+        outputs=[w("map", name) for name in ("index.html", "meta.json", "properties.json")],
+        cwd=work_dir))
+
+    stages.append(Stage(
+        "residual", os.path.join(UC_CODE_DIR, "UComp_housePriceAnalysis.py"),
+        args=["--liv", scores, "--house", house, "--out-dir", w("UC")] + inner,
+        inputs=[scores, house],
+        outputs=[w("UC", name) for name in ("ZIP_Residuals.csv", "price_vs_livability.png",
+                                             "residual_distribution.png", "housing_matrix_residual_based.png")],
+        cwd=work_dir))
+
+    stages.append(Stage(
+        "intervals", os.path.join(UC_CODE_DIR, "residual_engine.py"),
+        args=["--liv", scores, "--house", house, "--out-dir", w("UC")] + inner,
+        inputs=[scores, house], outputs=[w("UC", "residual_intervals.csv")], cwd=work_dir))
+
+    stages.append(Stage(
+        "growth", os.path.join(UC_CODE_DIR, "growth_analysis.py"),
+        args=["--house", house, "--yelp", yelp_dataset, "--scores", scores, "--out-dir", w("growth"),
+              "--clusters", w("clusters", "DMV_Yelp_Dataset_with_clusters.csv"), "--group-by", "cluster"] + inner,
+        inputs=[house, yelp_dataset, scores, w("clusters", "DMV_Yelp_Dataset_with_clusters.csv")],
+        outputs=[w("growth", name) for name in ("Growth_Rankings.csv", "Growth_Rankings_By_cluster.csv",
+                                                 "Top5_Bottom5_5Y.png", "Top5_Bottom5_10Y.png")],
+        cwd=work_dir))
+    if region:
+        for stage in stages:
+            stage.name = f"{region}.{stage.name}"
+    return stages
+
+
+def sentiment_stage(work_dir: str, reviews: list, review_businesses: str, output: str) -> Stage:
+    return Stage(
+        "sentiment", os.path.join(DATA_PROCESS_DIR, "review_sentiment.py"),
+        args=["--reviews"] + reviews + ["--businesses", review_businesses, "--output", output,
+                                        "--cache", os.path.join(work_dir, "review_sentiment.sqlite")],
+        inputs=reviews + [review_businesses], outputs=[output], cwd=work_dir)
+
+
+def build_region_stages(work_dir: str, regions: list, regions_file: str, weights: str = None,
+                        scrape: bool = False, sweep_samples: int = 5000, reviews: list = None,
+                        review_businesses: str = None) -> list:
+    # split -> one independent shard of build_stages per region -> normalize. Shards have
+    # no edges between them, so the scheduler keeps `jobs` processes busy and the run
+    # time grows with regions / cores rather than with the number of regions.
+    w = lambda *parts: os.path.join(work_dir, *parts)
+    house = os.path.join(DATASET_DIR, "DMV_House_Price_Data.csv")
+    yelp_dataset = os.path.join(DATASET_DIR, "DMV_Yelp_Dataset.csv")
+    shard = lambda name, *parts: w("regions", name, *parts)
+    stages = [Stage(
+        "split", os.path.join(DATA_PROCESS_DIR, "regions.py"),
+        args=["split", "--house", house, "--yelp", yelp_dataset, "--out-dir", w("regions"),
+              "--regions-file", regions_file, "--regions"] + regions,
+        inputs=[house, yelp_dataset, regions_file],
+        outputs=[shard(name, f) for name in regions for f in ("DMV_House_Price_Data.csv", "DMV_Yelp_Dataset.csv")],
+        cwd=work_dir)]
+    # reviews are scored once for all regions; each shard joins the ZIPs it owns
+    sentiment = w("Yelp_Sentiment.csv") if reviews else None
+    if reviews:
+        stages.append(sentiment_stage(work_dir, reviews, review_businesses, sentiment))
+    for name in regions:
+        stages += build_stages(shard(name), weights, scrape, sweep_samples,
+                               house=shard(name, "DMV_House_Price_Data.csv"),
+                               yelp_dataset=shard(name, "DMV_Yelp_Dataset.csv"),
+                               region=name, regions_file=regions_file, sentiment=sentiment)
+    stages.append(Stage(
+        "normalize", os.path.join(DATA_PROCESS_DIR, "regions.py"),
+        args=["normalize", "--out-dir", w("regions"), "--output", w("All_Regions_Scores.csv"),
+              "--scorer", w("livability_scorer_global.json"), "--regions-file", regions_file, "--regions"] + regions,
+        inputs=[shard(name, f) for name in regions
+                for f in ("Final_Project_Data_With_Scores.csv", "livability_scorer.json", "UC/ZIP_Residuals.csv")],
+        outputs=[w("All_Regions_Scores.csv"), w("livability_scorer_global.json")], cwd=work_dir))
+    return stages
+
+
+def write_default_regions(work_dir: str) -> str:
+    # DEFAULT_REGIONS as a file, so the split / charts stages (and their digests) see it
+    os.makedirs(work_dir, exist_ok=True)
+    path = os.path.join(work_dir, "regions.json")
+    text = json.dumps(DEFAULT_REGIONS, indent=2, sort_keys=True)
+    if not os.path.exists(path) or open(path).read() != text:
+        with open(path, "w") as f:
+            f.write(text)
+    return path
+
+
+def dependencies(stages: list) -> dict:
+    producers = {out: s.name for s in stages for out in s.outputs}
+    return {s.name: {producers[p] for p in s.inputs if p in producers and producers[p] != s.name} for s in stages}
+
+
+def load_state(work_dir: str) -> dict:
+    path = os.path.join(work_dir, STATE_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(work_dir: str, state: dict) -> None:
+    with open(os.path.join(work_dir, STATE_FILE), "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+
+def run_pipeline(stages: list, work_dir: str, jobs: int = 4, force=(), dry_run: bool = False) -> dict:
+    # Runs every stage whose dependencies are done, up to `jobs` at a time. A stage is
+    # skipped when its digest matches the last successful run; a failed stage blocks
+    # only its own downstream stages.
+    os.makedirs(work_dir, exist_ok=True)
+    log_dir = os.path.join(work_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    state = load_state(work_dir)
+    deps = dependencies(stages)
+    pending = {s.name: s for s in stages}
+    status = {}
+    running = {}
+
+    def schedule():
+        progressed = False
+        for name in list(pending):
+            if any(status.get(d) in ("failed", "blocked") for d in deps[name]):
+                status[name] = "blocked"
+                del pending[name]
+                print(f"[{name}] blocked by failed dependency")
+                progressed = True
+            elif all(status.get(d) in ("ran", "fresh") for d in deps[name]):
+                stage = pending.pop(name)
+                digest = stage.digest()
+                progressed = True
+                if name not in force and state.get(name) == digest and stage.outputs_exist():
+                    status[name] = "fresh"
+                    print(f"[{name}] up to date")
+                elif dry_run:
+                    status[name] = "ran"
+                    print(f"[{name}] would run")
+                else:
+                    print(f"[{name}] running")
+                    running[pool.submit(stage.run, log_dir)] = (stage, digest, time.time())
+        return progressed
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while pending or running:
+            while schedule():
+                pass
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage, digest, start = running.pop(fut)
+                code = fut.result()
+                if code == 0 and stage.outputs_exist():
+                    status[stage.name] = "ran"
+                    state[stage.name] = digest
+                    save_state(work_dir, state)
+                    print(f"[{stage.name}] done in {time.time() - start:.1f}s")
+                else:
+                    status[stage.name] = "failed"
+                    state.pop(stage.name, None)
+                    save_state(work_dir, state)
+                    print(f"[{stage.name}] FAILED (exit {code}), see {os.path.join(log_dir, stage.name + '.log')}")
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the scrape -> score -> cluster -> residual -> chart pipeline, "
+                                                 "re-executing only stale stages")
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--weights", help="JSON weight config for the livability score")
+    parser.add_argument("--scrape", action="store_true", help="re-collect Yelp data (needs YELP_API_KEY)")
+    parser.add_argument("--sweep-samples", type=int, default=5000)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--force", nargs="*", default=[], help="stages to rerun even if up to date")
+    parser.add_argument("--only", nargs="*", help="run only these stages (and whatever they depend on)")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--regions", nargs="*",
+                        help="run as per-region shards (names from --regions-file; none listed = all)")
+    parser.add_argument("--regions-file", help="region definitions (default: regions.DEFAULT_REGIONS)")
+    parser.add_argument("--reviews", nargs="*", help="review text dumps for the sentiment stage")
+    parser.add_argument("--review-businesses", help="business dump mapping review business_id to ZIP")
+    args = parser.parse_args()
+    if args.reviews and not args.review_businesses:
+        parser.error("--reviews needs --review-businesses")
+
+    work_dir = os.path.abspath(args.work_dir)
+    weights = os.path.abspath(args.weights) if args.weights else None
+    reviews = [os.path.abspath(p) for p in args.reviews] if args.reviews else None
+    review_businesses = os.path.abspath(args.review_businesses) if args.review_businesses else None
+    if args.regions is None:
+        stages = build_stages(work_dir, weights, args.scrape, args.sweep_samples,
+                              reviews=reviews, review_businesses=review_businesses)
+    else:
+        regions_file = os.path.abspath(args.regions_file) if args.regions_file else write_default_regions(work_dir)
+        names = args.regions or list(load_regions(regions_file))
+        stages = build_region_stages(work_dir, names, regions_file, weights, args.scrape, args.sweep_samples,
+                                     reviews, review_businesses)
+
+    if args.only:
+        deps = dependencies(stages)
+        keep, todo = set(), list(args.only)
+        while todo:
+            name = todo.pop()
+            if name not in keep:
+                keep.add(name)
+                todo.extend(deps.get(name, ()))
+        stages = [s for s in stages if s.name in keep]
+
+    status = run_pipeline(stages, work_dir, jobs=args.jobs, force=set(args.force), dry_run=args.dry_run)
+    if any(v in ("failed", "blocked") for v in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
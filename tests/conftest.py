@@ -0,0 +1,27 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the scripts import their neighbours by bare module name, so put every code folder on the path
+for folder in ("Lifestyle Score& Data Process", "Lifestyle_Clusters",
+               os.path.join("Price–Livability Mismatch Analysis", "UC", "code")):
+    sys.path.insert(0, os.path.join(REPO_ROOT, folder))
+sys.path.insert(0, REPO_ROOT)
+
+DATASET_DIR = os.path.join(REPO_ROOT, "Dataset")
+
+
+@pytest.fixture
+def yelp_dataset() -> pd.DataFrame:
+    # the merged DMV table shipped in Dataset/
+    from datasets import read_table
+    return read_table(os.path.join(DATASET_DIR, "DMV_Yelp_Dataset.csv"))
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(0)
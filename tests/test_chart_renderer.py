@@ -0,0 +1,55 @@
+import importlib
+import sys
+
+import pandas as pd
+
+from chart_renderer import ChartJob, ChartRenderer
+
+
+def _chart_module(tmp_path, helper_body: str):
+    (tmp_path / "chart_helpers.py").write_text(f"def label(v):\n    return {helper_body}\n")
+    (tmp_path / "my_charts.py").write_text(
+        "from chart_helpers import label\n\n\n"
+        "def plot(data, out_path, dpi=100):\n"
+        "    with open(out_path, 'w') as f:\n"
+        "        f.write(','.join(label(v) for v in data['x']))\n")
+    sys.path.insert(0, str(tmp_path))
+    try:
+        for name in ("my_charts", "chart_helpers"):
+            sys.modules.pop(name, None)
+        return importlib.import_module("my_charts")
+    finally:
+        sys.path.remove(str(tmp_path))
+
+
+def test_key_changes_when_a_helper_changes(tmp_path):
+    data = pd.DataFrame({"x": [1, 2, 3]})
+    charts = _chart_module(tmp_path, "str(v)")
+    key = ChartJob("c", charts.plot, data, str(tmp_path / "c.txt")).key()
+    assert ChartJob("c", charts.plot, data, str(tmp_path / "c.txt")).key() == key
+
+    (tmp_path / "chart_helpers.py").write_text("def label(v):\n    return f'<{v}>'\n")
+    assert ChartJob("c", charts.plot, data, str(tmp_path / "c.txt")).key() != key
+
+
+def test_key_changes_with_data_and_style(tmp_path):
+    charts = _chart_module(tmp_path, "str(v)")
+    job = lambda data, **style: ChartJob("c", charts.plot, data, "c.txt", style=style).key()
+    base = job(pd.DataFrame({"x": [1, 2]}))
+    assert job(pd.DataFrame({"x": [1, 3]})) != base
+    assert job(pd.DataFrame({"x": [1, 2]}), title="t") != base
+
+
+def test_render_skips_unchanged_charts(tmp_path):
+    charts = _chart_module(tmp_path, "str(v)")
+    data = pd.DataFrame({"x": [1, 2]})
+
+    def run():
+        renderer = ChartRenderer(str(tmp_path / "out"), jobs=1)
+        renderer.add("c", charts.plot, data, "c.txt")
+        return renderer.render()
+
+    assert run()["c"] == "rendered"
+    assert run()["c"] == "cached"
+    (tmp_path / "chart_helpers.py").write_text("def label(v):\n    return f'<{v}>'\n")
+    assert run()["c"] == "rendered"
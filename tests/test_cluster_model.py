@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cluster_model import ClusterModel
+
+
+@pytest.fixture
+def model(yelp_dataset):
+    return ClusterModel(k=4, n_init=3).fit(yelp_dataset)
+
+
+def member_means(model):
+    means = model.members.groupby(model.member_labels.to_numpy()).mean()
+    return means.reindex(range(model.k)).to_numpy()
+
+
+def test_centers_are_member_means_after_fit(model, yelp_dataset):
+    np.testing.assert_allclose(model.centers, member_means(model), atol=1e-12)
+    assert model.counts.sum() == len(yelp_dataset)
+
+
+def test_update_keeps_running_means_exact(model, yelp_dataset, rng):
+    refreshed = yelp_dataset.sample(40, random_state=1).copy()
+    refreshed["Yelp_Restaurant_Count"] *= rng.uniform(0.2, 3.0, len(refreshed))
+    new = yelp_dataset.sample(15, random_state=2).copy()
+    new["ZipCode"] = [f"9{i:04d}" for i in range(len(new))]
+    batch = pd.concat([refreshed, new, refreshed.head(3).assign(Num_Bars=0)])
+
+    assigned = model.update(batch)
+    assert len(model.members) == len(yelp_dataset) + len(new)
+    assert model.counts.sum() == len(model.members)
+    np.testing.assert_allclose(model.centers, member_means(model), atol=1e-9)
+    # a ZIP repeated in the batch keeps its last row
+    last = model._matrix(batch.tail(3))
+    np.testing.assert_allclose(model.members.loc[batch.tail(3)["ZipCode"].astype(str)].to_numpy(), last)
+    assert set(assigned["cluster"]) <= set(model.labels_ids)
+
+
+def test_assign_picks_the_nearest_center(model, yelp_dataset):
+    rows = yelp_dataset.head(30)
+    out = model.assign(rows)
+    Z = model._matrix(rows)
+    d = np.linalg.norm(Z[:, None, :] - model.centers[None, :, :], axis=2)
+    np.testing.assert_array_equal(out["cluster"].to_numpy(), model.labels_ids[d.argmin(axis=1)])
+    np.testing.assert_allclose(out["distance"].to_numpy(), d.min(axis=1), atol=1e-9)
+
+
+def test_refit_on_the_same_data_keeps_label_ids(model, yelp_dataset, tmp_path):
+    before = model.labels()
+    path = str(tmp_path / "model.joblib")
+    model.save(path)
+    loaded = ClusterModel.load(path)
+    pd.testing.assert_series_equal(loaded.labels(), before)
+    loaded.refit(yelp_dataset)
+    pd.testing.assert_series_equal(loaded.labels(), before)
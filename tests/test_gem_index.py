@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gem_index import ASCENDING, GemIndex, parse_query
+from transit_features import haversine_meters
+
+QUERIES = [
+    dict(by="Residual", k=20),
+    dict(by="Residual", k=10, state="VA"),
+    dict(by="Livability_Score", k=15, ranges={"MedianPrice": (None, 500000)}),
+    dict(by="Growth_5Y", k=5, ascending=True, ranges={"Livability_Score": (40, 60)}, state="MD"),
+    dict(by="MedianPrice", k=25, near=(38.9, -77.03), radius_km=8),
+    dict(by="Growth_1Y", k=30, metro_km=2, ranges={"Residual": (-1e5, None)}),
+    dict(by="Residual", k=3, near=(38.9, -77.03), radius_km=2, state="DC", ranges={"MedianPrice": (3e5, 9e5)}),
+    dict(by="Livability_Score", k=50, state="Nowhere"),
+]
+
+
+@pytest.fixture
+def table(yelp_dataset, rng):
+    # the DMV table ten times over with jittered coordinates and prices, plus a residual
+    # and a score column with some gaps, so both query paths get exercised
+    df = pd.concat([yelp_dataset] * 10, ignore_index=True)
+    n = len(df)
+    df["Latitude"] += rng.normal(0, 0.01, n)
+    df["Longitude"] += rng.normal(0, 0.01, n)
+    df["MedianPrice"] = (df["MedianPrice"] * rng.lognormal(0, 0.1, n)).round(-3)
+    df["Residual"] = rng.normal(0, 1e5, n)
+    df["Livability_Score"] = rng.uniform(0, 100, n).round(1)
+    df.loc[rng.choice(n, 200, replace=False), "Residual"] = np.nan
+    df.loc[rng.choice(n, 50, replace=False), ["Latitude", "Longitude"]] = np.nan
+    return df
+
+
+def brute_force(df, by, k, ascending=None, state=None, ranges=None, near=None, radius_km=None, metro_km=None):
+    # full mask, then the k best by the index's tie order (stable ascending, reversed)
+    ascending = ASCENDING.get(by, False) if ascending is None else ascending
+    ok = df[by].notna().to_numpy().copy()
+    if state:
+        ok &= (df["State"] == state).to_numpy()
+    ranges = dict(ranges or {})
+    if metro_km is not None:
+        ranges["MetroDistanceMeters"] = (None, metro_km * 1000)
+    for col, (lo, hi) in ranges.items():
+        v = df[col].to_numpy(dtype=float)
+        ok &= ~np.isnan(v) & (v >= (-np.inf if lo is None else lo)) & (v <= (np.inf if hi is None else hi))
+    if near is not None:
+        d = haversine_meters(df["Latitude"].to_numpy(dtype=float), df["Longitude"].to_numpy(dtype=float), *near)
+        ok &= d <= radius_km * 1000
+    order = np.argsort(df[by].to_numpy(dtype=float), kind="stable")
+    order = order[ok[order]]
+    return tuple((order if ascending else order[::-1])[:k].tolist())
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_matches_brute_force(table, query):
+    assert GemIndex(table).top_ids(**query) == brute_force(table, **query)
+
+
+def test_repeated_queries_hit_the_cache(table):
+    index = GemIndex(table)
+    first = index.top_ids(by="Residual", k=10, ranges={"MedianPrice": (None, 6e5)})
+    again = index.top_ids(by="Residual", k=10, ranges={"MedianPrice": (None, 6e5)})
+    assert first == again and index.cache_info().hits == 1
+
+
+def test_parse_query_builds_ranges_and_geo():
+    params = {"by": ["Growth_5Y"], "k": ["7"], "min_MedianPrice": ["2e5"], "max_MedianPrice": ["5e5"],
+              "near": ["38.9,-77.0"], "radius_km": ["3"], "asc": ["true"]}
+    assert parse_query(params) == {"by": "Growth_5Y", "k": 7, "state": None, "ascending": True,
+                                   "radius_km": 3.0, "near": (38.9, -77.0),
+                                   "ranges": {"MedianPrice": (2e5, 5e5)}}
+
+
+def test_rejects_bad_queries(table):
+    index = GemIndex(table)
+    with pytest.raises(ValueError):
+        index.top_ids(by="City")
+    with pytest.raises(ValueError):
+        index.top_ids(k=0)
+    with pytest.raises(ValueError):
+        index.top_ids(near=(38.9, -77.0))
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from datasets import KEY, normalize_zip
+from listing_ingest import QUANTILES, RELATIVE_ACCURACY, ZipSketch, file_columns, ingest, plan_tasks, read_task
+
+
+def listings(rng, n=20000, zips=("20001", "02134", "22201")):
+    return pd.DataFrame({KEY: rng.choice(list(zips), n),
+                         "price": rng.lognormal(13, 0.6, n).round(),
+                         "lat": rng.normal(38.9, 0.01, n), "lon": rng.normal(-77.0, 0.01, n)})
+
+
+def exact(df, q):
+    # the order statistic ZipSketch.quantiles targets: rank floor(q * (n - 1)) + 1
+    s = np.sort(df["price"].to_numpy())
+    return s[int(np.floor(q * (len(s) - 1)))]
+
+
+def test_normalize_zip_handles_zip4_floats_and_lost_zeros():
+    raw = pd.Series(["20001-1234", " 2134-0001 ", "20001.0", "2001", None, "22201"])
+    assert normalize_zip(raw).tolist()[:4] == ["20001", "02134", "20001", "02001"]
+    assert normalize_zip(raw).isna().tolist() == [False, False, False, False, True, False]
+
+
+def test_quantiles_within_relative_accuracy(rng):
+    df = listings(rng)
+    out = ZipSketch.from_frame(df).quantiles()
+    for z, part in df.groupby(KEY):
+        for col, q in QUANTILES.items():
+            assert abs(out.loc[z, col] / exact(part, q) - 1) <= RELATIVE_ACCURACY
+
+
+def test_merge_is_order_independent(rng):
+    df = listings(rng)
+    blocks = [df.iloc[i:i + 3000] for i in range(0, len(df), 3000)]
+    forward, backward = ZipSketch(), ZipSketch()
+    for b in blocks:
+        forward.merge(ZipSketch.from_frame(b))
+    for b in reversed(blocks):
+        backward.merge(ZipSketch.from_frame(b))
+    whole = ZipSketch.from_frame(df)
+    for sketch in (forward, backward):
+        pd.testing.assert_frame_equal(sketch.quantiles(), whole.quantiles())
+        summary = sketch.summary()
+        np.testing.assert_allclose(summary["Price_Mean"], whole.summary()["Price_Mean"].loc[summary.index])
+
+
+def test_ingest_blocks_match_one_pass(rng, tmp_path):
+    df = listings(rng, n=5000).rename(columns={KEY: "zip", "price": "ListPrice"})
+    df["zip"] = df["zip"] + "-" + pd.Series(rng.integers(0, 9999, len(df))).map("{:04d}".format)
+    path = str(tmp_path / "listings.csv")
+    df.to_csv(path, index=False)
+
+    cols = file_columns(path)
+    tasks = plan_tasks([path], block_bytes=4096)
+    assert len(tasks) > 10
+    assert sum(len(read_task(t, cols)) for t in tasks) == len(df)
+
+    blocked = ingest([path], jobs=1, block_bytes=4096).summary()
+    single = ingest([path], jobs=1).summary()
+    assert sorted(blocked.index) == ["02134", "20001", "22201"]
+    pd.testing.assert_frame_equal(blocked.sort_index(), single.sort_index())
@@ -0,0 +1,86 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from livability_scorer import DEFAULT_WEIGHTS, LivabilityScorer
+
+
+def minmax(x):
+    x = np.asarray(x, dtype=float)
+    span = x.max() - x.min()
+    return (x - x.min()) / (span if span else 1.0)
+
+
+def reference_scores(df: pd.DataFrame) -> pd.DataFrame:
+    # the column-by-column formula urburn_anaylize.py used before the scorer existed
+    df = df.select_dtypes(include=[np.number]).fillna(0)
+    out = pd.DataFrame(index=df.index)
+    out["Score_Transport"] = (0.7 * (1 - minmax(np.log1p(df["MetroDistanceMeters"])))
+                              + 0.3 * (1 - minmax(np.log1p(df["DistanceToDC_Meters"]))))
+    out["Score_Food"] = 0.6 * minmax(np.log1p(df["Yelp_Restaurant_Count"])) + 0.4 * minmax(df["Yelp_Avg_Rating"])
+    diversity = df["Num_Thai"] + df["Num_Japanese"] + df["Num_Italian"] + df["Num_American"]
+    out["Score_Lifestyle"] = (0.3 * minmax(diversity) + 0.3 * minmax(df["Num_Coffee"])
+                              + 0.2 * minmax(df["Num_Bars"]) + 0.2 * minmax(df["Num_HighEnd_Price4"]))
+    out["Livability_Score"] = np.round((0.4 * out["Score_Transport"] + 0.3 * out["Score_Food"]
+                                        + 0.3 * out["Score_Lifestyle"]) * 100, 1)
+    return out
+
+
+def test_matches_the_original_formula(yelp_dataset):
+    scores = LivabilityScorer().fit_transform(yelp_dataset)
+    expected = reference_scores(yelp_dataset)
+    np.testing.assert_allclose(scores[expected.columns[:-1]], expected[expected.columns[:-1]], atol=1e-6)
+    np.testing.assert_allclose(scores["Livability_Score"], expected["Livability_Score"], atol=0.1 + 1e-9)
+
+
+def test_new_rows_are_scored_on_the_fitted_scale(yelp_dataset):
+    scorer = LivabilityScorer().fit(yelp_dataset)
+    part = yelp_dataset.sample(20, random_state=0)
+    pd.testing.assert_frame_equal(scorer.transform(part), scorer.transform(yelp_dataset).loc[part.index])
+
+
+def test_save_load_round_trip(yelp_dataset, tmp_path):
+    weights = {"Score_Food": {"weight": 1.0, "Rating": 1.0}}
+    scorer = LivabilityScorer(weights).fit(yelp_dataset)
+    path = str(tmp_path / "scorer.json")
+    scorer.save(path)
+    loaded = LivabilityScorer.load(path)
+    assert loaded.weights == weights
+    pd.testing.assert_frame_equal(loaded.transform(yelp_dataset), scorer.transform(yelp_dataset))
+
+    with open(path) as f:
+        state = json.load(f)
+    state["features"] = state["features"][:-1]
+    with open(path, "w") as f:
+        json.dump(state, f)
+    with pytest.raises(ValueError, match="fitted on features"):
+        LivabilityScorer.load(path)
+
+
+def test_rejects_unknown_sub_features_and_unfitted_use(yelp_dataset):
+    with pytest.raises(ValueError, match="Unknown sub-feature"):
+        LivabilityScorer({"Score_X": {"weight": 1.0, "Parks": 1.0}})
+    with pytest.raises(RuntimeError):
+        LivabilityScorer(DEFAULT_WEIGHTS).transform(yelp_dataset)
+
+
+def test_missing_columns_of_weighted_features_raise(yelp_dataset):
+    with pytest.raises(ValueError, match=r"HighEnd \(Num_HighEnd_Price4\)"):
+        LivabilityScorer().fit(yelp_dataset.drop(columns=["Num_HighEnd_Price4"]))
+    with pytest.raises(ValueError, match=r"Diversity \(Num_Thai\)"):
+        LivabilityScorer().fit(yelp_dataset.drop(columns=["Num_Thai"]))
+    scorer = LivabilityScorer().fit(yelp_dataset)
+    with pytest.raises(ValueError, match="Metro"):
+        scorer.transform(yelp_dataset.drop(columns=["MetroDistanceMeters"]))
+
+
+def test_unweighted_and_optional_features_may_be_missing(yelp_dataset):
+    # Bars carries no weight here; the lag and sentiment features only exist after their stages
+    food = {"Score_Food": {"weight": 1.0, "Rating": 1.0}}
+    LivabilityScorer(food).fit(yelp_dataset.drop(columns=["Num_Bars"]))
+    optional = {"Score_Food": {"weight": 0.8, "Rating": 1.0},
+                "Score_Near": {"weight": 0.2, "Rest_Count_Lag": 0.5, "Sentiment": 0.5}}
+    scores = LivabilityScorer(optional).fit_transform(yelp_dataset)
+    assert (scores["Score_Near"] == 0).all()
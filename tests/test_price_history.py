@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_history import PriceHistory, refresh_growth_columns
+
+ZIPS = ["22201", "20001", "21201"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    # 36 months from 2020-01; ZIP i is worth (i + 1) * 100 * (1.01 ** month)
+    store = PriceHistory.create(str(tmp_path / "history"), ZIPS, "2020-01")
+    months = np.arange(36)[:, None]
+    store.append_rows((np.arange(1, 4)[None, :] * 100 * 1.01 ** months).astype(np.float32))
+    return store
+
+
+def test_store_reopens_with_the_same_months(store, tmp_path):
+    again = PriceHistory(str(tmp_path / "history"))
+    assert (again.start, again.end, again.n_months) == (pd.Period("2020-01", "M"), pd.Period("2022-12", "M"), 36)
+    np.testing.assert_array_equal(np.asarray(again.values), np.asarray(store.values))
+
+
+def test_snapshot_as_of_a_month(store):
+    snap = store.snapshot("2021-06").set_index("ZipCode")
+    np.testing.assert_allclose(snap["MedianPrice"], [100 * 1.01 ** 17 * k for k in (1, 2, 3)], rtol=1e-6)
+    np.testing.assert_allclose(snap["Growth_1Y"], 1.01 ** 12 - 1, rtol=1e-5)
+    # 3 years back from 2021-06 is before the first stored month
+    assert snap["Growth_3Y"].isna().all()
+
+
+def test_integer_positions_index_like_a_list(store):
+    np.testing.assert_array_equal(store.snapshot(-1)["MedianPrice"], store.snapshot("2022-12")["MedianPrice"])
+    np.testing.assert_array_equal(store.snapshot(0)["MedianPrice"], store.snapshot("2020-01")["MedianPrice"])
+
+
+@pytest.mark.parametrize("at", ["2019-06", "2023-01", 36, -37])
+def test_months_outside_the_store_are_rejected(store, at):
+    with pytest.raises(ValueError, match="2020-01..2022-12"):
+        store.snapshot(at)
+
+
+def test_months_are_append_only(store):
+    with pytest.raises(ValueError):
+        store.append_month(pd.Series([1.0, 2.0, 3.0], index=ZIPS), "2022-06")
+    store.append_month(pd.Series([1.0, 2.0], index=ZIPS[:2]), "2023-01")
+    assert store.end == pd.Period("2023-01", "M")
+    assert np.isnan(store.series("21201").iloc[-1])
+
+
+def test_refresh_as_of_writes_nan_for_horizons_before_the_store(store):
+    df = pd.DataFrame({"ZipCode": ZIPS + ["99999"], "Growth_1Y": 9.0, "Growth_3Y": 9.0,
+                       "Growth_5Y": 7.0, "Growth_10Y": 5.0})
+    out = refresh_growth_columns(df, store, "2021-06").set_index("ZipCode")
+    stored = out.loc[ZIPS]
+    np.testing.assert_allclose(stored["Growth_1Y"], 1.01 ** 12 - 1, rtol=1e-5)
+    for col in ("Growth_3Y", "Growth_5Y", "Growth_10Y"):
+        assert stored[col].isna().all(), col
+    # a ZIP the store does not know keeps the static values
+    assert out.loc["99999", ["Growth_1Y", "Growth_5Y", "Growth_10Y"]].tolist() == [9.0, 7.0, 5.0]
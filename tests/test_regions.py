@@ -0,0 +1,62 @@
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from livability_scorer import LivabilityScorer
+from regions import Region, assign_regions, merged_scorer, normalize_regions
+from run_pipeline import build_region_stages
+
+
+def two_shards(yelp_dataset, tmp_path):
+    # east / west halves of the DMV table, each scored and saved as a region shard would be
+    df = yelp_dataset.sort_values("Longitude").reset_index(drop=True)
+    shards = {}
+    for name, part in (("west", df.iloc[:150]), ("east", df.iloc[150:])):
+        shard = tmp_path / name
+        shard.mkdir()
+        scorer = LivabilityScorer().fit(part)
+        scorer.score(part).to_csv(shard / "Final_Project_Data_With_Scores.csv", index=False)
+        scorer.save(str(shard / "livability_scorer.json"))
+        shards[name] = str(shard)
+    return df, shards
+
+
+def test_assign_regions_nearest_core_where_boxes_overlap():
+    regions = {"a": Region("a", "A", (0.0, 0.0), {}, (-1, -1, 1, 2)),
+               "b": Region("b", "B", (0.0, 1.0), {}, (-1, 0, 1, 3))}
+    df = pd.DataFrame({"Latitude": [0.0, 0.0, 0.0, 0.0, 5.0], "Longitude": [-0.5, 0.4, 0.6, 2.5, 0.0]})
+    label = assign_regions(df, regions)
+    assert label[:4].tolist() == ["a", "a", "b", "b"] and pd.isna(label[4])
+
+
+def test_merged_scorer_is_elementwise_min_max(yelp_dataset, tmp_path):
+    df, shards = two_shards(yelp_dataset, tmp_path)
+    merged = merged_scorer([os.path.join(s, "livability_scorer.json") for s in shards.values()])
+    pooled = LivabilityScorer().fit(df)
+    np.testing.assert_array_equal(merged.min_, pooled.min_)
+    np.testing.assert_array_equal(merged.max_, pooled.max_)
+
+
+def test_normalize_regions_scores_on_the_pooled_scale(yelp_dataset, tmp_path):
+    df, shards = two_shards(yelp_dataset, tmp_path)
+    out = normalize_regions(shards, str(tmp_path / "All_Regions_Scores.csv"), str(tmp_path / "global.json"))
+    assert out["Region"].value_counts().to_dict() == {"east": len(df) - 150, "west": 150}
+    expected = LivabilityScorer().fit_transform(df)["Livability_Score"]
+    got = out.set_index("ZipCode")["Livability_Score_Global"]
+    np.testing.assert_allclose(got.loc[df["ZipCode"]].to_numpy(), expected.to_numpy(), atol=0.051)
+    for _, part in out.groupby("Region"):
+        assert part["Livability_Region_Pct"].max() == 1.0
+
+
+def test_region_shards_run_inner_pools_with_one_worker(tmp_path):
+    # every shard script that has a --jobs option is started with --jobs 1
+    stages = build_region_stages(str(tmp_path), ["north", "south"], str(tmp_path / "regions.json"))
+    shard_stages = [s for s in stages if "." in s.name]
+    assert shard_stages
+    for stage in shard_stages:
+        with open(stage.script, encoding="utf-8") as f:
+            takes_jobs = re.search(r"add_argument\(\s*\"--jobs\"", f.read())
+        if takes_jobs:
+            assert stage.args[stage.args.index("--jobs") + 1] == "1", stage.name
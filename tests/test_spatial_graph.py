@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from spatial_graph import add_spatial_lags, distance_band_weights, knn_weights, local_moran, morans_i
+
+
+def _points(rng, n=60):
+    return pd.DataFrame({"Latitude": rng.uniform(38.5, 39.5, n), "Longitude": rng.uniform(-77.5, -76.5, n)})
+
+
+def test_knn_weights_are_row_standardised_without_self_links(rng):
+    df = _points(rng)
+    df.loc[1] = df.loc[0]    # two ZIPs on one centroid
+    W = knn_weights(df, k=5)
+    np.testing.assert_allclose(np.asarray(W.sum(axis=1)).ravel(), 1)
+    assert W.diagonal().sum() == 0
+    assert (np.diff(W.tocsr().indptr) == 5).all()
+
+
+def test_distance_band_joins_islands(rng):
+    df = _points(rng)
+    df.loc[len(df)] = [45.0, -70.0]     # far from everything
+    W = distance_band_weights(df, radius_m=5000)
+    assert (np.diff(W.tocsr().indptr) > 0).all()
+
+
+def test_spatial_lag_is_the_neighbour_mean(rng):
+    df = _points(rng, 20)
+    df["Yelp_Restaurant_Count"] = rng.integers(0, 50, len(df))
+    W = knn_weights(df, k=3)
+    lagged = add_spatial_lags(df, W, ["Yelp_Restaurant_Count"])
+    dense = W.toarray()
+    for i in range(len(df)):
+        nb = np.flatnonzero(dense[i])
+        assert np.isclose(lagged["Yelp_Restaurant_Count_Lag"][i], df["Yelp_Restaurant_Count"].to_numpy()[nb].mean())
+
+
+def test_morans_i_matches_the_dense_formula(rng):
+    df = _points(rng)
+    x = df["Latitude"].to_numpy() + rng.normal(scale=0.1, size=len(df))
+    W = knn_weights(df, k=4)
+    z = x - x.mean()
+    D = W.toarray()
+    expected = len(z) / D.sum() * (z @ D @ z) / (z @ z)
+    out = morans_i(W, x, permutations=99)
+    assert np.isclose(out["I"], expected)
+    assert out["I"] > 0 and out["p_sim"] <= 0.05
+
+
+def test_local_moran_draws_neighbours_without_replacement():
+    # complete graph on 9 ZIPs: refilling 8 slots from the 8 other ZIPs without replacement
+    # always reproduces the observed lag, so every permutation ties the observed I_i
+    n = 9
+    W = sparse.csr_matrix(np.ones((n, n)) - np.eye(n)) / (n - 1)
+    x = np.array([0, 1, 2, 3, 4, 5, 6, 7, 8], dtype=float) * 2
+    out = local_moran(W, x, permutations=99, seed=1)
+    np.testing.assert_allclose(out["P_Sim"], 1 / 100)
+
+
+def test_local_moran_flags_a_hot_spot(rng):
+    df = _points(rng, 200)
+    x = np.where((df["Latitude"] > 39.2) & (df["Longitude"] > -76.8), 10.0, 0.0) + rng.normal(size=len(df))
+    out = local_moran(knn_weights(df, k=6), x, permutations=199)
+    hot = x > 5
+    assert (out.loc[hot, "Cluster"] == "HH").mean() > 0.5
+    assert set(out["Cluster"]) <= {"HH", "LH", "LL", "HL", "ns"}
@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from livability_scorer import LivabilityScorer
+from weight_sweep import (dirichlet_weights, expand_score_weights, ols_residuals, residual_ranks, run_sweep,
+                          simplex_grid, sweep_scores)
+
+
+def test_simplex_grid_covers_every_vector_once():
+    W = simplex_grid(3, 4)
+    assert len(W) == math.comb(4 + 3 - 1, 3 - 1)
+    np.testing.assert_allclose(W.sum(axis=1), 1)
+    assert len(np.unique(W, axis=0)) == len(W)
+
+
+def test_dirichlet_weights_sum_to_one():
+    W = dirichlet_weights(100, 5, seed=1)
+    assert W.shape == (100, 5)
+    np.testing.assert_allclose(W.sum(axis=1), 1)
+
+
+def test_ols_residuals_match_polyfit(rng):
+    X = rng.normal(size=(50, 4))
+    y = 3 * X[:, 0] + rng.normal(size=50)
+    R = ols_residuals(X, y)
+    for j in range(X.shape[1]):
+        slope, intercept = np.polyfit(X[:, j], y, 1)
+        np.testing.assert_allclose(R[:, j], y - (intercept + slope * X[:, j]), atol=1e-9)
+
+
+def test_residual_ranks_start_at_most_negative():
+    R = np.array([[0.5, -1.0], [-2.0, 3.0], [1.0, 0.0]])
+    np.testing.assert_array_equal(residual_ranks(R), [[2, 1], [1, 3], [3, 2]])
+
+
+def test_sweep_scores_reproduce_the_scorer(yelp_dataset):
+    scorer = LivabilityScorer().fit(yelp_dataset)
+    N = scorer.normalize(yelp_dataset)
+    E = expand_score_weights(scorer, scorer.score_weights[None, :])
+    expected = scorer.transform(yelp_dataset)["Livability_Score"].to_numpy()
+    np.testing.assert_allclose(np.round(sweep_scores(N, E)[:, 0], 1), expected, atol=0.051)
+
+
+def test_run_sweep_leaves_out_zips_without_a_price(yelp_dataset):
+    df = yelp_dataset.copy()
+    df.loc[:9, "MedianPrice"] = [0, np.nan, -1, 0, 0, np.nan, 0, 0, 0, 0]
+    scorer = LivabilityScorer().fit(df)
+    E = dirichlet_weights(50, len(scorer.score_names), seed=3) @ scorer.sub_weights.T
+
+    out = run_sweep(df, E, scorer)
+    priced = df[pd.to_numeric(df["MedianPrice"], errors="coerce") > 0]
+    assert set(out["ZipCode"]) == set(priced["ZipCode"])
+    assert out["Worst_Rank"].max() == len(priced)
+
+    # same ranks as sweeping only the priced rows on the same scale
+    expected = run_sweep(priced.reset_index(drop=True), E, scorer)
+    pd.testing.assert_frame_equal(out, expected)
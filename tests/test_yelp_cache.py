@@ -0,0 +1,68 @@
+import time
+
+import run_yelp_scraper
+import yelp_cache
+from fake_yelp import FakeYelpServer
+from yelp_cache import ResponseCache, cache_key
+
+PARAMS = {"latitude": 38.9072001, "longitude": -77.0369, "term": "Thai", "radius": 1000, "limit": 50}
+
+
+def test_key_ignores_float_noise_and_non_query_fields():
+    noisy = dict(PARAMS, latitude=38.90720014, categories=None, api_key="secret")
+    assert cache_key(noisy) == cache_key(PARAMS)
+    assert cache_key(dict(PARAMS, offset=50)) != cache_key(PARAMS)
+
+
+def test_responses_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    assert cache.get(PARAMS) is None
+    cache.put(PARAMS, {"total": 3, "businesses": [{"id": "a"}]})
+    cache.close()
+
+    cache = ResponseCache(path)
+    assert cache.get(PARAMS) == {"total": 3, "businesses": [{"id": "a"}]}
+    assert (cache.hits, cache.misses, len(cache)) == (1, 0, 1)
+    cache.close()
+
+
+def test_expired_entries_miss_and_are_evicted(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl_days=1)
+    cache.put(PARAMS, {"total": 0})
+    now = time.time()
+    monkeypatch.setattr(yelp_cache.time, "time", lambda: now + 2 * 86400)
+    assert cache.get(PARAMS) is None
+    assert cache.evict() == 1 and len(cache) == 0
+    cache.close()
+
+
+def test_evict_drops_least_recently_used_above_the_cap(tmp_path, monkeypatch):
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(yelp_cache.time, "time", lambda: float(next(clock)))
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl_days=None, max_entries=2)
+    queries = [dict(PARAMS, offset=k) for k in range(3)]
+    for q in queries:
+        cache.put(q, {"offset": q["offset"]})
+    cache.get(queries[0])       # touched last, so the oldest untouched entry goes
+    assert cache.evict() == 1
+    assert cache.get(queries[1]) is None
+    assert cache.get(queries[0]) == {"offset": 0} and cache.get(queries[2]) == {"offset": 2}
+    cache.close()
+
+
+def test_rerun_is_served_from_the_cache(yelp_dataset, tmp_path, monkeypatch):
+    server = FakeYelpServer(latency=0).start()
+    monkeypatch.setattr(run_yelp_scraper, "YELP_SEARCH_URL", server.url)
+    rows = yelp_dataset.head(5)
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    try:
+        first, failed = run_yelp_scraper.collect_yelp_data(rows, "test", qps=1000, workers=4, cache=cache)
+        fetched = server.requests
+        second, _ = run_yelp_scraper.collect_yelp_data(rows, "test", qps=1000, workers=4, cache=cache)
+    finally:
+        cache.close()
+        server.stop()
+    assert not failed and fetched > 0
+    assert server.requests == fetched
+    assert sorted(first, key=str) == sorted(second, key=str)
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import run_yelp_scraper
+from fake_yelp import FakeYelpServer, fake_response
+from yelp_tiles import TILE_CATEGORIES, BusinessStore, TileGrid, haversine_meters
+
+RADIUS = 1000
+
+
+@pytest.fixture
+def zips(yelp_dataset):
+    return yelp_dataset.dropna(subset=["Latitude", "Longitude"]).reset_index(drop=True)
+
+
+@pytest.fixture
+def grid(zips):
+    return TileGrid(zips["Latitude"], zips["Longitude"], radius_m=RADIUS)
+
+
+def test_groups_partition_the_zips(grid, zips):
+    seen = np.concatenate([grid.members(t) for t in grid.cover()])
+    assert sorted(seen) == list(range(len(zips)))
+
+
+def test_group_circle_holds_every_member_circle(grid, zips):
+    for tile in grid.cover():
+        lat, lon, r = grid.circle(tile)
+        idx = grid.members(tile)
+        d = haversine_meters(zips["Latitude"].to_numpy()[idx], zips["Longitude"].to_numpy()[idx], lat, lon)
+        assert (d + RADIUS <= r).all()
+
+
+def test_split_goes_from_groups_to_squares(grid):
+    tile = max(grid.cover(), key=lambda t: len(grid.members(t)))
+    while True:
+        children = grid.split(tile)
+        if children[0][0] != "zips":
+            break
+        assert sorted(np.concatenate([grid.members(c) for c in children])) == sorted(grid.members(tile))
+        tile = max(children, key=lambda t: len(grid.members(t)))
+    # the squares under the remaining ZIP circle(s) are the ones touching them
+    assert all(len(c) == 3 and c[2] == grid.size for c in children)
+    assert all(grid.touches(c)[grid.members(tile)].any() for c in children)
+
+
+def test_tiles_fetch_every_business_in_about_one_request_per_zip(zips, tmp_path, monkeypatch):
+    server = FakeYelpServer(latency=0).start()
+    monkeypatch.setattr(run_yelp_scraper, "YELP_SEARCH_URL", server.url)
+    store = BusinessStore(str(tmp_path / "businesses.sqlite"))
+    try:
+        records, failed, stats = run_yelp_scraper.collect_tiles(zips, "test", store, qps=1000, workers=4)
+        ids = set(store.load()["id"])
+    finally:
+        store.close()
+        server.stop()
+    assert not failed and len(records) == len(zips)
+    assert stats["requests"] == server.requests
+    assert server.requests < 1.3 * len(zips)
+    for lat, lon in zip(zips["Latitude"], zips["Longitude"]):
+        direct = fake_response({"latitude": lat, "longitude": lon, "radius": RADIUS,
+                                "categories": TILE_CATEGORIES, "limit": 240})
+        assert {b["id"] for b in direct["businesses"]} <= ids